@@ -1,254 +1,1120 @@
 #!/usr/bin/python3
 import sys
+import time
+# 尽早记录启动时间，启动时间线包含模块导入的耗时
+STARTUP_TIME = time.monotonic()
 import subprocess
 import os
 import glob
-import configparser
-import random
-import cv2
-import numpy as np
+import re
+import json
+import struct
+import zlib
+import hashlib
+import ctypes
+import ctypes.util
+import threading
+import gc
+import bisect
+import shutil
+import atexit
+import functools
+import contextlib
+import urllib.parse
+import argparse
+import socket
+import fcntl
+import signal
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QMenu, QAction, 
                             QFileDialog, QSlider, QLabel, QVBoxLayout, 
                             QHBoxLayout, QWidget, QGridLayout, QMessageBox,
                             QSizePolicy, QDialog, QPushButton, QInputDialog,
-                            QLineEdit, QSystemTrayIcon)
-from PyQt5.QtCore import QUrl, Qt, QTimer, QSize, QPoint, QRect, pyqtSignal, QSettings
-from PyQt5.QtGui import QPixmap, QIcon, QDesktopServices, QFont, QPainter, QPen, QImage
+                            QLineEdit, QSystemTrayIcon, QToolTip, QListWidget,
+                            QListWidgetItem, QListView, QColorDialog)
+from PyQt5.QtCore import (QUrl, Qt, QTimer, QSize, QPoint, QRect, pyqtSignal, QSettings,
+                          QObject, QFileSystemWatcher, QEvent, QSocketNotifier, QBuffer, QIODevice)
+from PyQt5.QtNetwork import QLocalServer
+from PyQt5.QtGui import (QPixmap, QIcon, QDesktopServices, QFont, QPainter, QPen, QImage, QColor,
+                         QImageReader)
+try:
+    from PyQt5.QtDBus import QDBusConnection, QDBusInterface, QDBusMessage, QDBusVariant
+except ImportError:
+    QDBusConnection = None
 
-class DesktopIconWidget(QWidget):
-    """桌面快捷方式图标 - 使用事件穿透实现完全透明"""
-    def __init__(self, desktop_file, parent=None):
+import video_decoder
+from video_decoder import (fit_frame_to_screen, FrameEffects, seek_video, downscale_large_frame, PlaybackClock,
+                           FrameInterpolator, SharedFrameRing)
+
+# OpenCV 和 numpy 只有视频背景需要，由 import_video_modules() 按需导入
+cv2 = None
+np = None
+
+def import_video_modules():
+    """按需导入 OpenCV 和 numpy (与 video_decoder 共用)，不可用时返回 False (可在工作线程中调用)"""
+    global cv2, np
+    if not video_decoder.import_video_modules():
+        return False
+    cv2, np = video_decoder.cv2, video_decoder.np
+    return True
+
+class Tracer:
+    """性能跟踪 - 记录耗时区间，保存为 Chrome 跟踪格式 (chrome://tracing 或 Perfetto 打开)
+
+    通过环境变量 DYNAMIC_WALLPAPER_TRACE=文件路径 (或 1) 或命令行参数 --trace[=文件路径]
+    启用。未启用时 span() 返回空的上下文管理器，开销可以忽略。只保留最近 MAX_EVENTS 个事件
+    (播放时每帧约 5 个区间，约 20 分钟)，程序退出时由 atexit 写入一次。
+    """
+    ENV = "DYNAMIC_WALLPAPER_TRACE"
+    NULL_SPAN = contextlib.nullcontext()
+    MAX_EVENTS = 200000
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def configure(self, argv):
+        """根据环境变量和命令行参数启用跟踪，返回去掉 --trace 参数后的 argv"""
+        path = os.environ.get(self.ENV)
+        remaining = []
+        for arg in argv:
+            if arg == "--trace":
+                path = path or "1"
+            elif arg.startswith("--trace="):
+                path = arg.split("=", 1)[1]
+            else:
+                remaining.append(arg)
+        if path:
+            self.enable(os.path.join(get_cache_dir(), "trace.json") if path == "1" else path)
+        return remaining
+
+    def enable(self, path):
+        self.path = os.path.abspath(path)
+        self.enabled = True
+        self.instrument_subprocess()
+        atexit.register(self.save)
+        print(f"性能跟踪已启用，退出时写入 {self.path}")
+
+    def instrument_subprocess(self):
+        """为所有子进程调用记录区间 (run 包括等待，Popen 只是启动)"""
+        original_run = subprocess.run
+        original_init = subprocess.Popen.__init__
+
+        @functools.wraps(original_run)
+        def run(args, *a, **kw):
+            with self.span(f"run {self.command_name(args)}", "subprocess", args=str(args)):
+                return original_run(args, *a, **kw)
+
+        @functools.wraps(original_init)
+        def popen_init(popen, args, *a, **kw):
+            with self.span(f"spawn {self.command_name(args)}", "subprocess"):
+                original_init(popen, args, *a, **kw)
+
+        subprocess.run = run
+        subprocess.Popen.__init__ = popen_init
+
+    @staticmethod
+    def command_name(args):
+        if isinstance(args, (list, tuple)):
+            return os.path.basename(str(args[0])) if args else ""
+        return str(args).split(" ", 1)[0]
+
+    def span(self, name, category="app", **args):
+        """记录一个区间: with TRACER.span("名称"): ..."""
+        if not self.enabled:
+            return self.NULL_SPAN
+        return self._span(name, category, args)
+
+    @contextlib.contextmanager
+    def _span(self, name, category, args):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_event(name, category, "X", start, time.monotonic() - start, args)
+
+    def traced(self, name=None, category="app"):
+        """装饰器: 为函数调用记录区间"""
+        def decorator(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*a, **kw):
+                if not self.enabled:
+                    return func(*a, **kw)
+                with self._span(label, category, {}):
+                    return func(*a, **kw)
+            return wrapper
+        return decorator
+
+    def instant(self, name, category="app"):
+        """记录一个时间点"""
+        if self.enabled:
+            self.add_event(name, category, "i", time.monotonic(), None, {})
+
+    def add_event(self, name, category, phase, start, duration, args):
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": phase, "pid": os.getpid(), "tid": thread.ident,
+                 "ts": round((start - STARTUP_TIME) * 1e6, 1)}
+        if duration is not None:
+            event["dur"] = round(duration * 1e6, 1)
+        else:
+            event["s"] = "p"
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    def save(self):
+        """写入跟踪文件"""
+        if not self.enabled or not self.events:
+            return
+        with self.lock:
+            events = list(self.events)
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                         "args": {"name": name}} for tid, name in self.thread_names.items()]
+        try:
+            write_file_atomic(self.path, json.dumps({"traceEvents": metadata + events,
+                                                     "displayTimeUnit": "ms"}))
+            print(f"性能跟踪已写入 {self.path} ({len(events)} 个事件)")
+        except OSError as e:
+            print(f"无法写入性能跟踪文件: {e}")
+
+TRACER = Tracer()
+
+class StartupTimeline:
+    """启动时间线 - 记录各阶段相对进程启动的耗时，显示壁纸后输出"""
+    BUDGET_MS = 2000  # 显示上次壁纸的目标耗时
+    _instance = None
+
+    def __init__(self, start):
+        self.start = start
+        self.marks = []
+        self.finished = False
+
+    @classmethod
+    def shared(cls):
+        if cls._instance is None:
+            cls._instance = cls(STARTUP_TIME)
+        return cls._instance
+
+    def mark(self, label):
+        """记录一个阶段完成的时间"""
+        if not self.finished:
+            self.marks.append((label, (time.monotonic() - self.start) * 1000))
+            TRACER.instant(label, "startup")
+
+    def finish(self, label):
+        """记录最后一个阶段并输出时间线"""
+        if self.finished:
+            return
+        self.mark(label)
+        self.finished = True
+        print("启动时间线:")
+        previous = 0.0
+        for name, elapsed in self.marks:
+            print(f"  {elapsed:8.1f} ms (+{elapsed - previous:7.1f}) {name}")
+            previous = elapsed
+        total = self.marks[-1][1]
+        if total > self.BUDGET_MS:
+            print(f"启动耗时 {total:.0f} ms，超出目标 {self.BUDGET_MS} ms")
+
+def get_cache_dir(*parts):
+    """获取应用缓存目录 (XDG_CACHE_HOME/DynamicWallpaper)，不存在时自动创建"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "DynamicWallpaper", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def get_runtime_dir():
+    """获取运行时目录 ($XDG_RUNTIME_DIR/DynamicWallpaper)，存放实例锁和控制 socket
+
+    wallpaperctl.py 使用相同的规则查找 socket，修改时两边要一致。
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    path = os.path.join(base, "DynamicWallpaper") if base else f"/tmp/DynamicWallpaper-{os.getuid()}"
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+def read_rss_mb():
+    """当前进程的常驻内存 (MB)，无法读取时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def release_heap_memory():
+    """回收垃圾并把 glibc 堆中的空闲内存还给系统 (malloc_trim)"""
+    gc.collect()
+    try:
+        ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def write_file_atomic(path, data):
+    """原子写入文件 - 先写临时文件再重命名，避免中途崩溃留下半个文件"""
+    tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    binary = isinstance(data, (bytes, bytearray, memoryview))
+    try:
+        with open(tmp_path, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class IconThemeIndex:
+    """图标主题索引 - 图标名 -> 各尺寸最佳文件
+
+    启动时扫描一次图标目录并把结果连同目录mtime保存到磁盘，
+    之后只重新列出mtime发生变化的目录，查找图标只是几次字典访问。
+    proot下每次stat都是一次ptrace往返，逐个探测文件代价很高。
+    索引按主题分开，查找时按继承顺序找到第一个有该图标的主题，再在其中选择尺寸。
+    """
+    INDEX_VERSION = 1
+    ICON_EXTENSIONS = ("png", "svg", "xpm")  # 同一目录内的优先顺序
+    MAX_DEPTH = 4
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, roots, index_file=None):
+        self.roots = roots
+        self.index_file = index_file
+        self.dirs = {}
+        self.icons = []
+        self.dirty = False
+
+    @classmethod
+    def shared(cls, theme_name=None):
+        """获取进程内共享的索引，首次调用时构建 (可在工作线程中调用)"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                index = cls(cls.default_roots(theme_name), os.path.join(get_cache_dir(), "icon_index.json"))
+                index.load()
+                index.update()
+                index.save()
+                cls._shared = index
+            return cls._shared
+
+    @staticmethod
+    def default_roots(theme_name=None):
+        """按优先级返回需要索引的图标目录"""
+        data_dirs = [os.path.expanduser("~/.local/share")]
+        data_dirs += [d for d in os.environ.get("XDG_DATA_DIRS", "/usr/local/share:/usr/share").split(":") if d]
+
+        themes = []
+        try:
+            if theme_name is None:
+                theme_name = QIcon.themeName()
+            if theme_name:
+                themes.append(theme_name)
+        except Exception:
+            pass
+        # 选中主题及其 Inherits (广度优先)，最后是 hicolor 等通用主题
+        for theme in themes:
+            for parent in IconThemeIndex.theme_inherits(theme, data_dirs):
+                if parent not in themes and parent != "hicolor":
+                    themes.append(parent)
+        for theme in ("hicolor", "gnome"):
+            if theme not in themes:
+                themes.append(theme)
+
+        roots = [os.path.expanduser("~/.local/share/icons")]
+        for theme in themes:
+            for data_dir in data_dirs:
+                roots.append(os.path.join(data_dir, "icons", theme))
+        roots.append("/usr/share/pixmaps")
+
+        # 去重并保持顺序
+        seen = set()
+        return [r for r in roots if not (r in seen or seen.add(r))]
+
+    @staticmethod
+    def theme_inherits(theme, data_dirs):
+        """读取主题 index.theme 中的 Inherits 列表 (使用第一个找到的 index.theme)"""
+        for data_dir in data_dirs:
+            try:
+                with open(os.path.join(data_dir, "icons", theme, "index.theme"), encoding="utf-8") as f:
+                    for line in f:
+                        key, sep, value = line.partition("=")
+                        if sep and key.strip() == "Inherits":
+                            return [t.strip() for t in value.split(",") if t.strip()]
+                return []
+            except (OSError, UnicodeDecodeError):
+                continue
+        return []
+
+    def load(self):
+        """从磁盘读取上次保存的索引"""
+        if not self.index_file:
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.INDEX_VERSION and data.get("roots") == self.roots:
+                self.dirs = data.get("dirs", {})
+        except (OSError, ValueError):
+            self.dirs = {}
+
+    def save(self):
+        """把索引写回磁盘 (仅在有变化时)"""
+        if not self.index_file or not self.dirty:
+            return
+        try:
+            data = {"version": self.INDEX_VERSION, "roots": self.roots, "dirs": self.dirs}
+            write_file_atomic(self.index_file, json.dumps(data, ensure_ascii=False))
+            self.dirty = False
+        except OSError as e:
+            print(f"保存图标索引失败: {e}")
+
+    def update(self):
+        """增量更新索引 - 只重新扫描mtime变化的目录"""
+        old_dirs = self.dirs
+        new_dirs = {}
+        for root in self.roots:
+            self._scan_dir(root, old_dirs, new_dirs, 0)
+        if set(new_dirs) != set(old_dirs):
+            self.dirty = True
+        self.dirs = new_dirs
+        self._rebuild_icons()
+
+    def _scan_dir(self, path, old_dirs, new_dirs, depth):
+        if path in new_dirs or depth > self.MAX_DEPTH:
+            return
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+
+        entry = old_dirs.get(path)
+        if entry is None or entry.get("mtime") != mtime:
+            entry = {"mtime": mtime, "files": {}, "subdirs": []}
+            try:
+                with os.scandir(path) as it:
+                    for dir_entry in it:
+                        try:
+                            if dir_entry.is_dir():
+                                entry["subdirs"].append(dir_entry.name)
+                                continue
+                        except OSError:
+                            continue
+                        name, ext = os.path.splitext(dir_entry.name)
+                        ext = ext[1:].lower()
+                        if ext not in self.ICON_EXTENSIONS:
+                            continue
+                        current = entry["files"].get(name)
+                        if current is None or (self.ICON_EXTENSIONS.index(ext) <
+                                               self.ICON_EXTENSIONS.index(current.rsplit('.', 1)[1].lower())):
+                            entry["files"][name] = dir_entry.name
+            except OSError:
+                return
+            entry["subdirs"].sort()
+            self.dirty = True
+
+        new_dirs[path] = entry
+        for sub in entry["subdirs"]:
+            self._scan_dir(os.path.join(path, sub), old_dirs, new_dirs, depth + 1)
+
+    @staticmethod
+    def _dir_size(path):
+        """从目录名推断图标尺寸: 48x48 / 48x48@2 / 48 / scalable"""
+        size = 0
+        for part in path.split(os.sep):
+            match = re.fullmatch(r"(\d+)x\d+(?:@(\d+)x?)?", part)
+            if match:
+                size = int(match.group(1)) * int(match.group(2) or 1)
+            elif part.isdigit():
+                size = int(part)
+            elif part == "scalable":
+                size = -1
+        return size
+
+    @staticmethod
+    def _theme_of(path):
+        """目录所属的主题 (.../icons/主题/...)，不属于主题的目录 (如 pixmaps) 返回目录本身"""
+        parts = path.split(os.sep)
+        if "icons" in parts:
+            i = len(parts) - 1 - parts[::-1].index("icons")
+            if i + 1 < len(parts):
+                return parts[i + 1]
+        return path
+
+    def _rebuild_icons(self):
+        """由目录表生成按主题优先级排列的 [图标名 -> {尺寸: 路径}]，同一主题内先出现的根目录优先"""
+        order = []
+        for root in self.roots:
+            theme = self._theme_of(root)
+            if theme not in order:
+                order.append(theme)
+        themes = {}
+        for path, entry in self.dirs.items():
+            size = self._dir_size(path)
+            icons = themes.setdefault(self._theme_of(path), {})
+            for name, filename in entry["files"].items():
+                sizes = icons.setdefault(name, {})
+                if size not in sizes:
+                    sizes[size] = os.path.join(path, filename)
+        # 不在主题列表中的目录 (例如 ~/.local/share/icons 下未选中的主题) 排在最后
+        ranked = sorted(themes, key=lambda t: order.index(t) if t in order else len(order))
+        self.icons = [themes[theme] for theme in ranked]
+
+    def lookup(self, name, size=64):
+        """查找最适合指定尺寸的图标文件，找不到返回None
+
+        只在第一个包含该图标的主题中选择尺寸，优先级低的主题尺寸更接近也不会被选中。
+        """
+        sizes = next((icons[name] for icons in self.icons if name in icons), None)
+        if not sizes:
+            base, ext = os.path.splitext(name)
+            if ext[1:].lower() in self.ICON_EXTENSIONS:
+                sizes = next((icons[base] for icons in self.icons if base in icons), None)
+            if not sizes:
+                return None
+
+        if size in sizes:
+            return sizes[size]
+        larger = [s for s in sizes if s > size]
+        if larger:
+            return sizes[min(larger)]
+        if -1 in sizes:
+            return sizes[-1]
+        smaller = [s for s in sizes if s > 0]
+        if smaller:
+            return sizes[max(smaller)]
+        return next(iter(sizes.values()))
+
+    def resolve(self, icon, size=64):
+        """把 .desktop 中的 Icon= 值解析为文件路径"""
+        if not icon:
+            return None
+        if os.path.isabs(icon):
+            return icon if os.path.exists(icon) else None
+        return self.lookup(icon, size)
+
+class DesktopEntry:
+    """轻量的 .desktop 解析器 - 只读取 [Desktop Entry] 中需要的键
+
+    支持当前语言的本地化键 (如 Name[zh_CN])，以及 TryExec、NoDisplay、Hidden。
+    解析结果按 (路径, mtime, 大小) 缓存，桌面未变化时重新扫描不会再解析。
+    """
+    GROUP = "[Desktop Entry]"
+    LOCALIZED_KEYS = ("Name", "Comment")
+    KEYS = ("Name", "Comment", "Icon", "Exec", "Path", "TryExec", "NoDisplay",
+            "Hidden", "Type", "Terminal")
+
+    _cache = {}  # 路径 -> ((mtime_ns, size), DesktopEntry)
+    _which_cache = {}  # (PATH, 程序名) -> 是否存在，桌面目录变化时清空
+    _locale_suffixes = None
+
+    def __init__(self, path):
+        self.path = path
+        self.name = ""
+        self.name_key = "Name"
+        self.comment = ""
+        self.icon = ""
+        self.exec_cmd = ""
+        self.working_dir = ""
+        self.try_exec = ""
+        self.type = "Application"
+        self.terminal = False
+        self.no_display = False
+        self.hidden = False
+
+    @classmethod
+    def load(cls, path, stat_key=None):
+        """读取 .desktop 文件，(mtime, 大小) 未变化时直接返回缓存结果"""
+        if stat_key is None:
+            st = os.stat(path)
+            stat_key = (st.st_mtime_ns, st.st_size)
+        cached = cls._cache.get(path)
+        if cached and cached[0] == stat_key:
+            return cached[1]
+
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8', errors='replace')
+        entry = cls.parse(path, text)
+        cls._cache[path] = (stat_key, entry)
+        return entry
+
+    @classmethod
+    def cached(cls, path, stat_key):
+        """返回仍然有效的缓存结果，没有则返回None (不读文件)"""
+        cached = cls._cache.get(path)
+        if cached and stat_key is not None and cached[0] == stat_key:
+            return cached[1]
+        return None
+
+    @classmethod
+    def forget(cls, path):
+        """文件被删除时清除缓存"""
+        cls._cache.pop(path, None)
+
+    @classmethod
+    def locale_suffixes(cls):
+        """按规范顺序返回当前语言的后缀: lang_COUNTRY@MOD, lang_COUNTRY, lang@MOD, lang"""
+        if cls._locale_suffixes is None:
+            value = ""
+            for var in ("LC_ALL", "LC_MESSAGES", "LANG"):
+                value = os.environ.get(var, "")
+                if value:
+                    break
+            suffixes = []
+            if value and value not in ("C", "POSIX"):
+                match = re.match(r"([a-zA-Z]+)(?:_([a-zA-Z]+))?(?:\.[^@]*)?(?:@(.*))?$", value)
+                if match:
+                    lang, country, modifier = match.groups()
+                    if country and modifier:
+                        suffixes.append(f"{lang}_{country}@{modifier}")
+                    if country:
+                        suffixes.append(f"{lang}_{country}")
+                    if modifier:
+                        suffixes.append(f"{lang}@{modifier}")
+                    suffixes.append(lang)
+            cls._locale_suffixes = suffixes
+        return cls._locale_suffixes
+
+    @staticmethod
+    def unescape(value):
+        """处理规范定义的转义序列 (空格、换行、制表符、回车和反斜杠)"""
+        if '\\' not in value:
+            return value
+        return re.sub(r"\\([sntr\\])",
+                      lambda m: {"s": " ", "n": "\n", "t": "\t", "r": "\r", "\\": "\\"}[m.group(1)],
+                      value)
+
+    @staticmethod
+    def escape(value):
+        """unescape 的逆操作，写回文件时使用"""
+        return (value.replace("\\", "\\\\").replace("\n", "\\n")
+                .replace("\t", "\\t").replace("\r", "\\r"))
+
+    @classmethod
+    def parse(cls, path, text):
+        """解析文本，只处理 [Desktop Entry] 组"""
+        wanted_locales = cls.locale_suffixes()
+        values = {}
+        localized = {}
+        in_group = False
+        for line in text.splitlines():
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+            if line[0] == '[':
+                if in_group:
+                    break
+                in_group = line == cls.GROUP
+                continue
+            if not in_group:
+                continue
+            key, sep, value = line.partition('=')
+            if not sep:
+                continue
+            key = key.strip()
+            bracket = key.find('[')
+            if bracket != -1:
+                base = key[:bracket]
+                locale = key[bracket + 1:-1]
+                if base in cls.LOCALIZED_KEYS and locale in wanted_locales:
+                    localized[(base, locale)] = cls.unescape(value.strip())
+            elif key in cls.KEYS and key not in values:
+                values[key] = cls.unescape(value.strip())
+
+        entry = cls(path)
+        for base in cls.LOCALIZED_KEYS:
+            for locale in wanted_locales:
+                if (base, locale) in localized:
+                    if base == "Name":
+                        entry.name_key = f"Name[{locale}]"
+                    values[base] = localized[(base, locale)]
+                    break
+
+        entry.name = values.get("Name", "")
+        entry.comment = values.get("Comment", "")
+        entry.icon = values.get("Icon", "")
+        entry.exec_cmd = values.get("Exec", "")
+        entry.working_dir = values.get("Path", "")
+        entry.try_exec = values.get("TryExec", "")
+        entry.type = values.get("Type", "Application")
+        entry.terminal = values.get("Terminal", "").lower() == "true"
+        entry.no_display = values.get("NoDisplay", "").lower() == "true"
+        entry.hidden = values.get("Hidden", "").lower() == "true"
+        return entry
+
+    @property
+    def visible(self):
+        """是否应在桌面显示: 未隐藏且 TryExec 指向的程序存在"""
+        if self.hidden or self.no_display:
+            return False
+        if self.try_exec:
+            return self.program_exists(self.try_exec)
+        return True
+
+    @classmethod
+    def program_exists(cls, program):
+        if os.path.isabs(program):
+            return os.access(program, os.X_OK)
+        key = (os.environ.get("PATH", ""), program)
+        found = cls._which_cache.get(key)
+        if found is None:
+            found = cls._which_cache[key] = shutil.which(program) is not None
+        return found
+
+    @classmethod
+    def forget_programs(cls):
+        """清空 TryExec 的查找结果 (桌面目录变化时调用，程序可能已经安装或卸载)"""
+        cls._which_cache.clear()
+
+    @classmethod
+    def set_key(cls, path, key, value):
+        """修改 [Desktop Entry] 中的一个键，其余内容原样保留"""
+        file_mode = os.stat(path).st_mode & 0o7777
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+
+        new_line = f"{key}={cls.escape(value)}"
+        in_group = False
+        insert_at = None
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.startswith('['):
+                if in_group:
+                    break
+                in_group = stripped == cls.GROUP
+                if in_group:
+                    insert_at = i + 1
+                continue
+            if in_group and stripped.partition('=')[0].strip() == key:
+                lines[i] = new_line
+                break
+        else:
+            if insert_at is None:
+                lines[:0] = [cls.GROUP]
+                insert_at = 1
+            lines.insert(insert_at, new_line)
+
+        write_file_atomic(path, "\n".join(lines) + "\n")
+        os.chmod(path, file_mode)
+        cls.forget(path)
+
+def expand_exec_field(exec_cmd, files=(), name="", icon="", desktop_file=""):
+    """展开 .desktop 的 Exec 字段为参数列表 (处理引号、反斜杠转义和 %f/%u/%F/%U 等字段代码)
+
+    双引号内反斜杠只转义 " ` $ 和反斜杠本身，引号外反斜杠转义下一个字符 (Wine 快捷方式中的
+    Windows 路径)，%% 在引号内外都表示 %。规范不允许 Exec 中出现未加引号的 shell 元字符，
+    但实际文件里常见，遇到时退回到 /bin/sh -c 执行去掉字段代码后的命令。
+    """
+    argv = []
+    current = None
+    quoted = False
+    i = 0
+    while i < len(exec_cmd):
+        c = exec_cmd[i]
+        if quoted:
+            if c == '"':
+                quoted = False
+            elif c == '\\' and i + 1 < len(exec_cmd) and exec_cmd[i + 1] in '"`$\\':
+                i += 1
+                current += exec_cmd[i]
+            elif c == '%' and exec_cmd[i + 1:i + 2] == '%':
+                i += 1
+                current += '%'
+            else:
+                current += c
+        elif c in ' \t':
+            if current is not None:
+                argv.append(current)
+                current = None
+        elif c == '"':
+            quoted = True
+            current = current or ""
+        elif c == '\\':
+            # 引号外的反斜杠转义下一个字符
+            i += 1
+            current = (current or "") + (exec_cmd[i] if i < len(exec_cmd) else '\\')
+        elif c == '%' and i + 1 < len(exec_cmd):
+            i += 1
+            code = exec_cmd[i]
+            if code == '%':
+                current = (current or "") + '%'
+            elif code in 'fu':
+                if files:
+                    current = (current or "") + files[0]
+            elif code in 'FU':
+                if current is not None:
+                    argv.append(current)
+                    current = None
+                argv.extend(files)
+            elif code == 'i':
+                if icon:
+                    argv.extend(["--icon", icon])
+            elif code == 'c':
+                current = (current or "") + name
+            elif code == 'k':
+                current = (current or "") + desktop_file
+            # 其他 (已废弃的) 字段代码直接丢弃
+        elif c in "|&;<>()$`'*?":
+            command = re.sub(r"%(.)", lambda m: "%" if m.group(1) == "%" else "", exec_cmd).strip()
+            return ["/bin/sh", "-c", command]
+        else:
+            current = (current or "") + c
+        i += 1
+    if current is not None:
+        argv.append(current)
+    return argv
+
+class SingleInstanceLock:
+    """单实例锁 - 对运行时目录中的锁文件加 flock，进程退出时自动释放"""
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        """获取锁，已有实例在运行时返回 False"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self.fd = fd
+        return True
+
+    def owner_pid(self):
+        """持有锁的进程号 (读取失败时返回 None)"""
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+class ControlServer(QObject):
+    """控制 socket - 每行一个 JSON 请求 {"command": ..., "args": {...}}，每行一个 JSON 回复
+
+    命令由 handler(command, args) 在GUI线程中处理，返回值作为 result，
+    抛出 ValueError 时回复错误信息。
+    """
+    def __init__(self, path, handler, parent=None):
         super().__init__(parent)
+        self.path = path
+        self.handler = handler
+        self.buffers = {}
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        # 已持有单实例锁，残留的 socket 文件可以安全删除
+        QLocalServer.removeServer(path)
+        if not self.server.listen(path):
+            print(f"无法创建控制 socket {path}: {self.server.errorString()}")
+            return
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            self.buffers[sock] = b""
+            sock.readyRead.connect(lambda sock=sock: self.on_ready_read(sock))
+            sock.disconnected.connect(lambda sock=sock: self.on_disconnected(sock))
+
+    def on_disconnected(self, sock):
+        self.buffers.pop(sock, None)
+        sock.deleteLater()
+
+    def on_ready_read(self, sock):
+        data = self.buffers.get(sock, b"") + bytes(sock.readAll())
+        while b"\n" in data:
+            line, data = data.split(b"\n", 1)
+            if line.strip():
+                sock.write(json.dumps(self.dispatch(line), ensure_ascii=False).encode() + b"\n")
+        self.buffers[sock] = data
+        sock.flush()
+
+    def dispatch(self, line):
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            args = request.get("args") or {}
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "error": "无效的请求"}
+        try:
+            with TRACER.span(f"control {command}", "control"):
+                return {"ok": True, "result": self.handler(command, args)}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            print(f"处理控制命令 {command} 时出错: {e}")
+            return {"ok": False, "error": f"内部错误: {e}"}
+
+    def close(self):
+        self.server.close()
+
+class LauncherService:
+    """应用启动服务 - 启动时预先派生一个小进程，由它负责启动应用程序
+
+    在 proot 下 fork 大进程和执行 shell 都很慢，GUI 进程只通过 socket 发送
+    参数列表，服务进程用 posix_spawn 直接启动程序并回报耗时。
+    """
+    _instance = None
+    MAX_SAMPLES = 100
+
+    def __init__(self, sock, pid):
+        self.sock = sock
+        self.pid = pid
+        self.notifier = None
+        self.pending = {}
+        self.next_id = 0
+        self.latencies = []
+
+    @classmethod
+    def start(cls, close_fds=()):
+        """派生服务进程 - 必须在创建 QApplication (和任何线程) 之前调用
+
+        close_fds 是服务进程中要关闭的文件描述符 (如单实例锁)。
+        """
+        try:
+            parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+            pid = os.fork()
+        except (OSError, AttributeError) as e:
+            print(f"启动服务不可用，将在主进程中启动程序: {e}")
+            return None
+        if pid == 0:
+            parent_sock.close()
+            for fd in close_fds:
+                os.close(fd)
+            try:
+                cls.serve(child_sock)
+            finally:
+                os._exit(0)
+        child_sock.close()
+        parent_sock.setblocking(False)
+        cls._instance = cls(parent_sock, pid)
+        return cls._instance
+
+    @classmethod
+    def shared(cls):
+        """获取启动服务，未启动时返回 None"""
+        return cls._instance
+
+    @staticmethod
+    def serve(sock):
+        """服务进程主循环 - 主进程关闭 socket 后退出"""
+        # 自动回收子进程；终端里的 Ctrl+C 由主进程处理
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        file_actions = [
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+            (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+            (os.POSIX_SPAWN_DUP2, 1, 2),
+        ]
+        home = os.path.expanduser("~")
+        while True:
+            try:
+                data = sock.recv(65536)
+            except InterruptedError:
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+            request = json.loads(data)
+            reply = {"id": request["id"]}
+            spawn_start = time.monotonic()
+            try:
+                os.chdir(request.get("cwd") or home)
+                # 恢复默认信号处理，否则 SIG_IGN 会被启动的程序继承
+                reply["pid"] = os.posix_spawnp(request["argv"][0], request["argv"], os.environ,
+                                               file_actions=file_actions, setsid=True,
+                                               setsigdef=(signal.SIGCHLD, signal.SIGINT))
+            except OSError as e:
+                reply["error"] = str(e)
+            done = time.monotonic()
+            reply["spawn_ms"] = (done - spawn_start) * 1000
+            # CLOCK_MONOTONIC 在进程间通用，可以直接计算从双击开始的耗时
+            reply["total_ms"] = (done - request["t"]) * 1000
+            try:
+                sock.send(json.dumps(reply).encode())
+            except OSError:
+                break
+
+    def attach(self):
+        """在 GUI 事件循环中监听服务进程的回复"""
+        if self.notifier is None and QApplication.instance():
+            self.notifier = QSocketNotifier(self.sock.fileno(), QSocketNotifier.Read)
+            self.notifier.activated.connect(self.read_replies)
+
+    def launch(self, argv, cwd=None, label="", started=None):
+        """发送启动请求，服务不可用时返回 False"""
+        if self.sock is None:
+            return False
+        self.attach()
+        self.next_id += 1
+        request = {"id": self.next_id, "argv": argv, "cwd": cwd,
+                   "t": started if started is not None else time.monotonic()}
+        try:
+            self.sock.send(json.dumps(request).encode())
+        except OSError as e:
+            print(f"启动服务已断开: {e}")
+            self.shutdown()
+            return False
+        self.pending[self.next_id] = label or argv[0]
+        return True
+
+    def read_replies(self):
+        """读取服务进程回复并报告启动耗时"""
+        while self.sock is not None:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                print("启动服务进程已退出")
+                self.shutdown()
+                break
+            reply = json.loads(data)
+            label = self.pending.pop(reply["id"], "")
+            if "error" in reply:
+                print(f"无法启动 {label}: {reply['error']}")
+                QMessageBox.warning(None, "错误", f"无法启动程序: {reply['error']}")
+                continue
+            self.record(label, reply["pid"], reply["total_ms"], reply["spawn_ms"])
+
+    def record(self, label, pid, total_ms, spawn_ms=None):
+        """记录一次启动耗时"""
+        self.latencies.append(total_ms)
+        del self.latencies[:-self.MAX_SAMPLES]
+        detail = f", spawn {spawn_ms:.1f} ms" if spawn_ms is not None else ""
+        print(f"已启动 {label} (pid {pid}): 耗时 {total_ms:.1f} ms{detail}")
+
+    def shutdown(self):
+        """关闭 socket，服务进程读到 EOF 后退出"""
+        if self.notifier:
+            self.notifier.setEnabled(False)
+            self.notifier = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.waitpid(self.pid, 0)
+            except ChildProcessError:
+                pass
+
+class DesktopShortcutActions:
+    """桌面快捷方式的公共行为 - 解析、启动和右键菜单操作
+
+    由图标控件和单层绘制图标共用，宿主需提供 dialog_parent()、
+    map_to_global()、on_entry_changed() 和 hide()。
+    """
+    def init_shortcut(self, desktop_file):
+        """初始化快捷方式字段 - 没有解析结果时先用文件名作为名称"""
         self.desktop_file = desktop_file
-        self.name = ""
+        self.entry = None
+        self.name = os.path.splitext(os.path.basename(desktop_file))[0]
         self.icon_path = ""
         self.exec_cmd = ""
         self.working_dir = ""
+        self.load_token = 0
+
+    def apply_entry(self, entry):
+        """应用解析结果并更新显示"""
+        self.entry = entry
+        self.name = entry.name or self.name
+        self.icon_path = entry.icon
+        self.exec_cmd = entry.exec_cmd
+        self.working_dir = entry.working_dir
+        self.on_entry_changed()
+
+    def load_icon(self, size=64):
+        """同步加载图标 (GUI线程) - 后台加载器找不到文件时的回退"""
+        if not self.icon_path:
+            return None
+
+        # 索引命中只是一次字典查找
+        icon_file = IconThemeIndex.shared().resolve(self.icon_path, size)
+        if icon_file:
+            pixmap = QPixmap(icon_file)
+            if not pixmap.isNull():
+                return pixmap
+
+        # 索引未命中时回退到Qt主题查找
+        try:
+            theme_icon = QIcon.fromTheme(self.icon_path)
+            if not theme_icon.isNull():
+                pixmap = theme_icon.pixmap(size, size)
+                if not pixmap.isNull():
+                    return pixmap
+        except:
+            pass
+
+        return None
         
-        # 双击检测
-        self.click_timer = QTimer()
-        self.click_timer.setSingleShot(True)
-        self.click_timer.timeout.connect(self.single_click_timeout)
-        self.click_count = 0
+    def launch_application(self):
+        """启动应用程序 - 优先交给启动服务进程，不经过 shell"""
+        if not self.exec_cmd:
+            return
+        started = time.monotonic()
+        argv = expand_exec_field(self.exec_cmd, name=self.name, icon=self.icon_path,
+                                 desktop_file=self.desktop_file)
+        if not argv:
+            return
+        cwd = self.working_dir if self.working_dir and os.path.isdir(self.working_dir) else None
         
-        self.parse_desktop_file()
-        self.setup_ui()
+        launcher = LauncherService.shared()
+        if launcher and launcher.launch(argv, cwd, self.name, started):
+            return
         
-    def parse_desktop_file(self):
-        """解析.desktop文件"""
         try:
-            config = configparser.ConfigParser(strict=False)
-            config.read(self.desktop_file, encoding='utf-8')
-            
-            if 'Desktop Entry' in config:
-                desktop_entry = config['Desktop Entry']
-                self.name = desktop_entry.get('Name', '')
-                self.icon_path = desktop_entry.get('Icon', '')
-                self.exec_cmd = desktop_entry.get('Exec', '')
-                self.working_dir = desktop_entry.get('Path', '')
-                    
+            process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL, cwd=cwd, start_new_session=True)
+            print(f"已启动 {self.name} (pid {process.pid}): 耗时 {(time.monotonic() - started) * 1000:.1f} ms")
         except Exception as e:
-            print(f"解析桌面文件错误: {e}")
-            
-    def setup_ui(self):
-        """设置图标UI - 使用事件穿透实现完全透明"""
-        self.setFixedSize(100, 280)
+            QMessageBox.warning(self.dialog_parent(), "错误", f"无法启动程序: {e}")
+    
+    def show_context_menu(self, position):
+        """显示快捷方式右键菜单"""
+        menu = QMenu(self.dialog_parent())
         
-        # 关键修复：设置正确的窗口属性
-        self.setAttribute(Qt.WA_TranslucentBackground, True)
-        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
-        self.setStyleSheet("""
-            QWidget {
-                background: transparent; 
-                border: none;
+        menu.setStyleSheet("""
+            QMenu {
+                background-color: rgba(40, 40, 40, 220);
+                border: 1px solid rgba(255, 255, 255, 60);
+                border-radius: 8px;
+                padding: 5px;
             }
-            QLabel {
-                background: transparent;
-                border: none;
+            QMenu::item {
+                background-color: transparent;
+                color: white;
+                padding: 8px 20px 8px 20px;
+                border-radius: 4px;
+                margin: 2px;
+            }
+            QMenu::item:selected {
+                background-color: rgba(255, 255, 255, 50);
+            }
+            QMenu::item:pressed {
+                background-color: rgba(255, 255, 255, 80);
+            }
+            QMenu::separator {
+                height: 1px;
+                background-color: rgba(255, 255, 255, 50);
+                margin: 5px 10px 5px 10px;
             }
         """)
         
-        # 创建垂直布局
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(1)
-        layout.setAlignment(Qt.AlignCenter)
-        
-        # 图标
-        self.icon_label = QLabel()
-        self.icon_label.setAlignment(Qt.AlignCenter)
-        self.icon_label.setFixedSize(75, 75)
-        self.icon_label.setStyleSheet("""
-            QLabel {
-                background: transparent; 
-                border: none;
-                border-radius: 8px;
-            }
-            QLabel:hover {
-                background: rgba(255, 255, 255, 30);
-            }
-        """)
-        
-        # 设置图标
-        pixmap = self.load_icon()
-        if pixmap and not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(70, 70, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.icon_label.setPixmap(scaled_pixmap)
-        else:
-            self.icon_label.setText("📄")
-            self.icon_label.setStyleSheet("""
-                QLabel {
-                    font-size: 24px; 
-                    color: white; 
-                    background: transparent; 
-                    border: none;
-                    border-radius: 15px;
-                }
-                QLabel:hover {
-                    background: rgba(255, 255, 255, 30);
-                }
-            """)
-        
-        # 应用名称
-        self.name_label = QLabel(self.name)
-        self.name_label.setAlignment(Qt.AlignCenter)
-        self.name_label.setWordWrap(True)
-        self.name_label.setMaximumWidth(80)
-        self.name_label.setStyleSheet("""
-            QLabel {
-                color: white; 
-                font-weight: bold; 
-                font-size: 12px;
-                text-shadow: 1px 1px 3px black; 
-                background: transparent; 
-                border: none; 
-                padding: 2px;
-                border-radius: 4px;
-            }
-            QLabel:hover {
-                background: rgba(0, 0, 0, 80);
-            }
-        """)
-        self.name_label.setMaximumHeight(55)
-        
-        layout.addWidget(self.icon_label)
-        layout.addWidget(self.name_label)
-        
-        self.setToolTip(f"<b>{self.name}</b><br/>双击打开应用程序")
-        
-        self.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.customContextMenuRequested.connect(self.show_context_menu)
-        
-    def load_icon(self):
-        """加载图标 - 优化性能"""
-        if not self.icon_path:
-            return None
-            
-        # 直接路径检查
-        if os.path.exists(self.icon_path):
-            return QPixmap(self.icon_path)
-        
-        # 优化的图标目录搜索
-        icon_dirs = [
-            "/usr/share/pixmaps",
-            "/usr/share/icons/hicolor/48x48/apps",
-            "/usr/share/icons/hicolor/scalable/apps",  # 添加 scalable 目录
-            "/usr/share/icons/gnome/scalable/apps",
-            os.path.expanduser("~/.local/share/icons"),
-        ]
-        
-        # 先尝试主题图标（最快）
-        try:
-            theme_icon = QIcon.fromTheme(self.icon_path)
-            if not theme_icon.isNull():
-                pixmap = theme_icon.pixmap(64, 64)
-                if not pixmap.isNull():
-                    return pixmap
-        except:
-            pass
-            
-        # 然后搜索文件系统
-        icon_extensions = ["png", "svg", "xpm"]
-        for icon_dir in icon_dirs:
-            if not os.path.exists(icon_dir):
-                continue
-                
-            for ext in icon_extensions:
-                icon_pattern = os.path.join(icon_dir, f"{self.icon_path}.{ext}")
-                if os.path.exists(icon_pattern):
-                    pixmap = QPixmap(icon_pattern)
-                    if not pixmap.isNull():
-                        return pixmap
-        
-        return None
-        
-    def mousePressEvent(self, event):
-        """鼠标点击事件 - 支持双击检测"""
-        if event.button() == Qt.LeftButton:
-            self.click_count += 1
-            
-            if self.click_count == 1:
-                self.click_timer.start(250)
-            elif self.click_count == 2:
-                self.click_timer.stop()
-                self.click_count = 0
-                self.launch_application()
-        
-    def single_click_timeout(self):
-        """单击超时处理"""
-        self.click_count = 0
-        
-    def launch_application(self):
-        """启动应用程序"""
-        if self.exec_cmd:
-            try:
-                cmd = self.exec_cmd.split('%')[0].strip()
-                cmd = cmd.replace('%u', '').replace('%U', '').replace('%f', '').replace('%F', '')
-                cmd = cmd.strip()
-                
-                env = os.environ.copy()
-                if self.working_dir and os.path.exists(self.working_dir):
-                    subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL, 
-                                   stderr=subprocess.DEVNULL, cwd=self.working_dir, env=env)
-                else:
-                    subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL, 
-                                   stderr=subprocess.DEVNULL, env=env)
-            except Exception as e:
-                QMessageBox.warning(self, "错误", f"无法启动程序: {e}")
-    
-    def show_context_menu(self, position):
-        """显示快捷方式右键菜单"""
-        menu = QMenu(self)
-        
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: rgba(40, 40, 40, 220);
-                border: 1px solid rgba(255, 255, 255, 60);
-                border-radius: 8px;
-                padding: 5px;
-            }
-            QMenu::item {
-                background-color: transparent;
-                color: white;
-                padding: 8px 20px 8px 20px;
-                border-radius: 4px;
-                margin: 2px;
-            }
-            QMenu::item:selected {
-                background-color: rgba(255, 255, 255, 50);
-            }
-            QMenu::item:pressed {
-                background-color: rgba(255, 255, 255, 80);
-            }
-            QMenu::separator {
-                height: 1px;
-                background-color: rgba(255, 255, 255, 50);
-                margin: 5px 10px 5px 10px;
-            }
-        """)
-        
-        open_action = menu.addAction("📂 打开")
-        open_action.triggered.connect(self.launch_application)
+        open_action = menu.addAction("📂 打开")
+        open_action.triggered.connect(self.launch_application)
         
         location_action = menu.addAction("📁 打开文件位置")
         location_action.triggered.connect(self.open_file_location)
@@ -269,7 +1135,7 @@ class DesktopIconWidget(QWidget):
         properties_action = menu.addAction("⚙️ 属性")
         properties_action.triggered.connect(self.show_properties)
         
-        menu.exec_(self.mapToGlobal(position))
+        menu.exec_(self.map_to_global(position))
         
     def open_file_location(self):
         """打开.desktop文件所在目录"""
@@ -277,13 +1143,13 @@ class DesktopIconWidget(QWidget):
             desktop_dir = os.path.dirname(self.desktop_file)
             subprocess.Popen(['xdg-open', desktop_dir])
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"无法打开文件位置: {e}")
+            QMessageBox.warning(self.dialog_parent(), "错误", f"无法打开文件位置: {e}")
             
     def rename_shortcut(self):
         """重命名快捷方式"""
         try:
             # 创建自定义输入对话框，确保文本颜色可见
-            dialog = QInputDialog(self)
+            dialog = QInputDialog(self.dialog_parent())
             dialog.setWindowTitle("重命名")
             dialog.setLabelText("输入新的名称:")
             dialog.setTextValue(self.name)
@@ -325,22 +1191,15 @@ class DesktopIconWidget(QWidget):
             if dialog.exec_() == QDialog.Accepted:
                 new_name = dialog.textValue()
                 if new_name and new_name != self.name:
-                    # 读取并修改.desktop文件
-                    config = configparser.ConfigParser(strict=False)
-                    config.read(self.desktop_file, encoding='utf-8')
+                    # 只改写当前显示的名称键，保留文件其余内容
+                    name_key = getattr(self, 'entry', None) and self.entry.name_key or 'Name'
+                    DesktopEntry.set_key(self.desktop_file, name_key, new_name)
                     
-                    if 'Desktop Entry' in config:
-                        config['Desktop Entry']['Name'] = new_name
-                        
-                        with open(self.desktop_file, 'w', encoding='utf-8') as f:
-                            config.write(f)
-                        
-                        self.name = new_name
-                        self.name_label.setText(new_name)
-                        self.setToolTip(f"<b>{self.name}</b><br/>双击打开应用程序")
+                    self.name = new_name
+                    self.on_entry_changed()
                     
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"重命名失败: {e}")
+            QMessageBox.warning(self.dialog_parent(), "错误", f"重命名失败: {e}")
             
     def copy_shortcut(self):
         """复制快捷方式"""
@@ -359,38 +1218,32 @@ class DesktopIconWidget(QWidget):
                 new_name = f"{name} - 副本{counter}{ext}"
                 new_path = os.path.join(desktop_dir, new_name)
             
-            # 复制文件
+            # 复制文件 - 新图标由桌面目录监视自动添加
             import shutil
             shutil.copy2(self.desktop_file, new_path)
-            
-            # 刷新父窗口的图标
-            if self.parent():
-                self.parent().refresh_desktop_icons()
                 
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"复制失败: {e}")
+            QMessageBox.warning(self.dialog_parent(), "错误", f"复制失败: {e}")
             
     def delete_shortcut(self):
         """删除快捷方式"""
         try:
-            reply = QMessageBox.question(self, "确认删除", 
+            reply = QMessageBox.question(self.dialog_parent(), "确认删除", 
                                        f"确定要删除 '{self.name}' 吗？",
                                        QMessageBox.Yes | QMessageBox.No)
             
             if reply == QMessageBox.Yes:
                 os.remove(self.desktop_file)
-                # 从父窗口移除并删除自己
-                if self.parent():
-                    self.parent().remove_icon(self)
-                self.deleteLater()
+                # 先隐藏，图标由桌面目录监视在下一次同步时移除
+                self.hide()
                 
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"删除失败: {e}")
+            QMessageBox.warning(self.dialog_parent(), "错误", f"删除失败: {e}")
             
     def show_properties(self):
         """显示属性对话框"""
         try:
-            dialog = QDialog(self)
+            dialog = QDialog(self.dialog_parent())
             dialog.setWindowTitle(f"{self.name} - 属性")
             dialog.setFixedSize(450, 350)
             
@@ -491,34 +1344,1804 @@ class DesktopIconWidget(QWidget):
             dialog.exec_()
             
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"无法显示属性: {e}")
+            QMessageBox.warning(self.dialog_parent(), "错误", f"无法显示属性: {e}")
+
+    @property
+    def tooltip_text(self):
+        return f"<b>{self.name}</b><br/>双击打开应用程序"
+
+class DesktopIconWidget(DesktopShortcutActions, QWidget):
+    """桌面快捷方式图标 - 使用事件穿透实现完全透明"""
+    ICON_STYLE = """
+            QLabel {
+                background: transparent; 
+                border: none;
+                border-radius: 8px;
+            }
+            QLabel:hover {
+                background: rgba(255, 255, 255, 30);
+            }
+        """
+    PLACEHOLDER_STYLE = """
+                QLabel {
+                    font-size: 24px; 
+                    color: white; 
+                    background: transparent; 
+                    border: none;
+                    border-radius: 15px;
+                }
+                QLabel:hover {
+                    background: rgba(255, 255, 255, 30);
+                }
+            """
+
+    def __init__(self, desktop_file, parent=None, entry=None):
+        super().__init__(parent)
+        self.init_shortcut(desktop_file)
+        
+        # 双击检测
+        self.click_timer = QTimer()
+        self.click_timer.setSingleShot(True)
+        self.click_timer.timeout.connect(self.single_click_timeout)
+        self.click_count = 0
+        
+        self.setup_ui()
+        if entry is not None:
+            self.apply_entry(entry)
+        
+    def setup_ui(self):
+        """设置图标UI - 使用事件穿透实现完全透明"""
+        self.setFixedSize(100, 280)
+        
+        # 关键修复：设置正确的窗口属性
+        self.setAttribute(Qt.WA_TranslucentBackground, True)
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        self.setStyleSheet("""
+            QWidget {
+                background: transparent; 
+                border: none;
+            }
+            QLabel {
+                background: transparent;
+                border: none;
+            }
+        """)
+        
+        # 创建垂直布局
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(1)
+        layout.setAlignment(Qt.AlignCenter)
+        
+        # 图标
+        self.icon_label = QLabel()
+        self.icon_label.setAlignment(Qt.AlignCenter)
+        self.icon_label.setFixedSize(75, 75)
+        
+        # 先显示占位符，图标由后台线程解码完成后替换
+        self.set_icon_image(None)
+        
+        # 应用名称
+        self.name_label = QLabel(self.name)
+        self.name_label.setAlignment(Qt.AlignCenter)
+        self.name_label.setWordWrap(True)
+        self.name_label.setMaximumWidth(80)
+        self.name_label.setStyleSheet("""
+            QLabel {
+                color: white; 
+                font-weight: bold; 
+                font-size: 12px;
+                text-shadow: 1px 1px 3px black; 
+                background: transparent; 
+                border: none; 
+                padding: 2px;
+                border-radius: 4px;
+            }
+            QLabel:hover {
+                background: rgba(0, 0, 0, 80);
+            }
+        """)
+        self.name_label.setMaximumHeight(55)
+        
+        layout.addWidget(self.icon_label)
+        layout.addWidget(self.name_label)
+        
+        self.setToolTip(self.tooltip_text)
+        
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        
+    def mousePressEvent(self, event):
+        """鼠标点击事件 - 支持双击检测"""
+        if event.button() == Qt.LeftButton:
+            self.click_count += 1
+            
+            if self.click_count == 1:
+                self.click_timer.start(250)
+            elif self.click_count == 2:
+                self.click_timer.stop()
+                self.click_count = 0
+                self.launch_application()
+        
+    def single_click_timeout(self):
+        """单击超时处理"""
+        self.click_count = 0
+        
+    def dialog_parent(self):
+        """对话框和菜单的父控件"""
+        return self
+
+    def map_to_global(self, position):
+        """把菜单位置转换为全局坐标"""
+        return self.mapToGlobal(position)
+
+    def on_entry_changed(self):
+        """名称等字段变化后更新显示"""
+        self.name_label.setText(self.name)
+        self.setToolTip(self.tooltip_text)
+
+    def set_icon_image(self, pixmap):
+        """设置图标图像，None 表示显示占位符"""
+        if pixmap is not None and not pixmap.isNull():
+            self.icon_label.setStyleSheet(self.ICON_STYLE)
+            self.icon_label.setPixmap(pixmap)
+        else:
+            self.icon_label.setText("📄")
+            self.icon_label.setStyleSheet(self.PLACEHOLDER_STYLE)
+
+    def set_icon_size(self, icon_size, text_size):
+        """设置图标大小 (图标图像由加载器按新尺寸重新提供)"""
+        self.icon_size = icon_size
+        self.text_size = text_size
+        self.setFixedSize(icon_size + 20, icon_size + 40)
+        self.icon_label.setFixedSize(icon_size, icon_size)
+        
+        self.name_label.setStyleSheet(f"""
+            QLabel {{
+                color: white; 
+                font-weight: bold; 
+                font-size: {text_size}px; 
+                text-shadow: 1px 1px 3px black; 
+                background: transparent; 
+                border: none; 
+                padding: 2px;
+                border-radius: 4px;
+            }}
+            QLabel:hover {{
+                background: rgba(0, 0, 0, 80);
+            }}
+        """)
+        self.name_label.setMaximumWidth(icon_size + 15)
+
+class PaintedDesktopIcon(DesktopShortcutActions):
+    """单层绘制模式下的桌面图标 - 不是控件，只保存数据和缓存的图块"""
+    def __init__(self, desktop_file, layer, entry=None):
+        self.init_shortcut(desktop_file)
+        self.layer = layer
+        self.rect = QRect(0, 0, 90, 110)
+        self.icon_size = 70
+        self.text_size = 12
+        self.visible = True
+        self.icon_pixmap = None
+        self.tile = None  # 图标+文字预先绘制好的图块
+        if entry is not None:
+            self.apply_entry(entry)
+
+    def dialog_parent(self):
+        """对话框和菜单的父控件"""
+        return self.layer
+
+    def map_to_global(self, position):
+        """把图层坐标转换为全局坐标"""
+        return self.layer.mapToGlobal(position)
+
+    def on_entry_changed(self):
+        """名称等字段变化后重新生成图块"""
+        self.tile = None
+        self.layer.update(self.rect)
+
+    def set_icon_image(self, pixmap):
+        """设置图标图像，None 表示显示占位符"""
+        self.icon_pixmap = pixmap if pixmap is not None and not pixmap.isNull() else None
+        self.on_entry_changed()
+
+    def set_icon_size(self, icon_size, text_size):
+        """设置图标大小"""
+        self.icon_size = icon_size
+        self.text_size = text_size
+        self.rect.setSize(QSize(icon_size + 20, icon_size + 40))
+        self.tile = None
+        self.layer.mark_index_dirty()
+
+    def move(self, x, y):
+        """移动图标 (由布局代码调用)"""
+        if self.rect.topLeft() == QPoint(x, y):
+            return
+        self.layer.update(self.rect)
+        self.rect.moveTo(x, y)
+        self.layer.update(self.rect)
+        self.layer.mark_index_dirty()
+
+    def show(self):
+        self.visible = True
+        self.layer.update(self.rect)
+
+    def hide(self):
+        self.visible = False
+        self.layer.update(self.rect)
+
+    def raise_(self):
+        pass
+
+    def render_tile(self):
+        """把图标和名称绘制到缓存图块，之后每次重绘只需一次 drawPixmap"""
+        icon_size = self.icon_size
+        width, height = self.rect.width(), self.rect.height()
+        dpr = self.layer.devicePixelRatioF()
+        tile = QPixmap(round(width * dpr), round(height * dpr))
+        tile.setDevicePixelRatio(dpr)
+        tile.fill(Qt.transparent)
+        painter = QPainter(tile)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+
+        icon_rect = QRect((width - icon_size) // 2, 0, icon_size, icon_size)
+        pixmap = self.icon_pixmap
+        if pixmap:
+            pixmap_width = round(pixmap.width() / pixmap.devicePixelRatio())
+            pixmap_height = round(pixmap.height() / pixmap.devicePixelRatio())
+            painter.drawPixmap(icon_rect.center().x() - pixmap_width // 2 + 1,
+                               icon_rect.center().y() - pixmap_height // 2 + 1, pixmap)
+        else:
+            font = QFont()
+            font.setPixelSize(24)
+            painter.setFont(font)
+            painter.setPen(Qt.white)
+            painter.drawText(icon_rect, Qt.AlignCenter, "📄")
+
+        font = QFont()
+        font.setPixelSize(self.text_size)
+        font.setBold(True)
+        painter.setFont(font)
+        text_width = min(width, icon_size + 15)
+        text_rect = QRect((width - text_width) // 2, icon_size + 1,
+                          text_width, height - icon_size - 1)
+        flags = Qt.AlignHCenter | Qt.AlignTop | Qt.TextWordWrap
+        painter.setPen(QColor(0, 0, 0, 200))
+        painter.drawText(text_rect.translated(1, 1), flags, self.name)
+        painter.setPen(Qt.white)
+        painter.drawText(text_rect, flags, self.name)
+        painter.end()
+
+        self.tile = tile
+        return tile
+
+class PaintedIconLayer(QWidget):
+    """单层绘制的图标层 - 在一个 paintEvent 中画出全部图标
+
+    每个快捷方式不再是一棵控件树，图块预先绘制并缓存，
+    点击测试通过按网格分桶的空间索引完成。
+    """
+    item_moved = pyqtSignal(object)
+
+    BUCKET_SIZE = 128
+    DRAG_THRESHOLD = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.items = []
+        self.buckets = {}
+        self.index_dirty = True
+        self.hover_item = None
+        self.press_item = None
+        self.press_pos = None
+        self.drag_offset = None
+        self.dragging = False
+
+        self.setAttribute(Qt.WA_TranslucentBackground, True)
+        self.setMouseTracking(True)
+        if parent is not None:
+            self.setGeometry(parent.rect())
+
+    def add_item(self, item):
+        self.items.append(item)
+        self.mark_index_dirty()
+        self.update(item.rect)
+
+    def remove_item(self, item):
+        if item in self.items:
+            self.items.remove(item)
+            if self.hover_item is item:
+                self.hover_item = None
+            if self.press_item is item:
+                self.press_item = None
+                self.dragging = False
+            self.mark_index_dirty()
+            self.update(item.rect)
+
+    def mark_index_dirty(self):
+        self.index_dirty = True
+
+    def _bucket_range(self, rect):
+        size = self.BUCKET_SIZE
+        for bx in range(rect.left() // size, rect.right() // size + 1):
+            for by in range(rect.top() // size, rect.bottom() // size + 1):
+                yield bx, by
+
+    def _rebuild_index(self):
+        """重建空间索引: 网格桶 -> 与之相交的图标"""
+        buckets = {}
+        for item in self.items:
+            for key in self._bucket_range(item.rect):
+                buckets.setdefault(key, []).append(item)
+        self.buckets = buckets
+        self.index_dirty = False
+
+    def item_at(self, pos):
+        """点击测试 - 只检查所在网格桶内的图标，后绘制的优先"""
+        if self.index_dirty:
+            self._rebuild_index()
+        key = (pos.x() // self.BUCKET_SIZE, pos.y() // self.BUCKET_SIZE)
+        for item in reversed(self.buckets.get(key, ())):
+            if item.visible and item.rect.contains(pos):
+                return item
+        return None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        exposed = event.rect()
+        for item in self.items:
+            if not item.visible or not item.rect.intersects(exposed):
+                continue
+            if item is self.hover_item or item is self.press_item:
+                icon_rect = QRect(item.rect.x() + (item.rect.width() - item.icon_size) // 2,
+                                  item.rect.y(), item.icon_size, item.icon_size)
+                painter.setRenderHint(QPainter.Antialiasing)
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(QColor(255, 255, 255, 30))
+                painter.drawRoundedRect(icon_rect, 8, 8)
+            tile = item.tile or item.render_tile()
+            painter.drawPixmap(item.rect.topLeft(), tile)
+        painter.end()
+
+    def set_hover_item(self, item):
+        if item is self.hover_item:
+            return
+        if self.hover_item:
+            self.update(self.hover_item.rect)
+        self.hover_item = item
+        if item:
+            self.update(item.rect)
+
+    def event(self, event):
+        if event.type() == QEvent.ToolTip:
+            item = self.item_at(event.pos())
+            if item:
+                QToolTip.showText(event.globalPos(), item.tooltip_text, self)
+            else:
+                QToolTip.hideText()
+                event.ignore()
+            return True
+        return super().event(event)
+
+    def mousePressEvent(self, event):
+        item = self.item_at(event.pos())
+        if event.button() == Qt.LeftButton and item:
+            self.press_item = item
+            self.press_pos = event.pos()
+            self.drag_offset = event.pos() - item.rect.topLeft()
+            self.dragging = False
+            return
+        event.ignore()
+
+    def mouseMoveEvent(self, event):
+        if self.press_item and event.buttons() & Qt.LeftButton:
+            if not self.dragging and (event.pos() - self.press_pos).manhattanLength() >= self.DRAG_THRESHOLD:
+                self.dragging = True
+            if self.dragging:
+                top_left = event.pos() - self.drag_offset
+                self.press_item.move(top_left.x(), top_left.y())
+            return
+        self.set_hover_item(self.item_at(event.pos()))
+
+    def mouseReleaseEvent(self, event):
+        item = self.press_item
+        self.press_item = None
+        if item:
+            if self.dragging:
+                self.dragging = False
+                self.item_moved.emit(item)
+            self.update(item.rect)
+
+    def mouseDoubleClickEvent(self, event):
+        item = self.item_at(event.pos())
+        if event.button() == Qt.LeftButton and item:
+            item.launch_application()
+            return
+        event.ignore()
+
+    def leaveEvent(self, event):
+        self.set_hover_item(None)
+
+    def contextMenuEvent(self, event):
+        item = self.item_at(event.pos())
+        if item:
+            item.show_context_menu(event.pos())
+        else:
+            # 空白处交给图标容器显示桌面菜单
+            event.ignore()
+
+class DesktopDirectoryModel(QObject):
+    """桌面目录模型 - 监视 ~/Desktop (或 ~/桌面) 并按mtime比较出增删改的 .desktop 文件"""
+    changed = pyqtSignal(list, list, list)  # 新增, 删除, 修改
+
+    DESKTOP_DIRS = ("~/Desktop", "~/桌面")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.desktop_dir = None
+        self.entries = {}  # 路径 -> (mtime_ns, size)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_rescan)
+        self.watcher.fileChanged.connect(self.schedule_rescan)
+
+        # 合并短时间内的多次文件系统通知
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(200)
+        self.rescan_timer.timeout.connect(self.rescan)
+
+    @classmethod
+    def find_desktop_dir(cls):
+        """查找桌面目录"""
+        for dir_path in cls.DESKTOP_DIRS:
+            dir_path = os.path.expanduser(dir_path)
+            if os.path.isdir(dir_path):
+                return dir_path
+        return None
+
+    def schedule_rescan(self, *args):
+        """文件系统变化通知 - 延迟合并后再扫描"""
+        DesktopEntry.forget_programs()
+        self.rescan_timer.start()
+
+    def scan(self):
+        """扫描桌面目录，返回 (新增, 删除, 修改) 列表"""
+        desktop_dir = self.find_desktop_dir()
+        if desktop_dir != self.desktop_dir:
+            if self.desktop_dir and self.desktop_dir in self.watcher.directories():
+                self.watcher.removePath(self.desktop_dir)
+            self.desktop_dir = desktop_dir
+            if desktop_dir:
+                self.watcher.addPath(desktop_dir)
+
+        current = {}
+        if desktop_dir:
+            try:
+                with os.scandir(desktop_dir) as it:
+                    for entry in it:
+                        if not entry.name.endswith('.desktop'):
+                            continue
+                        try:
+                            if not entry.is_file():
+                                continue
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        current[entry.path] = (st.st_mtime_ns, st.st_size)
+            except OSError as e:
+                print(f"读取桌面目录错误: {e}")
+                return [], [], []
+
+        added = [p for p in current if p not in self.entries]
+        removed = [p for p in self.entries if p not in current]
+        modified = [p for p in current if p in self.entries and current[p] != self.entries[p]]
+        self.entries = current
+
+        # 被替换或删除的文件会从监视列表中消失，这里重新补上
+        watched = set(self.watcher.files())
+        stale = [p for p in watched if p not in current]
+        if stale:
+            self.watcher.removePaths(stale)
+        missing = [p for p in current if p not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+        return added, removed, modified
+
+    def rescan(self):
+        """重新扫描并在有变化时发出 changed 信号"""
+        added, removed, modified = self.scan()
+        if added or removed or modified:
+            self.changed.emit(added, removed, modified)
+        return added, removed, modified
+
+class RasterIconCache:
+    """SVG栅格化结果的磁盘缓存 - 以原始 ARGB32 像素保存在 XDG 缓存目录
+
+    键为 (源文件路径, mtime, 目标尺寸)，之后启动时一次读取即可得到图像，
+    不必再经过 QtSvg 渲染。文件名是键的散列，源文件修改或换了尺寸后旧文件不会再被用到，
+    所以目录超过 MAX_BYTES 时按最后使用时间 (命中时更新 mtime) 删除最旧的文件。
+    """
+    MAGIC = b"DWIC"
+    HEADER = struct.Struct("<4sII")
+    VECTOR_EXTENSIONS = (".svg", ".svgz")
+    MAX_BYTES = 32 * 1024 * 1024
+    PRUNE_EVERY = 32  # 每写入多少个文件检查一次目录大小 (本进程第一次写入时也检查)
+
+    _cache_dir = None
+    _stores = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def cache_dir(cls):
+        if cls._cache_dir is None:
+            cls._cache_dir = get_cache_dir("icons")
+        return cls._cache_dir
+
+    @classmethod
+    def cache_path(cls, path, mtime_ns, size):
+        digest = hashlib.sha1(f"{path}\0{mtime_ns}\0{size}".encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(cls.cache_dir(), f"{digest}.argb")
+
+    @classmethod
+    def load(cls, path, mtime_ns, size):
+        """读取缓存的栅格图像，不存在或损坏时返回None"""
+        cache_path = cls.cache_path(path, mtime_ns, size)
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            # 记录最后使用时间，清理时保留常用的图标
+            os.utime(cache_path)
+        except OSError:
+            return None
+        if len(data) < cls.HEADER.size:
+            return None
+        magic, width, height = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or len(data) != cls.HEADER.size + width * height * 4:
+            return None
+        image = QImage(data[cls.HEADER.size:], width, height, width * 4,
+                       QImage.Format_ARGB32_Premultiplied)
+        # 复制一份，图像不再引用 bytes 对象
+        return image.copy()
+
+    @classmethod
+    def store(cls, path, mtime_ns, size, image):
+        """保存栅格图像"""
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        width, height = image.width(), image.height()
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * height)
+        if image.bytesPerLine() == width * 4:
+            pixels = bytes(bits)
+        else:
+            raw = bytes(bits)
+            pixels = b"".join(raw[y * image.bytesPerLine():y * image.bytesPerLine() + width * 4]
+                              for y in range(height))
+        try:
+            write_file_atomic(cls.cache_path(path, mtime_ns, size),
+                              cls.HEADER.pack(cls.MAGIC, width, height) + pixels)
+        except OSError as e:
+            print(f"保存图标缓存失败: {e}")
+            return
+        with cls._lock:
+            cls._stores += 1
+            due = cls._stores % cls.PRUNE_EVERY == 1
+        if due:
+            cls.prune()
+
+    @classmethod
+    def prune(cls, max_bytes=None):
+        """目录超过 max_bytes 时删除最久没有使用的缓存文件，返回删除的文件数"""
+        max_bytes = cls.MAX_BYTES if max_bytes is None else max_bytes
+        files = []
+        try:
+            with os.scandir(cls.cache_dir()) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".argb") and entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return 0
+        total = sum(size for mtime, size, path in files)
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+def read_icon_image(path, size, mtime_ns=None):
+    """把图标文件解码为不超过 size 的 QImage (线程安全，SVG直接按目标尺寸栅格化)"""
+    is_vector = path.lower().endswith(RasterIconCache.VECTOR_EXTENSIONS)
+    if is_vector and mtime_ns is not None:
+        image = RasterIconCache.load(path, mtime_ns, size)
+        if image is not None:
+            return image
+
+    reader = QImageReader(path)
+    native = reader.size()
+    if native.isValid():
+        reader.setScaledSize(native.scaled(size, size, Qt.KeepAspectRatio))
+    else:
+        reader.setScaledSize(QSize(size, size))
+    image = reader.read()
+    if image.isNull():
+        return None
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    if is_vector and mtime_ns is not None:
+        RasterIconCache.store(path, mtime_ns, size, image)
+    return image
+
+class IconPixmapCache:
+    """进程内共享的图标 QPixmap 缓存 - 按 (路径, mtime, 尺寸, DPR) 缓存，超出内存预算时按LRU淘汰
+
+    许多Wine快捷方式共用同一个图标，调整图标大小时也会反复用到相同尺寸，
+    有了缓存同一图像只解码一次。get/put 只能在GUI线程调用，contains 可在任意线程调用。
+    """
+    DEFAULT_BUDGET = 32 * 1024 * 1024
+
+    _shared = None
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # key -> (QPixmap, 字节数)
+        self.total_bytes = 0
+        self.keys = set()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.keys
+
+    def get(self, key):
+        item = self.entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, pixmap):
+        if key in self.entries:
+            self.total_bytes -= self.entries.pop(key)[1]
+        cost = pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+        self.entries[key] = (pixmap, cost)
+        self.total_bytes += cost
+        with self.lock:
+            self.keys.add(key)
+            while self.total_bytes > self.budget_bytes and len(self.entries) > 1:
+                old_key, (_, old_cost) = self.entries.popitem(last=False)
+                self.total_bytes -= old_cost
+                self.keys.discard(old_key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys.clear()
+            self.total_bytes = 0
+
+class IconLoader(QObject):
+    """后台图标加载器 - 在线程池中解析 .desktop、查找图标并解码为 QImage
+
+    结果通过 loaded 信号回到GUI线程，桌面可以先用占位符立即显示，
+    首次绘制的时间与图标数量无关。
+    """
+    # 路径, 请求序号, (DesktopEntry, 缓存键, QImage, 是否由本请求解码)
+    loaded = pyqtSignal(str, int, object)
+
+    def __init__(self, parent=None, max_workers=None):
+        super().__init__(parent)
+        # 主题名只能在GUI线程读取
+        self.theme_name = QIcon.themeName()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1),
+                                           thread_name_prefix="icon-loader")
+        self.pixmap_cache = IconPixmapCache.shared()
+        self.inflight = set()
+        self.inflight_lock = threading.Lock()
+
+    def request(self, desktop_file, token, stat_key, icon_size, dpr=1.0):
+        """提交一个加载请求"""
+        self.executor.submit(self._load, desktop_file, token, stat_key, icon_size, dpr)
+
+    def _claim(self, key):
+        """同一图像只由一个请求解码：已缓存或正在解码时返回False"""
+        with self.inflight_lock:
+            if key in self.inflight or self.pixmap_cache.contains(key):
+                return False
+            self.inflight.add(key)
+            return True
+
+    def release(self, key):
+        with self.inflight_lock:
+            self.inflight.discard(key)
+
+    def is_inflight(self, key):
+        with self.inflight_lock:
+            return key in self.inflight
+
+    @TRACER.traced("icon.load", "icons")
+    def _load(self, desktop_file, token, stat_key, icon_size, dpr):
+        entry = None
+        key = None
+        image = None
+        claimed = False
+        try:
+            entry = DesktopEntry.load(desktop_file, stat_key)
+            if entry.visible and entry.icon:
+                icon_file = IconThemeIndex.shared(self.theme_name).resolve(entry.icon, icon_size)
+                if icon_file:
+                    mtime_ns = os.stat(icon_file).st_mtime_ns
+                    key = (icon_file, mtime_ns, icon_size, dpr)
+                    claimed = self._claim(key)
+                    if claimed:
+                        image = read_icon_image(icon_file, round((icon_size - 4) * dpr), mtime_ns)
+        except Exception as e:
+            print(f"加载桌面图标失败 {desktop_file}: {e}")
+        self.loaded.emit(desktop_file, token, (entry, key, image, claimed))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class IconLayoutEngine:
+    """桌面图标布局引擎 - 按单元格占用表放置图标
+
+    每个图标的单元格按 .desktop 路径记住 (跨重启保存)，新图标放到排列顺序中
+    第一个空闲单元格，原位置失效的图标放到最近的空闲单元格，不会重叠，
+    复杂度与图标数量成线性关系。
+    """
+    def __init__(self, positions=None):
+        # 排列方式 -> {路径: [列, 行]}
+        self.positions = positions or {}
+        self.dirty = False
+
+    @staticmethod
+    def fill_order(arrangement, cols, rows):
+        """按排列方式生成单元格顺序: 垂直/自由为按列，网格/水平为按行"""
+        if arrangement in ("grid", "horizontal"):
+            for row in range(rows):
+                for col in range(cols):
+                    yield col, row
+        else:
+            for col in range(cols):
+                for row in range(rows):
+                    yield col, row
+
+    @staticmethod
+    def nearest_free(col, row, cols, rows, occupied):
+        """从 (col, row) 向外逐圈查找最近的空闲单元格"""
+        col = min(max(col, 0), cols - 1)
+        row = min(max(row, 0), rows - 1)
+        for radius in range(max(cols, rows)):
+            best = None
+            best_dist = None
+            for c in range(col - radius, col + radius + 1):
+                for r in (row - radius, row + radius) if abs(c - col) != radius else range(row - radius, row + radius + 1):
+                    if 0 <= c < cols and 0 <= r < rows and (c, r) not in occupied:
+                        dist = (c - col) ** 2 + (r - row) ** 2
+                        if best is None or dist < best_dist:
+                            best, best_dist = (c, r), dist
+            if best:
+                return best
+        return None
+
+    def reset(self, arrangement):
+        """清除某种排列方式下记住的位置 (重新整齐排列)"""
+        if self.positions.pop(arrangement, None):
+            self.dirty = True
+
+    def place(self, arrangement, path, col, row, cols, rows):
+        """手动放置一个图标 (拖放)，吸附到最近的空闲单元格"""
+        saved = self.positions.setdefault(arrangement, {})
+        occupied = {tuple(cell) for other, cell in saved.items() if other != path}
+        cell = self.nearest_free(col, row, cols, rows, occupied)
+        if cell and saved.get(path) != list(cell):
+            saved[path] = list(cell)
+            self.dirty = True
+        return cell
+
+    def layout(self, arrangement, paths, cols, rows):
+        """计算所有图标的单元格，返回 {路径: (列, 行)}"""
+        saved = self.positions.setdefault(arrangement, {})
+        occupied = set()
+        result = {}
+        relocate = []
+        pending = []
+
+        # 先放置记住位置且仍然有效的图标
+        for path in paths:
+            cell = saved.get(path)
+            if cell is not None:
+                cell = tuple(cell)
+                if cell[0] < cols and cell[1] < rows and cell not in occupied:
+                    occupied.add(cell)
+                    result[path] = cell
+                else:
+                    relocate.append((path, cell))
+            else:
+                pending.append(path)
+
+        # 位置失效 (如图标变大后超出屏幕) 的图标放到最近的空闲单元格
+        for path, cell in relocate:
+            free = self.nearest_free(cell[0], cell[1], cols, rows, occupied)
+            if free is None:
+                pending.append(path)
+                continue
+            occupied.add(free)
+            result[path] = free
+
+        # 新图标按排列顺序放到第一个空闲单元格，指针只前进不回退
+        order = self.fill_order(arrangement, cols, rows)
+        overflow = 0
+        for path in pending:
+            cell = next((c for c in order if c not in occupied), None)
+            if cell is None:
+                # 屏幕已放满，继续向屏幕外排列而不是叠在已有图标上
+                if arrangement in ("grid", "horizontal"):
+                    cell = (overflow % cols, rows + overflow // cols)
+                else:
+                    cell = (cols + overflow // rows, overflow % rows)
+                overflow += 1
+            occupied.add(cell)
+            result[path] = cell
+
+        if overflow:
+            print(f"桌面空间不足，有 {overflow} 个图标超出屏幕")
+
+        new_saved = {path: list(cell) for path, cell in result.items()}
+        if new_saved != saved:
+            self.positions[arrangement] = new_saved
+            self.dirty = True
+        return result
+
+class XClientMessageEvent(ctypes.Structure):
+    _fields_ = [("type", ctypes.c_int), ("serial", ctypes.c_ulong), ("send_event", ctypes.c_int),
+                ("display", ctypes.c_void_p), ("window", ctypes.c_ulong),
+                ("message_type", ctypes.c_ulong), ("format", ctypes.c_int),
+                ("data", ctypes.c_long * 5)]
+
+class XEvent(ctypes.Union):
+    _fields_ = [("xclient", XClientMessageEvent), ("pad", ctypes.c_long * 24)]
+
+XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+class X11DesktopWindow:
+    """进程内设置桌面窗口属性 - 通过 ctypes 调用 libX11，代替 xprop/wmctrl/xdotool
+
+    所有请求排队后用一次 XSync 提交，只有一次往返。窗口可能在请求到达前已经关闭，
+    打开连接时安装的错误处理函数只计数 X 错误 (Xlib 默认会结束进程)，apply/lower 据此返回
+    请求是否成功。
+    """
+    ATOM_NAMES = ("_NET_WM_WINDOW_TYPE", "_NET_WM_WINDOW_TYPE_DESKTOP", "_NET_WM_STATE",
+                  "_NET_WM_STATE_BELOW", "_NET_WM_STATE_STICKY", "_NET_WM_DESKTOP",
+                  "_NET_CLIENT_LIST_STACKING", "_NET_ACTIVE_WINDOW", "_NET_WM_STATE_FULLSCREEN")
+    XA_ATOM = 4
+    XA_CARDINAL = 6
+    XA_WINDOW = 33
+    PROP_MODE_REPLACE = 0
+    CLIENT_MESSAGE = 33
+    SUBSTRUCTURE_MASK = (1 << 19) | (1 << 20)  # SubstructureNotify | SubstructureRedirect
+    NET_WM_STATE_ADD = 1
+    ALL_DESKTOPS = 0xFFFFFFFF
+    _instance = None
+    errors = 0  # X 错误次数 (请求后 XSync，比较前后次数判断是否出错)
+
+    def __init__(self, xlib, display):
+        self.xlib = xlib
+        self.display = display
+        self.root = xlib.XDefaultRootWindow(display)
+        names = (ctypes.c_char_p * len(self.ATOM_NAMES))(*[n.encode() for n in self.ATOM_NAMES])
+        atoms = (ctypes.c_ulong * len(self.ATOM_NAMES))()
+        xlib.XInternAtoms(display, names, len(self.ATOM_NAMES), False, atoms)
+        self.atoms = dict(zip(self.ATOM_NAMES, atoms))
+
+    @classmethod
+    def shared(cls):
+        """打开 X 连接，不是 X11 会话或没有 libX11 时返回 None"""
+        if cls._instance is None:
+            cls._instance = cls.open() or False
+        return cls._instance or None
+
+    @classmethod
+    def open(cls):
+        if QApplication.platformName() != "xcb":
+            return None
+        path = ctypes.util.find_library("X11")
+        if not path:
+            return None
+        try:
+            xlib = ctypes.CDLL(path)
+        except OSError:
+            return None
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XInternAtoms.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_char_p), ctypes.c_int,
+                                      ctypes.c_int, ctypes.POINTER(ctypes.c_ulong)]
+        xlib.XChangeProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong,
+                                         ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        xlib.XSendEvent.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_long,
+                                    ctypes.POINTER(XEvent)]
+        xlib.XLowerWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XGetWindowProperty.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_long,
+                                            ctypes.c_long, ctypes.c_int, ctypes.c_ulong,
+                                            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_int),
+                                            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                            ctypes.POINTER(ctypes.c_void_p)]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XSetErrorHandler.restype = ctypes.c_void_p
+        xlib.XSetErrorHandler.argtypes = [XErrorHandler]
+        display = xlib.XOpenDisplay(None)
+        if not display:
+            return None
+        # Xlib 默认遇到 X 错误就结束进程 (例如读取属性时窗口刚好关闭)，改为只计数。
+        # Qt 使用自己的 xcb 连接，不受影响
+        cls._error_handler = XErrorHandler(cls.on_error)
+        xlib.XSetErrorHandler(cls._error_handler)
+        return cls(xlib, display)
+
+    @staticmethod
+    def on_error(display, event):
+        X11DesktopWindow.errors += 1
+        return 0
+
+    def set_atoms(self, window, prop, prop_type, values):
+        data = (ctypes.c_long * len(values))(*values)
+        self.xlib.XChangeProperty(self.display, window, self.atoms[prop], prop_type, 32,
+                                  self.PROP_MODE_REPLACE, data, len(values))
+
+    def send_message(self, window, message_type, *values):
+        """向根窗口发送 EWMH 客户端消息 (窗口已映射时窗口管理器只认消息)"""
+        event = XEvent()
+        event.xclient.type = self.CLIENT_MESSAGE
+        event.xclient.send_event = True
+        event.xclient.window = window
+        event.xclient.message_type = self.atoms[message_type]
+        event.xclient.format = 32
+        for i, value in enumerate(values):
+            event.xclient.data[i] = value
+        self.xlib.XSendEvent(self.display, self.root, False, self.SUBSTRUCTURE_MASK, ctypes.byref(event))
+
+    def sync(self, errors):
+        """提交排队的请求，返回错误次数是否仍为 errors (请求开始前的 X11DesktopWindow.errors)"""
+        self.xlib.XSync(self.display, False)
+        return X11DesktopWindow.errors == errors
+
+    def apply(self, window):
+        """设置桌面类型、置底、粘滞、所有工作区，并降到最底层，返回是否成功"""
+        errors = X11DesktopWindow.errors
+        atoms = self.atoms
+        self.set_atoms(window, "_NET_WM_WINDOW_TYPE", self.XA_ATOM, [atoms["_NET_WM_WINDOW_TYPE_DESKTOP"]])
+        self.set_atoms(window, "_NET_WM_STATE", self.XA_ATOM,
+                       [atoms["_NET_WM_STATE_BELOW"], atoms["_NET_WM_STATE_STICKY"]])
+        self.set_atoms(window, "_NET_WM_DESKTOP", self.XA_CARDINAL, [self.ALL_DESKTOPS])
+        self.send_message(window, "_NET_WM_STATE", self.NET_WM_STATE_ADD,
+                          atoms["_NET_WM_STATE_BELOW"], atoms["_NET_WM_STATE_STICKY"], 1)
+        self.send_message(window, "_NET_WM_DESKTOP", self.ALL_DESKTOPS, 1)
+        self.xlib.XLowerWindow(self.display, window)
+        return self.sync(errors)
+
+    def get_values(self, window, prop, prop_type):
+        """读取格式为 32 的窗口属性，返回整数列表 (属性不存在时为空)"""
+        actual_type = ctypes.c_ulong()
+        actual_format = ctypes.c_int()
+        count = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        status = self.xlib.XGetWindowProperty(self.display, window, self.atoms[prop],
+                                              0, 65536, False, prop_type, ctypes.byref(actual_type),
+                                              ctypes.byref(actual_format), ctypes.byref(count),
+                                              ctypes.byref(remaining), ctypes.byref(data))
+        if status != 0 or not data.value:
+            return []
+        try:
+            # 格式为 32 的属性在 Xlib 中按 long 存放
+            values = ctypes.cast(data, ctypes.POINTER(ctypes.c_ulong))
+            return [values[i] for i in range(count.value)]
+        finally:
+            self.xlib.XFree(data)
+
+    def is_managed(self, window):
+        """窗口是否已出现在窗口管理器的 _NET_CLIENT_LIST_STACKING 中"""
+        return window in self.get_values(self.root, "_NET_CLIENT_LIST_STACKING", self.XA_WINDOW)
+
+    def fullscreen_window_active(self, ignore=()):
+        """当前活动窗口是否全屏 (游戏、视频播放器)，全屏窗口会完全挡住桌面"""
+        active = self.get_values(self.root, "_NET_ACTIVE_WINDOW", self.XA_WINDOW)
+        if not active or not active[0] or active[0] in ignore:
+            return False
+        state = self.get_values(active[0], "_NET_WM_STATE", self.XA_ATOM)
+        return self.atoms["_NET_WM_STATE_FULLSCREEN"] in state
+
+    def lower(self, window):
+        """只把窗口降到最底层，返回是否成功"""
+        errors = X11DesktopWindow.errors
+        self.xlib.XLowerWindow(self.display, window)
+        return self.sync(errors)
+
+    def close(self):
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+        X11DesktopWindow._instance = False
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int), ("shmaddr", ctypes.c_void_p),
+                ("readOnly", ctypes.c_int)]
+
+class XImageHeader(ctypes.Structure):
+    """XImage 开头的字段 (之后的函数表由 Xlib 管理)"""
+    _fields_ = [("width", ctypes.c_int), ("height", ctypes.c_int), ("xoffset", ctypes.c_int),
+                ("format", ctypes.c_int), ("data", ctypes.c_void_p), ("byte_order", ctypes.c_int),
+                ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int), ("bitmap_pad", ctypes.c_int),
+                ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int), ("bits_per_pixel", ctypes.c_int)]
+
+class XShmPresenter:
+    """MIT-SHM 显示 - 帧缓冲是 SysV 共享内存段，用 XShmPutImage 显示，像素不经过 X socket
+
+    设置了 ANDROID_SYSVSHM_SERVER 时 (Termux/termux-x11) 通过 libandroid-sysvshm 分配
+    共享内存段，其他系统使用 libc 的 SysV 接口。帧直接转换写入共享内存段 (pixels)。
+    X 服务器不支持 MIT-SHM 或者分配、附加失败时 create() 返回 None，继续使用 Qt 显示。
+
+    put() 不等待 X 服务器: 请求 ShmCompletion 事件，写入下一帧前 (wait_idle) 才确认服务器
+    已经读完上一帧。帧间隔内事件通常早已到达，只有没到时才用 XSync 等一次。
+    """
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+    Z_PIXMAP = 2
+    LSB_FIRST = 0
+    SHM_COMPLETION = 0
+
+    def __init__(self, x11, xext, shm_lib, window, width, height):
+        self.x11 = x11
+        self.xext = xext
+        self.shm_lib = shm_lib
+        self.window = window
+        self.width = width
+        self.height = height
+        self.info = XShmSegmentInfo(shmid=-1)
+        self.image = None
+        self.gc = None
+        self.attached = False
+        self.pixels = None
+        self.completion_type = None
+        self.pending = 0
+        self.event = XEvent()
+
+    @staticmethod
+    def load_shm_library():
+        if os.environ.get("ANDROID_SYSVSHM_SERVER"):
+            path = ctypes.util.find_library("android-sysvshm") or "libandroid-sysvshm.so"
+        else:
+            path = ctypes.util.find_library("c")
+        lib = ctypes.CDLL(path, use_errno=True)
+        lib.shmget.restype = ctypes.c_int
+        lib.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        lib.shmat.restype = ctypes.c_void_p
+        lib.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        lib.shmdt.argtypes = [ctypes.c_void_p]
+        lib.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        return lib
+
+    @classmethod
+    def create(cls, window, width, height):
+        """为原生窗口创建共享内存帧缓冲，不可用时返回 None"""
+        x11 = X11DesktopWindow.shared()
+        path = ctypes.util.find_library("Xext")
+        if not x11 or not path:
+            return None
+        try:
+            xext = ctypes.CDLL(path)
+            shm_lib = cls.load_shm_library()
+        except OSError as e:
+            print(f"无法加载共享内存库: {e}")
+            return None
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.c_void_p
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmPutImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_void_p,
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                                      ctypes.c_uint, ctypes.c_uint, ctypes.c_int]
+        xext.XShmGetEventBase.argtypes = [ctypes.c_void_p]
+        xlib = x11.xlib
+        xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultVisual.restype = ctypes.c_void_p
+        xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        xlib.XCreateGC.restype = ctypes.c_void_p
+        xlib.XCreateGC.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_void_p]
+        xlib.XFreeGC.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        xlib.XCheckTypedWindowEvent.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+                                                ctypes.POINTER(XEvent)]
+        xlib.XFlush.argtypes = [ctypes.c_void_p]
+        if not xext.XShmQueryExtension(x11.display):
+            print("X 服务器不支持 MIT-SHM")
+            return None
+        presenter = cls(x11, xext, shm_lib, window, width, height)
+        presenter.completion_type = xext.XShmGetEventBase(x11.display) + cls.SHM_COMPLETION
+        if not presenter.attach():
+            presenter.close()
+            return None
+        return presenter
+
+    def attach(self):
+        """分配共享内存段并让 X 服务器附加 (close() 之后可以再次调用)"""
+        xlib = self.x11.xlib
+        display = self.x11.display
+        self.info = XShmSegmentInfo(shmid=-1)
+        self.pending = 0
+        screen = xlib.XDefaultScreen(display)
+        self.image = self.xext.XShmCreateImage(display, xlib.XDefaultVisual(display, screen),
+                                               xlib.XDefaultDepth(display, screen), self.Z_PIXMAP, None,
+                                               ctypes.byref(self.info), self.width, self.height)
+        if not self.image:
+            return False
+        header = ctypes.cast(self.image, ctypes.POINTER(XImageHeader)).contents
+        if (header.bits_per_pixel != 32 or header.bytes_per_line != self.width * 4
+                or header.byte_order != self.LSB_FIRST):
+            print(f"不支持的 X 图像格式: {header.bits_per_pixel} 位/像素")
+            return False
+        
+        size = header.bytes_per_line * self.height
+        self.info.shmid = self.shm_lib.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            print(f"无法分配共享内存: {os.strerror(ctypes.get_errno())}")
+            return False
+        address = self.shm_lib.shmat(self.info.shmid, None, 0)
+        if address is None or address == ctypes.c_void_p(-1).value:
+            print(f"无法附加共享内存: {os.strerror(ctypes.get_errno())}")
+            self.shm_lib.shmctl(self.info.shmid, self.IPC_RMID, None)
+            return False
+        self.info.shmaddr = address
+        self.info.readOnly = False
+        header.data = address
+        self.pixels = np.ctypeslib.as_array((ctypes.c_uint8 * size).from_address(address))
+        self.pixels = self.pixels.reshape(self.height, self.width, 4)
+        self.gc = xlib.XCreateGC(display, self.window, 0, None)
+        
+        # 远程 X 服务器无法访问共享内存时附加会产生 X 错误
+        errors = X11DesktopWindow.errors
+        self.xext.XShmAttach(display, ctypes.byref(self.info))
+        xlib.XSync(display, False)
+        # X 服务器已经附加 (或失败)，标记删除后所有进程分离时自动释放
+        self.shm_lib.shmctl(self.info.shmid, self.IPC_RMID, None)
+        if X11DesktopWindow.errors != errors or not self.gc:
+            print("X 服务器无法附加共享内存")
+            return False
+        # 所有步骤都成功后才标记，失败时 close() 不会分离服务器没有附加的段
+        self.attached = True
+        return True
+
+    def wait_idle(self):
+        """等待 X 服务器读完已提交的帧 (ShmCompletion 事件)，之后才能改写共享内存段"""
+        xlib = self.x11.xlib
+        display = self.x11.display
+        while self.pending and xlib.XCheckTypedWindowEvent(display, self.window, self.completion_type,
+                                                           ctypes.byref(self.event)):
+            self.pending -= 1
+        if self.pending:
+            # 事件还没到: 等一次往返，之后所有完成事件都已在队列中
+            xlib.XSync(display, False)
+            while xlib.XCheckTypedWindowEvent(display, self.window, self.completion_type,
+                                              ctypes.byref(self.event)):
+                pass
+            self.pending = 0
+
+    def write_bgr(self, frame):
+        """把 OpenCV 的 BGR 帧直接转换写入共享内存段"""
+        self.wait_idle()
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self.pixels)
+        return True
+
+    def write_rgb(self, frame):
+        self.wait_idle()
+        cv2.cvtColor(frame, cv2.COLOR_RGB2BGRA, dst=self.pixels)
+        return True
+
+    def write_image(self, image):
+        """写入 QImage (静态帧)，尺寸不同时先缩放"""
+        image = image.convertToFormat(QImage.Format_RGB32)
+        if image.width() != self.width or image.height() != self.height:
+            image = image.scaled(self.width, self.height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        pointer = image.constBits()
+        pointer.setsize(image.sizeInBytes())
+        self.wait_idle()
+        self.pixels[:] = np.frombuffer(pointer, np.uint8).reshape(self.height, image.bytesPerLine() // 4, 4)[:, :self.width]
+
+    def snapshot(self):
+        """当前帧的 QImage 副本"""
+        return QImage(self.pixels.data, self.width, self.height, self.width * 4, QImage.Format_RGB32).copy()
+
+    def put(self):
+        """提交当前帧，不等待 X 服务器 (完成时发送 ShmCompletion 事件，见 wait_idle)"""
+        if not self.attached:
+            return
+        self.xext.XShmPutImage(self.x11.display, self.window, self.gc, self.image, 0, 0, 0, 0,
+                               self.width, self.height, True)
+        self.x11.xlib.XFlush(self.x11.display)
+        self.pending += 1
+
+    def close(self):
+        display = self.x11.display
+        if self.attached and display:
+            self.wait_idle()
+            self.xext.XShmDetach(display, ctypes.byref(self.info))
+            self.x11.xlib.XSync(display, False)
+        self.attached = False
+        self.pixels = None
+        if self.info.shmaddr:
+            self.shm_lib.shmdt(self.info.shmaddr)
+            self.info.shmaddr = None
+        if self.gc and display:
+            self.x11.xlib.XFreeGC(display, self.gc)
+            self.gc = None
+        if self.image:
+            # data 指向共享内存段，只释放 XImage 结构本身
+            ctypes.cast(self.image, ctypes.POINTER(XImageHeader)).contents.data = None
+            self.x11.xlib.XFree(self.image)
+            self.image = None
+
+class XShmVideoSurface(QWidget):
+    """MIT-SHM 显示用的原生子窗口 - Qt 不绘制它，重绘时重新提交当前帧"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_NativeWindow, True)
+        self.setAttribute(Qt.WA_PaintOnScreen, True)
+        self.setAttribute(Qt.WA_NoSystemBackground, True)
+        self.setAttribute(Qt.WA_OpaquePaintEvent, True)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents, True)
+        self.presenter = None
+
+    def paintEngine(self):
+        return None
+
+    def paintEvent(self, event):
+        if self.presenter:
+            self.presenter.put()
+
+class LegacyDesktopSettings:
+    """原桌面的背景设置 - 只检测一次桌面环境，批量修改对应后端，退出时恢复原值
+
+    原值保存在缓存目录中，异常退出后下次启动不会把已修改的值当成原值。
+    """
+    GNOME_DIR = "/org/gnome/desktop/background/"
+    GNOME_SCHEMA = "org.gnome.desktop.background"
+    # 值使用 GVariant 文本格式 (与 dconf dump / gsettings get 一致)
+    GNOME_VALUES = (("show-desktop-icons", "false"), ("picture-uri", "''"),
+                    ("primary-color", "'#000000'"), ("draw-background", "false"))
+    XFCE_VALUES = (("xfce4-desktop", "/backdrop/screen0/monitor0/image-path", ""),)
+    _desktop = None
+
+    def __init__(self):
+        self.state_path = os.path.join(get_cache_dir(), "desktop_state.json")
+        self.applied = False
+        try:
+            with open(self.state_path) as f:
+                self.saved = json.load(f)
+        except (OSError, ValueError):
+            self.saved = None
+
+    @classmethod
+    def detect(cls):
+        """检测桌面环境: xfce、gnome 或 other，只读环境变量，不启动进程"""
+        if cls._desktop is None:
+            names = ":".join((os.environ.get("XDG_CURRENT_DESKTOP", ""),
+                              os.environ.get("DESKTOP_SESSION", ""))).lower()
+            if "xfce" in names:
+                cls._desktop = "xfce"
+            elif any(name in names for name in ("gnome", "unity", "ubuntu", "budgie", "pantheon")):
+                cls._desktop = "gnome"
+            elif names.strip(":"):
+                cls._desktop = "other"
+            elif shutil.which("xfconf-query"):
+                cls._desktop = "xfce"
+            elif shutil.which("dconf") or shutil.which("gsettings"):
+                cls._desktop = "gnome"
+            else:
+                cls._desktop = "other"
+            print(f"检测到桌面环境: {cls._desktop}")
+        return cls._desktop
+
+    def suppress(self):
+        """隐藏原桌面背景，每次会话只执行一次"""
+        if self.applied:
+            return
+        self.applied = True
+        desktop = self.detect()
+        if desktop == "other":
+            return
+        
+        if self.saved is None:
+            if desktop == "xfce":
+                values = self.read_xfce()
+            else:
+                values = self.read_gnome()
+            self.saved = {"desktop": desktop, "values": values}
+            try:
+                write_file_atomic(self.state_path, json.dumps(self.saved))
+            except OSError as e:
+                print(f"无法保存原桌面设置: {e}")
+        
+        if desktop == "xfce":
+            self.write_xfce([(c, p, v) for c, p, v in self.XFCE_VALUES
+                             if f"{c}:{p}" in self.saved["values"]])
+        else:
+            self.write_gnome(dict(self.GNOME_VALUES))
+
+    def restore(self):
+        """恢复保存的原值"""
+        if not self.saved:
+            return
+        values = self.saved["values"]
+        try:
+            if self.saved["desktop"] == "xfce":
+                self.write_xfce([(*key.split(":", 1), value) for key, value in values.items()])
+            else:
+                self.write_gnome(values)
+            os.remove(self.state_path)
+            print("已恢复原桌面设置")
+        except Exception as e:
+            print(f"恢复原桌面设置时出错: {e}")
+        self.saved = None
+
+    @staticmethod
+    def xfconf():
+        """xfconf 的 D-Bus 接口，不可用时返回 None"""
+        if QDBusConnection is None:
+            return None
+        iface = QDBusInterface("org.xfce.Xfconf", "/org/xfce/Xfconf", "org.xfce.Xfconf",
+                               QDBusConnection.sessionBus())
+        return iface if iface.isValid() else None
+
+    def read_xfce(self):
+        """读取 xfce 原值 {"通道:属性": 值}，不存在的属性不记录"""
+        values = {}
+        iface = self.xfconf()
+        for channel, prop, _ in self.XFCE_VALUES:
+            if iface:
+                reply = iface.call("GetProperty", channel, prop)
+                if reply.type() != QDBusMessage.ErrorMessage:
+                    values[f"{channel}:{prop}"] = reply.arguments()[0]
+                continue
+            try:
+                result = subprocess.run(['xfconf-query', '-c', channel, '-p', prop],
+                                        capture_output=True, text=True, timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                continue
+            if result.returncode == 0:
+                values[f"{channel}:{prop}"] = result.stdout.rstrip("\n")
+        return values
+
+    def write_xfce(self, items):
+        iface = self.xfconf()
+        for channel, prop, value in items:
+            if iface:
+                iface.call("SetProperty", channel, prop, QDBusVariant(value))
+            else:
+                subprocess.run(['xfconf-query', '-c', channel, '-p', prop, '-s', value],
+                               capture_output=True, timeout=5)
+
+    def read_gnome(self):
+        """读取 GNOME 原值 {键: GVariant 文本}，值为 None 表示原来是默认值"""
+        values = {key: None for key, _ in self.GNOME_VALUES}
+        if shutil.which("dconf"):
+            result = subprocess.run(['dconf', 'dump', self.GNOME_DIR],
+                                    capture_output=True, text=True, timeout=5)
+            for line in result.stdout.splitlines():
+                key, sep, value = line.partition("=")
+                if sep and key in values:
+                    values[key] = value
+            return values
+        for key in values:
+            try:
+                result = subprocess.run(['gsettings', 'get', self.GNOME_SCHEMA, key],
+                                        capture_output=True, text=True, timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                break
+            if result.returncode == 0:
+                values[key] = result.stdout.strip()
+        return values
+
+    def write_gnome(self, values):
+        """写入 GNOME 设置 - 有 dconf 时一次 dconf load 完成"""
+        changed = {key: value for key, value in values.items() if value is not None}
+        reset = [key for key, value in values.items() if value is None]
+        if shutil.which("dconf"):
+            if changed:
+                keyfile = "[/]\n" + "".join(f"{key}={value}\n" for key, value in changed.items())
+                subprocess.run(['dconf', 'load', self.GNOME_DIR], input=keyfile,
+                               capture_output=True, text=True, timeout=5)
+            for key in reset:
+                subprocess.run(['dconf', 'reset', self.GNOME_DIR + key], capture_output=True, timeout=5)
+            return
+        for key, value in changed.items():
+            subprocess.run(['gsettings', 'set', self.GNOME_SCHEMA, key, value], capture_output=True, timeout=5)
+        for key in reset:
+            subprocess.run(['gsettings', 'reset', self.GNOME_SCHEMA, key], capture_output=True, timeout=5)
+
+class SettingsStore:
+    """合并写入的设置 - 只记录变化的键，短时间内的多次修改合并为一次写入
+
+    接口与 QSettings 的 value/setValue 相同。修改停止 DEBOUNCE_MS 后写入，
+    持续修改时最迟 MAX_DELAY_MS 写入一次，退出时立即写入。
+    QSettings.sync() 通过 QSaveFile 写临时文件再重命名，写入是原子的。
+    """
+    DEBOUNCE_MS = 500
+    MAX_DELAY_MS = 3000
+
+    def __init__(self, organization, application):
+        self.settings = QSettings(organization, application)
+        self.values = {}  # 文件中的值 (读取或上次写入)
+        self.dirty = {}
+        self.first_dirty = None
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        atexit.register(self.flush)
+
+    def value(self, key, default=None, type=None):
+        value = self.settings.value(key, default, type=type) if type else self.settings.value(key, default)
+        self.values[key] = value
+        return value
+
+    def setValue(self, key, value):
+        """记录修改，值没有变化时不做任何事"""
+        if key in self.dirty:
+            if self.dirty[key] == value:
+                return
+        elif key in self.values and self.values[key] == value:
+            return
+        self.dirty[key] = value
+        self.schedule()
+
+    def schedule(self):
+        now = time.monotonic()
+        if self.first_dirty is None:
+            self.first_dirty = now
+        remaining = self.MAX_DELAY_MS - (now - self.first_dirty) * 1000
+        self.timer.start(int(max(0, min(self.DEBOUNCE_MS, remaining))))
+
+    def flush(self):
+        """立即写入所有修改过的键"""
+        try:
+            self.timer.stop()
+        except RuntimeError:
+            pass  # atexit 时 QTimer 可能已随 QApplication 销毁
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, {}
+        self.first_dirty = None
+        for key, value in dirty.items():
+            self.settings.setValue(key, value)
+        self.settings.sync()
+        if self.settings.status() != QSettings.NoError:
+            print(f"保存设置失败: {self.settings.fileName()}")
+            return
+        self.values.update(dirty)
+        print(f"设置已保存 ({len(dirty)} 项)")
+
+class ThumbnailCache:
+    """缩略图缓存 - 使用 freedesktop 缩略图规范的目录结构，与文件管理器共享
+
+    缩略图保存为 ~/.cache/thumbnails/normal/<md5(URI)>.png，Thumb::URI 和
+    Thumb::MTime 记录原文件，文件修改后自动失效；生成失败的文件记录在
+    fail/ 目录下，不会重复尝试。
+    """
+    SIZE = 128  # normal 尺寸
+    FAIL_DIR = "dynamic-wallpaper"
+    VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv", ".webm", ".m4v")
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tiff", ".webp")
+
+    def __init__(self):
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        self.root = os.path.join(base, "thumbnails")
+
+    @staticmethod
+    def uri_for(path):
+        return "file://" + urllib.parse.quote(os.path.abspath(path), safe="/!$&'()*+,;=:@~")
+
+    def thumbnail_path(self, uri, flavor="normal"):
+        name = hashlib.md5(uri.encode()).hexdigest() + ".png"
+        if flavor == "fail":
+            return os.path.join(self.root, "fail", self.FAIL_DIR, name)
+        return os.path.join(self.root, flavor, name)
+
+    PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+    @classmethod
+    def read_png_text(cls, thumb_path):
+        """读取 PNG 在图像数据之前的 tEXt 字段 (Qt 会把键名中的 ':' 当作分隔符，只能自己解析)"""
+        fields = {}
+        try:
+            with open(thumb_path, "rb") as f:
+                if f.read(8) != cls.PNG_SIGNATURE:
+                    return fields
+                while True:
+                    header = f.read(8)
+                    if len(header) < 8:
+                        break
+                    length, chunk_type = struct.unpack(">I4s", header)
+                    if chunk_type in (b"IDAT", b"IEND"):
+                        break
+                    data = f.read(length)
+                    f.seek(4, os.SEEK_CUR)  # CRC
+                    if chunk_type == b"tEXt":
+                        key, _, value = data.partition(b"\0")
+                        fields[key.decode("latin-1")] = value.decode("latin-1")
+        except OSError:
+            pass
+        return fields
+
+    @classmethod
+    def add_png_text(cls, png_data, fields):
+        """在 IHDR 之后插入 tEXt 字段"""
+        ihdr_end = 8 + 8 + 13 + 4
+        chunks = b""
+        for key, value in fields.items():
+            data = key.encode("latin-1") + b"\0" + value.encode("latin-1")
+            chunks += (struct.pack(">I", len(data)) + b"tEXt" + data
+                       + struct.pack(">I", zlib.crc32(b"tEXt" + data) & 0xFFFFFFFF))
+        return png_data[:ihdr_end] + chunks + png_data[ihdr_end:]
+
+    @classmethod
+    def matches(cls, thumb_path, uri, mtime):
+        """缩略图存在且与原文件的 URI 和修改时间一致"""
+        fields = cls.read_png_text(thumb_path)
+        return fields.get("Thumb::URI") == uri and fields.get("Thumb::MTime") == str(mtime)
+
+    def lookup(self, path):
+        """返回 (缩略图路径, 是否已知失败)，没有有效缩略图时路径为 None"""
+        uri = self.uri_for(path)
+        mtime = int(os.stat(path).st_mtime)
+        thumb_path = self.thumbnail_path(uri)
+        if self.matches(thumb_path, uri, mtime):
+            return thumb_path, False
+        return None, self.matches(self.thumbnail_path(uri, "fail"), uri, mtime)
+
+    def load_or_create(self, path):
+        """读取或生成缩略图 (在工作线程中调用)，失败时返回 None"""
+        thumb_path, failed = self.lookup(path)
+        if thumb_path:
+            return QImage(thumb_path)
+        if failed:
+            return None
+        image = self.render(path)
+        uri = self.uri_for(path)
+        stat = os.stat(path)
+        if image is None or image.isNull():
+            # 失败标记是 1x1 透明图片 (新建的 QImage 像素未初始化)
+            marker = QImage(1, 1, QImage.Format_ARGB32)
+            marker.fill(Qt.transparent)
+            self.save(marker, self.thumbnail_path(uri, "fail"), uri, stat)
+            return None
+        self.save(image, self.thumbnail_path(uri), uri, stat)
+        return image
+
+    def render(self, path):
+        if path.lower().endswith(self.VIDEO_EXTENSIONS):
+            return self.render_video(path)
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        native = reader.size()
+        if native.isValid():
+            reader.setScaledSize(native.scaled(self.SIZE, self.SIZE, Qt.KeepAspectRatio)
+                                 if native.width() > self.SIZE or native.height() > self.SIZE else native)
+        return reader.read()
+
+    def render_video(self, path):
+        """解码视频 10% 处的一帧作为缩略图 (跳过片头黑屏)"""
+        if not import_video_modules():
+            return None
+        cap = cv2.VideoCapture(path)
+        try:
+            if not cap.isOpened():
+                return None
+            frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+            if frame_count > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_count * 0.1))
+            ret, frame = cap.read()
+            if not ret:
+                return None
+            height, width = frame.shape[:2]
+            scale = min(1.0, self.SIZE / max(width, height))
+            if scale < 1.0:
+                frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            height, width = rgb.shape[:2]
+            return QImage(rgb.data, width, height, rgb.strides[0], QImage.Format_RGB888).copy()
+        finally:
+            cap.release()
+
+    @classmethod
+    def save(cls, image, thumb_path, uri, stat):
+        """按规范写入 PNG 文本字段，先写临时文件再重命名"""
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        if not image.save(buffer, "PNG"):
+            return
+        png_data = cls.add_png_text(bytes(buffer.data()), {
+            "Thumb::URI": uri,
+            "Thumb::MTime": str(int(stat.st_mtime)),
+            "Thumb::Size": str(stat.st_size),
+            "Software": "DynamicWallpaper",
+        })
+        os.makedirs(os.path.dirname(thumb_path), mode=0o700, exist_ok=True)
+        tmp_path = f"{thumb_path}.tmp{os.getpid()}.{threading.get_ident()}"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(png_data)
+        os.replace(tmp_path, thumb_path)
+
+class ThumbnailLoader(QObject):
+    """后台缩略图加载器 - 在线程池中读取或生成缩略图，结果通过信号回到GUI线程"""
+    ready = pyqtSignal(str, object)  # 文件路径, QImage 或 None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cache = ThumbnailCache()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnailer")
+
+    def request(self, path):
+        self.executor.submit(self._load, path)
+
+    @TRACER.traced("thumbnail.load", "thumbnails")
+    def _load(self, path):
+        try:
+            image = self.cache.load_or_create(path)
+        except Exception as e:
+            print(f"生成缩略图失败 {path}: {e}")
+            image = None
+        self.ready.emit(path, image)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class WallpaperGalleryDialog(QDialog):
+    """壁纸选择对话框 - 显示文件夹中视频和图片的缩略图"""
+    def __init__(self, kind, directory, parent=None):
+        super().__init__(parent)
+        self.kind = kind
+        self.extensions = ThumbnailCache.VIDEO_EXTENSIONS if kind == "video" else ThumbnailCache.IMAGE_EXTENSIONS
+        self.directory = directory
+        self.selected_path = None
+        self.items = {}
+        self.loader = ThumbnailLoader(self)
+        self.loader.ready.connect(self.on_thumbnail_ready)
+        self.setWindowTitle("选择视频文件" if kind == "video" else "选择图片文件")
+        self.resize(760, 520)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: rgba(50, 50, 50, 240);
+                border: 2px solid rgba(255, 255, 255, 80);
+                border-radius: 12px;
+                color: white;
+            }
+            QLabel {
+                color: white;
+                background: transparent;
+            }
+            QListWidget {
+                background-color: rgba(30, 30, 30, 200);
+                color: white;
+                border: 1px solid rgba(255, 255, 255, 60);
+                border-radius: 6px;
+            }
+            QListWidget::item:selected {
+                background-color: rgba(255, 255, 255, 60);
+            }
+            QPushButton {
+                background-color: rgba(70, 70, 70, 200);
+                color: white;
+                border: 1px solid rgba(255, 255, 255, 60);
+                border-radius: 6px;
+                padding: 8px 15px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: rgba(90, 90, 90, 220);
+            }
+        """)
+        self.setup_ui()
+        self.load_directory(directory)
 
-    def set_icon_size(self, icon_size, text_size):
-        """设置图标大小"""
-        self.setFixedSize(icon_size + 20, icon_size + 40)
-        self.icon_label.setFixedSize(icon_size, icon_size)
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
         
-        pixmap = self.load_icon()
-        if pixmap and not pixmap.isNull():
-            scaled_pixmap = pixmap.scaled(icon_size - 4, icon_size - 4, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.icon_label.setPixmap(scaled_pixmap)
+        self.path_label = QLabel()
+        layout.addWidget(self.path_label)
         
-        self.name_label.setStyleSheet(f"""
-            QLabel {{
-                color: white; 
-                font-weight: bold; 
-                font-size: {text_size}px; 
-                text-shadow: 1px 1px 3px black; 
-                background: transparent; 
-                border: none; 
-                padding: 2px;
-                border-radius: 4px;
-            }}
-            QLabel:hover {{
-                background: rgba(0, 0, 0, 80);
-            }}
-        """)
-        self.name_label.setMaximumWidth(icon_size + 15)
+        self.list_widget = QListWidget()
+        self.list_widget.setViewMode(QListView.IconMode)
+        self.list_widget.setIconSize(QSize(ThumbnailCache.SIZE, ThumbnailCache.SIZE))
+        self.list_widget.setGridSize(QSize(ThumbnailCache.SIZE + 24, ThumbnailCache.SIZE + 40))
+        self.list_widget.setResizeMode(QListView.Adjust)
+        self.list_widget.setMovement(QListView.Static)
+        self.list_widget.setWordWrap(True)
+        self.list_widget.setUniformItemSizes(True)
+        self.list_widget.itemDoubleClicked.connect(lambda item: self.choose(item))
+        layout.addWidget(self.list_widget)
+        
+        button_layout = QHBoxLayout()
+        folder_button = QPushButton("其他文件夹...")
+        folder_button.clicked.connect(self.browse_directory)
+        open_button = QPushButton("打开")
+        open_button.clicked.connect(lambda: self.choose(self.list_widget.currentItem()))
+        cancel_button = QPushButton("取消")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(folder_button)
+        button_layout.addStretch()
+        button_layout.addWidget(open_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+    def load_directory(self, directory):
+        """列出文件夹中的文件，先显示占位图标，缩略图在后台生成"""
+        self.directory = directory
+        self.path_label.setText(directory)
+        self.list_widget.clear()
+        self.items.clear()
+        try:
+            names = sorted(os.listdir(directory), key=str.lower)
+        except OSError as e:
+            print(f"无法读取文件夹 {directory}: {e}")
+            return
+        placeholder = QIcon.fromTheme("video-x-generic" if self.kind == "video" else "image-x-generic")
+        for name in names:
+            path = os.path.join(directory, name)
+            if not name.lower().endswith(self.extensions) or not os.path.isfile(path):
+                continue
+            item = QListWidgetItem(placeholder, name)
+            item.setData(Qt.UserRole, path)
+            item.setToolTip(path)
+            self.list_widget.addItem(item)
+            self.items[path] = item
+            self.loader.request(path)
+
+    def on_thumbnail_ready(self, path, image):
+        item = self.items.get(path)
+        if item is not None and image is not None and not image.isNull():
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def browse_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择文件夹", self.directory)
+        if directory:
+            self.load_directory(directory)
+
+    def choose(self, item):
+        if item is None:
+            return
+        self.selected_path = item.data(Qt.UserRole)
+        self.accept()
+
+    def done(self, result):
+        self.loader.shutdown()
+        super().done(result)
 
 class IconSizeDialog(QDialog):
     """图标大小设置对话框"""
@@ -640,10 +3263,11 @@ class IconSizeDialog(QDialog):
         self.accept()
 
 class PlaybackSpeedDialog(QDialog):
-    """播放速度设置对话框"""
+    """播放速度设置对话框 - 拖动滑块时实时预览，取消时恢复原来的速度"""
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.parent = parent
+        self.main_window = parent  # 保存对主窗口的引用
+        self.original_speed = getattr(parent, "playback_speed", 100)
         self.setWindowTitle("设置播放速度")
         self.setFixedSize(350, 200)
         self.setStyleSheet("""
@@ -698,8 +3322,8 @@ class PlaybackSpeedDialog(QDialog):
         speed_label.setFixedWidth(80)
         self.speed_slider = QSlider(Qt.Horizontal)
         self.speed_slider.setRange(10, 300)  # 10% 到 300%
-        self.speed_slider.setValue(100)  # 默认100%
-        self.speed_value = QLabel("100%")
+        self.speed_slider.setValue(self.original_speed)
+        self.speed_value = QLabel(f"{self.original_speed}%")
         self.speed_value.setFixedWidth(50)
         
         speed_layout.addWidget(speed_label)
@@ -745,23 +3369,170 @@ class PlaybackSpeedDialog(QDialog):
         button_layout.addWidget(cancel_button)
         
         self.speed_slider.valueChanged.connect(lambda v: self.speed_value.setText(f"{v}%"))
+        self.speed_slider.valueChanged.connect(self.preview_speed)
         
         layout.addLayout(speed_layout)
         layout.addLayout(preset_layout)
         layout.addStretch()
         layout.addLayout(button_layout)
         
+    def preview_speed(self, speed_percent):
+        """拖动时只改变播放时钟的速率，不保存设置"""
+        player = getattr(self.main_window, "opencv_player", None)
+        if player:
+            player.set_playback_speed(speed_percent)
+        
+    def reject(self):
+        self.preview_speed(self.original_speed)
+        super().reject()
+        
     def apply_changes(self):
         """应用速度更改"""
         speed_percent = self.speed_slider.value()
         
-        if self.parent:
-            self.parent.set_playback_speed(speed_percent)
+        if self.main_window:
+            self.main_window.set_playback_speed(speed_percent)
         
         self.accept()
 
+def rgb_frame_to_pixmap(frame):
+    """把 RGB 帧 (numpy 数组) 转换成 QPixmap，转换时复制像素，之后不再引用 frame"""
+    height, width = frame.shape[:2]
+    image = QImage(frame.data, width, height, width * 3, QImage.Format_RGB888)
+    return QPixmap.fromImage(image)
+
+class DecoderProcess:
+    """独立的解码进程 - 解码和缩放在子进程中进行，GUI 只从共享内存取帧显示
+
+    子进程用 subprocess 运行 video_decoder.py (不导入 Qt)，命令通过 socketpair 上的
+    Connection 传递。解码进程崩溃或卡住时 restart() 重新启动它并恢复到原来的视频和位置，不影响 GUI。
+    共享内存不可用 (例如 proot 中没有 /dev/shm) 时构造函数抛出 OSError。
+    """
+    LOAD_TIMEOUT = 10.0
+
+    def __init__(self, screen_width, screen_height):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.ring = SharedFrameRing(screen_width, screen_height, get_runtime_dir())
+        self.ring.rate = 1.0
+        self.process = None
+        self.conn = None
+        self.loaded = False
+        self.load_args = None
+        self.controls = {}
+        self.playing = False
+        self.position = 0
+        self.restarts = 0
+        atexit.register(self.close)
+        self.start()
+
+    def start(self):
+        parent_sock, child_sock = socket.socketpair()
+        with child_sock:
+            fd = child_sock.fileno()
+            self.process = subprocess.Popen(
+                [sys.executable, video_decoder.__file__, str(fd), self.ring.name, get_runtime_dir(),
+                 str(self.screen_width), str(self.screen_height)],
+                pass_fds=(fd,), stdin=subprocess.DEVNULL)
+        self.conn = Connection(parent_sock.detach())
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, command, **args):
+        """发送命令，记住 play/pause/mode/effects/interpolation 以便重启后恢复"""
+        if command in ("play", "pause"):
+            self.playing = command == "play"
+        elif command in ("mode", "effects", "interpolation"):
+            self.controls[command] = args
+        elif command == "close":
+            self.loaded = False
+            self.load_args = None
+            self.playing = False
+        try:
+            self.conn.send({"command": command, **args})
+        except (OSError, ValueError):
+            pass
+
+    def set_rate(self, rate):
+        """设置播放速率 - 直接写入共享内存，不经过管道，重启后仍然有效"""
+        self.ring.rate = rate
+
+    def load(self, path, mode, position=0, keyframe=None):
+        """在解码进程中打开视频，返回视频信息，无法打开时返回 None，无响应时抛出 TimeoutError"""
+        self.send("load", path=path, mode=mode, position=position, keyframe=keyframe)
+        try:
+            if not self.conn.poll(self.LOAD_TIMEOUT):
+                raise TimeoutError("解码进程无响应")
+            reply = self.conn.recv()
+        except EOFError:
+            raise OSError("解码进程已退出")
+        if "error" in reply:
+            print(reply["error"])
+            self.loaded = False
+            return None
+        self.loaded = True
+        self.load_args = (path, mode)
+        self.controls["mode"] = {"mode": mode}
+        return reply
+
+    def read_frame(self, present=None):
+        """取下一帧 QPixmap (或交给 present)，没有新帧时返回 None"""
+        result = self.ring.read_next(present or rgb_frame_to_pixmap)
+        if result is None:
+            return None
+        frame, self.position = result
+        return frame
+
+    def stop_process(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send({"command": "quit"})
+        except (OSError, ValueError):
+            pass
+        try:
+            self.process.wait(1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait(1)
+        self.conn.close()
+        self.process = None
+
+    def restart(self):
+        """重启解码进程并恢复视频、位置、效果和显示模式 (速率保存在共享内存中)"""
+        self.stop_process()
+        self.ring.reset()
+        self.restarts += 1
+        self.start()
+        if self.load_args is None:
+            return True
+        path, mode = self.load_args
+        try:
+            if self.load(path, self.controls.get("mode", {}).get("mode", mode), position=self.position) is None:
+                return False
+        except (OSError, TimeoutError) as e:
+            print(f"重启解码进程失败: {e}")
+            return False
+        for command in ("effects", "interpolation"):
+            if command in self.controls:
+                self.send(command, **self.controls[command])
+        if self.playing:
+            self.send("play")
+        return True
+
+    def close(self):
+        if self.ring is None:
+            return
+        self.stop_process()
+        self.ring.close()
+        self.ring.unlink()
+        self.ring = None
+
 class OptimizedOpenCVVideoPlayer:
     """优化的OpenCV视频播放器 - 降低内存和CPU使用"""
+    FRAME_INTERVAL_MS = 33  # ~30fps 的显示节拍，与播放速度无关
+    
     def __init__(self, video_label, screen_width, screen_height):
         self.video_label = video_label
         self.screen_width = screen_width
@@ -777,7 +3548,11 @@ class OptimizedOpenCVVideoPlayer:
         self.frame_skip = 0  # 跳帧计数器
         self.frame_skip_threshold = 1  # 每2帧处理1帧 (降低CPU使用)
         self.low_resolution_mode = False  # 低分辨率模式
-        self.last_frame_time = 0
+        self.last_frame_time = 0  # 上一帧显示的时间 (time.monotonic)，看门狗据此判断是否卡住
+        
+        # 读帧次数和失败次数 (PlaybackWatchdog 计算错误率后清零)
+        self.decode_attempts = 0
+        self.decode_errors = 0
         
         # 内存优化
         self.frame_buffer = None
@@ -785,23 +3560,60 @@ class OptimizedOpenCVVideoPlayer:
         
         # 播放速度控制
         self.playback_speed = 1.0  # 默认正常速度
-        self.speed_multiplier = 1.0  # 速度倍数
+        self.speed_multiplier = 1.0  # 速度倍数 (播放时钟的速率)
+        self.clock = PlaybackClock()
+        
+        # 显示第一帧后调用一次 (启动时间线)
+        self.on_first_frame = None
+        
+        # 解码进程 (DecoderProcess)，不可用时在主进程中解码
+        self.use_decoder_process = True
+        self.decoder = None
+        
+        # 帧尺寸 (screen_width/height，物理像素) 与逻辑像素之比，设置到 QPixmap 上
+        self.pixel_ratio = 1.0
+        
+        # MIT-SHM 显示 (XShmPresenter)，为 None 时通过 video_label 显示
+        self.presenter = None
+        self.surface = None
+        
+        # 帧后期处理 (亮度、色调、图标区域)，lut_baked 表示亮度和色调已烘焙进视频
+        self.effects = FrameEffects()
+        self.effects_baked = False
+        
+        # 慢速插帧: off / blend / motion (FrameInterpolator，只在主进程解码时使用)
+        self.interpolation = "off"
+        self.interpolator = None
         
-    def load_video(self, video_path):
-        """加载视频文件 - 优化内存使用"""
+        # 休眠时只保留恢复记录 (路径、帧位置、显示模式、是否在播放)
+        self.resume_record = None
+        self.keyframe_index = None
+        
+    def load_video(self, video_path, position=0, keyframe=None):
+        """加载视频文件 - 优化内存使用，keyframe 是 position 之前最近的关键帧 (见 seek_video)"""
         try:
             self.video_path = video_path
+            self.resume_record = None
             
             # 释放之前的资源
             if self.cap:
                 self.cap.release()
                 self.cap = None
+            if self.interpolator is not None:
+                self.interpolator.reset()
+            self.clock.reset()
+            
+            if self.use_decoder_process:
+                loaded = self.load_in_decoder(video_path, position, keyframe)
+                if loaded is not None:
+                    return loaded
             
             self.cap = cv2.VideoCapture(video_path)
             
             if not self.cap.isOpened():
                 print(f"无法打开视频文件: {video_path}")
                 return False
+            seek_video(self.cap, position, keyframe)
                 
             # 获取视频信息
             self.video_fps = self.cap.get(cv2.CAP_PROP_FPS)
@@ -827,185 +3639,343 @@ class OptimizedOpenCVVideoPlayer:
             print(f"加载视频错误: {e}")
             return False
             
+    def load_in_decoder(self, video_path, position=0, keyframe=None):
+        """在解码进程中打开视频，解码进程不可用时返回 None (改为在主进程中解码)"""
+        try:
+            if self.decoder is None:
+                self.decoder = DecoderProcess(self.screen_width, self.screen_height)
+            info = self.decoder.load(video_path, self.video_mode, position, keyframe)
+        except (OSError, TimeoutError) as e:
+            print(f"解码进程不可用，改为在主进程中解码: {e}")
+            self.close_decoder()
+            self.use_decoder_process = False
+            return None
+        if info is None:
+            return False
+        self.decoder.set_rate(self.speed_multiplier)
+        self.decoder.send("effects", effects=self.effects.to_dict(), lut_baked=self.effects_baked)
+        self.decoder.send("interpolation", mode=self.interpolation)
+        
+        self.video_fps = info["fps"]
+        self.video_width = info["width"]
+        self.video_height = info["height"]
+        self.low_resolution_mode = info["low_resolution_mode"]
+        print(f"视频信息: {self.video_width}x{self.video_height} @ {self.video_fps}fps (解码进程)")
+        return True
+        
+    def set_effects(self, effects, lut_baked=False):
+        """设置帧后期处理 (FrameEffects)"""
+        self.effects = effects
+        self.effects_baked = lut_baked
+        if self.interpolator is not None:
+            self.interpolator.reset()
+        if self.decoder is not None:
+            self.decoder.send("effects", effects=effects.to_dict(), lut_baked=lut_baked)
+        
+    def set_interpolation(self, mode):
+        """设置慢速插帧模式 (off / blend / motion)"""
+        self.interpolation = mode
+        self.interpolator = FrameInterpolator(mode) if mode != "off" else None
+        if self.decoder is not None:
+            self.decoder.send("interpolation", mode=mode)
+            
+    def interpolation_stats(self):
+        """插帧统计: 模式、每帧平均耗时、插值帧数、运动补偿是否因超出预算关闭"""
+        if self.decoder is not None:
+            return {"mode": self.interpolation, **self.decoder.ring.interpolation_stats()}
+        if self.interpolator is not None:
+            return self.interpolator.stats()
+        return {"mode": self.interpolation}
+        
+    def set_presenter(self, presenter, surface):
+        """使用 MIT-SHM 显示，帧写入 presenter 的共享内存段并显示在 surface 上"""
+        self.presenter = presenter
+        self.surface = surface
+        surface.presenter = presenter
+        
+    def ensure_presenter(self):
+        """重新分配休眠时释放的 MIT-SHM 共享内存段，失败时改用 Qt 显示"""
+        if self.presenter is None or self.presenter.attached:
+            return
+        self.presenter.close()
+        if self.presenter.attach():
+            return
+        print("无法重新分配 MIT-SHM 共享内存，使用 Qt 显示")
+        self.presenter.close()
+        self.surface.presenter = None
+        self.surface.hide()
+        self.presenter = None
+        
+    def show_still(self, pixmap):
+        """显示一张静态图 (看门狗的静态帧)"""
+        if pixmap.width() != self.screen_width or pixmap.height() != self.screen_height:
+            pixmap = pixmap.scaled(self.screen_width, self.screen_height, Qt.IgnoreAspectRatio,
+                                   Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(self.pixel_ratio)
+        self.ensure_presenter()
+        if self.presenter:
+            self.presenter.write_image(pixmap.toImage())
+            self.surface.show()
+            self.presenter.put()
+        else:
+            self.video_label.setPixmap(pixmap)
+            
+    def snapshot(self):
+        """当前显示的帧，没有时返回 None"""
+        if self.presenter:
+            return QPixmap.fromImage(self.presenter.snapshot()) if self.presenter.attached else None
+        return self.video_label.pixmap()
+        
+    def close_decoder(self):
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+            
+    def is_open(self):
+        """是否已经打开了视频 (解码进程或主进程)"""
+        if self.decoder is not None and self.decoder.loaded:
+            return True
+        return bool(self.cap and self.cap.isOpened())
+            
     def play(self):
         """开始播放视频"""
-        if self.cap and self.cap.isOpened():
+        if self.is_open():
             self.playing = True
-            # 根据播放速度调整定时器间隔
-            base_interval = 33  # ~30fps的基础间隔
-            adjusted_interval = int(base_interval / self.speed_multiplier)
-            self.timer.start(max(1, adjusted_interval))  # 确保间隔至少为1ms
+            self.last_frame_time = time.monotonic()
+            if self.decoder is not None:
+                self.decoder.send("play")
+            if self.surface:
+                self.surface.show()
+            self.timer.start(self.FRAME_INTERVAL_MS)
             print(f"开始播放视频 (速度: {self.speed_multiplier:.1f}x)")
             
     def stop(self):
         """停止播放"""
         self.playing = False
         self.timer.stop()
+        if self.interpolator is not None:
+            self.interpolator.reset()
+        if self.decoder is not None and self.decoder.loaded:
+            self.decoder.send("close")
         if self.cap:
             self.cap.release()
             self.cap = None
+        if self.surface:
+            self.surface.hide()
+            
+    def shutdown(self):
+        """停止播放并结束解码进程 (退出程序时调用)"""
+        self.stop()
+        self.close_decoder()
+        if self.presenter:
+            self.surface.presenter = None
+            self.presenter.close()
+            self.presenter = None
             
     def pause(self):
         """暂停播放"""
         self.playing = False
         self.timer.stop()
+        if self.decoder is not None:
+            self.decoder.send("pause")
         
     def resume(self):
         """恢复播放"""
-        if self.cap and self.cap.isOpened():
+        if self.is_open():
             self.playing = True
-            base_interval = 33  # ~30fps的基础间隔
-            adjusted_interval = int(base_interval / self.speed_multiplier)
-            self.timer.start(max(1, adjusted_interval))
+            self.last_frame_time = time.monotonic()
+            if self.decoder is not None:
+                self.decoder.send("play")
+            self.timer.start(self.FRAME_INTERVAL_MS)
             
     def set_position(self, position):
         """设置播放位置（百分比）"""
-        if self.cap and self.cap.isOpened():
+        if self.decoder is not None and self.decoder.loaded:
+            self.decoder.send("seek", position=position)
+        elif self.cap and self.cap.isOpened():
             total_frames = self.cap.get(cv2.CAP_PROP_FRAME_COUNT)
             target_frame = int(total_frames * position / 100)
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+        self.clock.reset()
+        if self.interpolator is not None:
+            self.interpolator.reset()
             
     def set_video_mode(self, mode):
         """设置视频显示模式"""
         self.video_mode = mode
+        if self.interpolator is not None:
+            self.interpolator.reset()
+        if self.decoder is not None:
+            self.decoder.send("mode", mode=mode)
         
     def set_playback_speed(self, speed_percent):
-        """设置播放速度 (百分比)"""
+        """设置播放速度 (百分比) - 只改变播放时钟的速率，定时器节拍不变，可以频繁调用"""
         self.speed_multiplier = speed_percent / 100.0
+        self.clock.set_rate(self.speed_multiplier)
+        if self.decoder is not None:
+            self.decoder.set_rate(self.speed_multiplier)
         
-        # 如果正在播放，重新启动定时器以应用新速度
-        if self.playing:
-            self.timer.stop()
-            base_interval = 33  # ~30fps的基础间隔
-            adjusted_interval = int(base_interval / self.speed_multiplier)
-            self.timer.start(max(1, adjusted_interval))
-            
-        print(f"播放速度设置为: {speed_percent}% ({self.speed_multiplier:.1f}x)")
-        
+    @TRACER.traced("frame", "frame")
     def update_frame(self):
         """更新视频帧 - 优化内存和CPU使用"""
+        if self.decoder is not None and self.decoder.loaded and self.playing:
+            self.present_decoded_frame()
+            return
+            
         if not self.cap or not self.cap.isOpened() or not self.playing:
             self.timer.stop()
             return
             
-        # 根据速度倍数调整帧读取
-        frames_to_advance = max(1, int(self.speed_multiplier))
+        # 按播放时钟前进: 这一拍跨过的源帧数 (慢速时可能为 0，快速时跳过中间的帧)
+        frames = self.clock.tick()
+        if self.interpolator is not None and self.clock.rate < 1:
+            # 慢速插帧: 每一拍都输出一帧，源帧只在跨过整帧时读取
+            with TRACER.span("frame.interpolate", "frame"):
+                processed_frame = self.interpolator.step(frames, self.clock.phase, self.read_processed_frame)
+        else:
+            if self.interpolator is not None:
+                self.interpolator.reset()
+            if frames == 0:
+                return
+            processed_frame = self.read_processed_frame(frames)
+        if processed_frame is None:
+            return
         
+        # 转换为QImage并显示 (MIT-SHM 时直接转换写入共享内存段)
+        with TRACER.span("frame.convert", "frame"):
+            if self.presenter:
+                self.presenter.write_bgr(processed_frame)
+            else:
+                q_image = self.cv2_to_qimage(processed_frame)
+        with TRACER.span("frame.present", "frame"):
+            if self.presenter:
+                self.presenter.put()
+            else:
+                pixmap = QPixmap.fromImage(q_image)
+                pixmap.setDevicePixelRatio(self.pixel_ratio)
+                self.video_label.setPixmap(pixmap)
+        self.last_frame_time = time.monotonic()
+        
+        if self.on_first_frame:
+            callback, self.on_first_frame = self.on_first_frame, None
+            callback()
+            
+    def read_processed_frame(self, frames_to_advance=1):
+        """读取下一帧并按显示模式处理，视频结束时回到开头并返回 None"""
         # 快速前进到目标帧
-        for i in range(frames_to_advance - 1):
-            ret = self.cap.grab()  # 只抓取不解码，速度快
-            if not ret:
-                break
-        
-        ret, frame = self.cap.read()
+        with TRACER.span("frame.read", "frame"):
+            for i in range(frames_to_advance - 1):
+                ret = self.cap.grab()  # 只抓取不解码，速度快
+                if not ret:
+                    break
+            
+            ret, frame = self.cap.read()
+        self.decode_attempts += 1
         if not ret:
-            # 视频结束，重新开始
+            # 视频结束，重新开始 (从头都读不出帧时记为错误)
+            if self.cap.get(cv2.CAP_PROP_POS_FRAMES) <= 0:
+                self.decode_errors += 1
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            return
+            return None
             
         # 根据模式处理帧
-        processed_frame = self.process_frame_optimized(frame)
+        with TRACER.span("frame.process", "frame"):
+            return self.process_frame_optimized(frame)
+        
+    def present_decoded_frame(self):
+        """显示解码进程写入共享内存的下一帧 (解码进程退出时记为错误，由看门狗重启)"""
+        if not self.decoder.is_alive():
+            self.decode_attempts += 1
+            self.decode_errors += 1
+            return
+        
+        with TRACER.span("frame.present", "frame"):
+            if self.presenter:
+                if not self.decoder.read_frame(self.presenter.write_rgb):
+                    return
+                self.presenter.put()
+            else:
+                pixmap = self.decoder.read_frame()
+                if pixmap is None:
+                    return
+                pixmap.setDevicePixelRatio(self.pixel_ratio)
+                self.video_label.setPixmap(pixmap)
+        self.last_frame_time = time.monotonic()
+        
+        if self.on_first_frame:
+            callback, self.on_first_frame = self.on_first_frame, None
+            callback()
+        
+    def hibernate(self):
+        """休眠 - 释放解码器 (解码进程)、帧缓冲和 MIT-SHM 共享内存段，只保留恢复记录，返回是否进入休眠"""
+        if self.resume_record is not None or not self.is_open():
+            return False
+        if self.decoder is not None:
+            position = self.decoder.position
+        else:
+            position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        # 不记录显示模式: 休眠期间仍可以修改 video_mode，恢复时使用当前的模式
+        record = {"path": self.video_path, "position": position, "playing": self.playing}
+        
+        # 趁休眠在后台建立关键帧索引，恢复时用它快速定位
+        self.keyframe_index = KeyframeIndex(self.video_path)
+        threading.Thread(target=self.keyframe_index.build, args=(self.video_fps,), daemon=True).start()
         
-        # 转换为QImage并显示
-        q_image = self.cv2_to_qimage(processed_frame)
-        self.video_label.setPixmap(QPixmap.fromImage(q_image))
+        self.stop()
+        self.close_decoder()
+        self.frame_buffer = None
+        self.video_label.clear()
+        if self.presenter:
+            # 全屏的共享内存段 (4K 约 33 MB) 在恢复时重新分配
+            self.presenter.close()
+        self.resume_record = record
+        return True
+        
+    def wake(self):
+        """从休眠恢复 - 重新分配显示用的共享内存段，重新打开视频并定位到恢复位置"""
+        record = self.resume_record
+        if record is None:
+            return False
+        # 从之前最近的关键帧向前解码到记录的帧，不会跳回关键帧
+        keyframe = None
+        if self.keyframe_index and self.keyframe_index.path == record["path"]:
+            keyframe = self.keyframe_index.floor(record["position"])
+        self.ensure_presenter()
+        if not self.load_video(record["path"], record["position"], keyframe):
+            self.resume_record = record
+            return False
+        if record["playing"]:
+            self.play()
+        return True
+        
+    def take_error_rate(self):
+        """返回上次调用以来的读帧失败比例并清零计数"""
+        rate = self.decode_errors / self.decode_attempts if self.decode_attempts else 0.0
+        self.decode_attempts = 0
+        self.decode_errors = 0
+        return rate
+        
+    def recover(self):
+        """重新启动解码并从上次显示的位置继续播放 (看门狗调用)，返回是否成功"""
+        if self.decoder is not None and self.decoder.load_args is not None:
+            recovered = self.decoder.restart()
+        else:
+            position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) if self.cap else 0
+            recovered = self.load_video(self.video_path, position)
+        if recovered:
+            self.set_video_mode(self.video_mode)
+            self.play()
+        return recovered
         
     def process_frame_optimized(self, frame):
         """优化的帧处理 - 降低内存和CPU使用"""
         try:
             # 低分辨率模式：先缩小再处理
             if self.low_resolution_mode:
-                # 计算合适的缩小比例
-                scale_factor = min(self.screen_width / frame.shape[1], self.screen_height / frame.shape[0])
-                if scale_factor < 0.5:  # 如果视频远大于屏幕
-                    new_width = int(frame.shape[1] * 0.5)
-                    new_height = int(frame.shape[0] * 0.5)
-                    frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-            
-            if self.video_mode == "stretch":
-                # 强制拉伸到屏幕尺寸
-                return cv2.resize(frame, (self.screen_width, self.screen_height), 
-                                interpolation=cv2.INTER_LINEAR)
-                
-            elif self.video_mode == "scale":
-                # 缩放填充 - 保持宽高比，填充整个区域
-                h, w = frame.shape[:2]
-                screen_ratio = self.screen_width / self.screen_height
-                frame_ratio = w / h
-                
-                if frame_ratio > screen_ratio:
-                    # 视频更宽，按宽度缩放
-                    new_w = self.screen_width
-                    new_h = int(new_w / frame_ratio)
-                    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                    
-                    # 创建黑色背景
-                    result = np.zeros((self.screen_height, self.screen_width, 3), dtype=np.uint8)
-                    # 垂直居中
-                    y_offset = (self.screen_height - new_h) // 2
-                    # 确保不超出边界
-                    y_offset = max(0, min(y_offset, self.screen_height - new_h))
-                    result[y_offset:y_offset+new_h, :] = resized
-                    return result
-                    
-                else:
-                    # 视频更高，按高度缩放
-                    new_h = self.screen_height
-                    new_w = int(new_h * frame_ratio)
-                    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                    
-                    # 创建黑色背景
-                    result = np.zeros((self.screen_height, self.screen_width, 3), dtype=np.uint8)
-                    # 水平居中
-                    x_offset = (self.screen_width - new_w) // 2
-                    # 确保不超出边界
-                    x_offset = max(0, min(x_offset, self.screen_width - new_w))
-                    result[:, x_offset:x_offset+new_w] = resized
-                    return result
-                    
-            elif self.video_mode == "fit":
-                # 适应屏幕 - 保持宽高比，适应屏幕
-                h, w = frame.shape[:2]
-                screen_ratio = self.screen_width / self.screen_height
-                frame_ratio = w / h
-                
-                if frame_ratio > screen_ratio:
-                    # 视频更宽，按高度缩放
-                    new_h = self.screen_height
-                    new_w = int(new_h * frame_ratio)
-                    # 确保新宽度不超过屏幕宽度
-                    new_w = min(new_w, self.screen_width)
-                    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                    
-                    # 创建黑色背景
-                    result = np.zeros((self.screen_height, self.screen_width, 3), dtype=np.uint8)
-                    # 水平居中
-                    x_offset = (self.screen_width - new_w) // 2
-                    # 确保不超出边界
-                    x_offset = max(0, min(x_offset, self.screen_width - new_w))
-                    # 确保resized的宽度不超过可用空间
-                    actual_width = min(new_w, self.screen_width - x_offset)
-                    result[:, x_offset:x_offset+actual_width] = resized[:, :actual_width]
-                    return result
-                    
-                else:
-                    # 视频更高，按宽度缩放
-                    new_w = self.screen_width
-                    new_h = int(new_w / frame_ratio)
-                    # 确保新高度不超过屏幕高度
-                    new_h = min(new_h, self.screen_height)
-                    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-                    
-                    # 创建黑色背景
-                    result = np.zeros((self.screen_height, self.screen_width, 3), dtype=np.uint8)
-                    # 垂直居中
-                    y_offset = (self.screen_height - new_h) // 2
-                    # 确保不超出边界
-                    y_offset = max(0, min(y_offset, self.screen_height - new_h))
-                    # 确保resized的高度不超过可用空间
-                    actual_height = min(new_h, self.screen_height - y_offset)
-                    result[y_offset:y_offset+actual_height, :] = resized[:actual_height, :]
-                    return result
+                frame = downscale_large_frame(frame, self.screen_width, self.screen_height)
+            
+            frame = fit_frame_to_screen(frame, self.video_mode, self.screen_width, self.screen_height)
+            return self.effects.apply(frame, self.effects_baked)
                     
         except Exception as e:
             print(f"处理视频帧时出错: {e}")
@@ -1016,32 +3986,443 @@ class OptimizedOpenCVVideoPlayer:
     def cv2_to_qimage(self, cv_image):
         """将OpenCV图像转换为QImage - 优化内存使用"""
         try:
-            # 转换BGR到RGB
-            rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            
-            # 重用QImage对象以减少内存分配
-            if self.frame_buffer is None or self.frame_buffer.width() != w or self.frame_buffer.height() != h:
-                self.frame_buffer = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            else:
-                # 重用现有的QImage对象
-                self.frame_buffer = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                
-            return self.frame_buffer.copy()  # 返回副本以确保数据安全
-            
-        except Exception as e:
-            print(f"转换QImage时出错: {e}")
-            # 创建错误图像
-            error_image = QImage(self.screen_width, self.screen_height, QImage.Format_RGB888)
-            error_image.fill(Qt.black)
-            return error_image
+            # 转换BGR到RGB
+            rgb_image = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
+            h, w, ch = rgb_image.shape
+            bytes_per_line = ch * w
+            
+            # 重用QImage对象以减少内存分配
+            if self.frame_buffer is None or self.frame_buffer.width() != w or self.frame_buffer.height() != h:
+                self.frame_buffer = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+            else:
+                # 重用现有的QImage对象
+                self.frame_buffer = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+                
+            return self.frame_buffer.copy()  # 返回副本以确保数据安全
+            
+        except Exception as e:
+            print(f"转换QImage时出错: {e}")
+            # 创建错误图像
+            error_image = QImage(self.screen_width, self.screen_height, QImage.Format_RGB888)
+            error_image.fill(Qt.black)
+            return error_image
+
+class MediaCache:
+    """优化后视频的索引 - 记录 --optimize 转码结果，播放器优先播放转码后的文件
+
+    索引按原文件路径保存，原文件修改 (mtime/大小变化) 或参数不同时失效。每个原文件只保留最新
+    一次转码；转码文件总大小超过 MAX_BYTES 时按最后使用时间 (播放时更新 mtime) 删除最旧的。
+    """
+    MAX_BYTES = 4 * 1024 ** 3
+
+    def __init__(self):
+        self.directory = get_cache_dir("media")
+        self.index_path = os.path.join(self.directory, "index.json")
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def source_key(path):
+        stat = os.stat(path)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def output_path(self, source, width, height, fps, mode):
+        digest = hashlib.sha1(f"{os.path.abspath(source)}\0{width}x{height}\0{fps}\0{mode}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.avi")
+
+    def lookup(self, source, width, height, mode, effects_key=""):
+        """返回适用于当前屏幕、模式和烘焙效果的优化文件，没有时返回 None"""
+        record = self.index.get(os.path.abspath(source))
+        if not record:
+            return None
+        try:
+            valid = (record["source"] == self.source_key(source) and record["width"] == width
+                     and record["height"] == height and record["mode"] == mode
+                     and record.get("effects", "") == effects_key and os.path.exists(record["output"]))
+        except (OSError, KeyError):
+            return None
+        if not valid:
+            return None
+        try:
+            os.utime(record["output"])
+        except OSError:
+            pass
+        return record["output"]
+
+    def poster_path(self, source, width, height, mode):
+        """屏幕尺寸的静态帧 (解码失败时代替视频显示)，原文件变化后路径也随之变化"""
+        try:
+            key = self.source_key(source)
+        except OSError:
+            return None
+        digest = hashlib.sha1(f"{os.path.abspath(source)}\0{key['mtime_ns']}\0{key['size']}\0"
+                              f"{width}x{height}\0{mode}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest}.poster.jpg")
+
+    def record(self, source, output, width, height, fps, mode, frames, loop_trimmed, effects_key=""):
+        """记录转码结果，替换同一原文件之前的转码 (删除旧文件) 并清理缓存目录"""
+        previous = self.index.get(os.path.abspath(source))
+        self.index[os.path.abspath(source)] = {
+            "source": self.source_key(source), "output": output, "width": width, "height": height,
+            "fps": fps, "mode": mode, "frames": frames, "loop_trimmed": loop_trimmed, "effects": effects_key,
+        }
+        if previous and previous.get("output") != output:
+            try:
+                os.unlink(previous["output"])
+            except (OSError, KeyError):
+                pass
+        self.prune(keep=output)
+        write_file_atomic(self.index_path, json.dumps(self.index, ensure_ascii=False, indent=1))
+
+    def prune(self, keep=None):
+        """删除索引中没有记录的转码文件，总大小超过 MAX_BYTES 时删除最久没有播放的 (keep 除外)"""
+        owners = {record.get("output"): source for source, record in self.index.items()}
+        files = []
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    # 跳过正在转码的临时文件 (name.avi.tmpPID.avi)
+                    if not entry.name.endswith(".avi") or ".tmp" in entry.name or not entry.is_file():
+                        continue
+                    if entry.path not in owners:
+                        os.unlink(entry.path)
+                        continue
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            print(f"清理媒体缓存失败: {e}")
+            return
+        total = sum(size for mtime, size, path in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.MAX_BYTES:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            del self.index[owners[path]]
+            print(f"媒体缓存超过 {self.MAX_BYTES // 1024 ** 2} MB，删除 {path}")
+
+class KeyframeIndex:
+    """视频关键帧的帧序号 - 用 ffprobe 扫描一次数据包 (不解码)，缓存在媒体缓存目录
+
+    休眠后恢复时先定位到恢复位置之前最近的关键帧，再向前 grab 到恢复位置 (seek_video)。
+    没有 ffprobe 时 floor() 原样返回目标帧。
+    """
+    VERSION = 2  # 版本 2 起帧序号减去视频流的 start_time
+
+    def __init__(self, path):
+        self.path = path
+        self.keyframes = None
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        self.cache_path = os.path.join(get_cache_dir("media"), f"{digest}.keyframes.json")
+
+    def load(self):
+        """读取缓存，没有缓存或原文件已变化时返回 False"""
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION and data["source"] == MediaCache.source_key(self.path):
+                self.keyframes = data["keyframes"]
+                return True
+        except (OSError, ValueError, KeyError):
+            pass
+        return False
+
+    def build(self, fps):
+        """读取缓存或用 ffprobe 扫描关键帧 (在工作线程中调用)"""
+        if self.load():
+            return True
+        if fps <= 0 or not shutil.which("ffprobe"):
+            return False
+        try:
+            result = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0",
+                                     "-show_entries", "stream=start_time:packet=pts_time,flags",
+                                     "-of", "json", self.path],
+                                    capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        if result.returncode != 0:
+            return False
+        try:
+            data = json.loads(result.stdout)
+        except ValueError:
+            return False
+        self.keyframes = self.parse_keyframes(data, fps)
+        try:
+            write_file_atomic(self.cache_path, json.dumps({"version": self.VERSION,
+                                                           "source": MediaCache.source_key(self.path),
+                                                           "keyframes": self.keyframes}))
+        except OSError:
+            pass
+        return True
+
+    @staticmethod
+    def parse_keyframes(data, fps):
+        """ffprobe 的 JSON 输出 -> 关键帧序号 (与 OpenCV 一样从视频流的 start_time 开始计数)"""
+        try:
+            start_time = float(data["streams"][0]["start_time"])
+        except (KeyError, IndexError, TypeError, ValueError):
+            start_time = 0.0
+        keyframes = set()
+        for packet in data.get("packets", []):
+            if "K" in packet.get("flags", ""):
+                try:
+                    keyframes.add(round((float(packet["pts_time"]) - start_time) * fps))
+                except (KeyError, ValueError):
+                    continue
+        return sorted(keyframes)
+
+    def floor(self, frame):
+        """frame 之前 (含) 最近的关键帧"""
+        if not self.keyframes:
+            return frame
+        index = bisect.bisect_right(self.keyframes, frame)
+        return self.keyframes[index - 1] if index else frame
+
+class PlaybackWatchdog:
+    """视频播放看门狗 - 检查距上一帧显示的时间和读帧错误率，卡住时重启解码
+
+    第一次出现问题立即重启，连续失败时按指数退避 (BACKOFF_MS 起，最长 MAX_BACKOFF_MS)
+    重试，等待期间显示媒体缓存中的静态帧。每次事件都打印并记录，供 collect_stats 使用。
+    """
+    CHECK_INTERVAL_MS = 1000
+    STALL_SECONDS = 3.0
+    MAX_ERROR_RATE = 0.5
+    BACKOFF_MS = 1000
+    MAX_BACKOFF_MS = 60000
+    MAX_INCIDENTS = 20
+
+    def __init__(self, player, show_poster):
+        self.player = player
+        self.show_poster = show_poster
+        self.failures = 0
+        self.incident_count = 0
+        self.incidents = []
+        self.retry_pending = False
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.check)
+        self.timer.start(self.CHECK_INTERVAL_MS)
+
+    def check(self):
+        if self.retry_pending or not self.player.playing:
+            return
+        error_rate = self.player.take_error_rate()
+        stalled_for = time.monotonic() - self.player.last_frame_time
+        if stalled_for > self.STALL_SECONDS:
+            self.incident(f"{stalled_for:.1f} 秒没有新帧")
+        elif error_rate > self.MAX_ERROR_RATE:
+            self.incident(f"读帧错误率 {error_rate:.0%}")
+        else:
+            self.failures = 0
+
+    def incident(self, reason):
+        self.failures += 1
+        self.incident_count += 1
+        if self.failures == 1:
+            action = "重启解码" if self.recover() else "重启解码失败"
+        else:
+            delay = min(self.BACKOFF_MS * 2 ** (self.failures - 2), self.MAX_BACKOFF_MS)
+            action = f"显示静态帧，{delay} ms 后重试" if self.show_poster() else f"{delay} ms 后重试"
+            self.retry_pending = True
+            QTimer.singleShot(delay, self.retry)
+        print(f"播放看门狗: {reason}，{action} (第 {self.failures} 次)")
+        self.incidents.append({"time": time.time(), "reason": reason, "action": action})
+        del self.incidents[:-self.MAX_INCIDENTS]
+
+    def retry(self):
+        self.retry_pending = False
+        if self.player.playing:
+            self.recover()
+
+    def recover(self):
+        try:
+            return self.player.recover()
+        except Exception as e:
+            print(f"恢复播放时出错: {e}")
+            return False
+
+    def stats(self):
+        return {"incidents": self.incident_count, "consecutive_failures": self.failures,
+                "recent": self.incidents[-5:]}
+
+    def stop(self):
+        self.timer.stop()
+
+class VideoOptimizer:
+    """离线转码 - 把视频转成屏幕分辨率、指定帧率的 MJPEG (解码开销低)，并裁剪到无缝循环点
+
+    第一遍只计算每个输出帧的缩略签名来寻找循环点，第二遍再按显示模式处理并写入，
+    不需要把整段视频放在内存中。
+    """
+    SIGNATURE_SIZE = (64, 36)
+    MATCH_FRAMES = 3  # 比较连续几帧，避免运动方向相反的相同画面被当成循环点
+    MIN_LOOP_SECONDS = 2.0
+    LOOP_THRESHOLD = 12.0  # 签名平均差异 (0-255)，超过时不裁剪
+    JPEG_QUALITY = 90
+
+    def __init__(self, source, width, height, fps, mode, effects=None):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.mode = mode
+        self.effects = effects  # 烘焙进视频的亮度和色调 (FrameEffects)
+
+    def output_frames(self, cap):
+        """按目标帧率从源视频取帧 (丢帧或重复帧)，逐个产生"""
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or self.fps
+        next_time = 0.0
+        index = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            frame_time = index / source_fps
+            index += 1
+            while next_time <= frame_time + 1e-9:
+                yield frame
+                next_time += 1.0 / self.fps
+
+    def open_source(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise ValueError(f"无法打开视频文件: {self.source}")
+        return cap
+
+    def find_loop_length(self):
+        """寻找无缝循环点: 第 n 帧起的几帧与开头几帧最相似时，前 n 帧可以首尾相接
+
+        返回 (循环帧数, 总帧数, 差异)，找不到足够相似的位置时循环帧数等于总帧数。
+        """
+        cap = self.open_source()
+        signatures = []
+        try:
+            for frame in self.output_frames(cap):
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                signatures.append(cv2.resize(gray, self.SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32))
+        finally:
+            cap.release()
+        total = len(signatures)
+        first = max(int(self.MIN_LOOP_SECONDS * self.fps), total // 2)
+        last = total - self.MATCH_FRAMES
+        if first > last:
+            return total, total, None
+        head = np.stack(signatures[:self.MATCH_FRAMES])
+        differences = [float(np.mean(np.abs(np.stack(signatures[n:n + self.MATCH_FRAMES]) - head)))
+                       for n in range(first, last + 1)]
+        best = int(np.argmin(differences))
+        if differences[best] > self.LOOP_THRESHOLD:
+            return total, total, differences[best]
+        return first + best, total, differences[best]
+
+    def run(self, output):
+        """转码到 output，返回 (帧数, 是否裁剪了循环点)"""
+        loop_frames, total, difference = self.find_loop_length()
+        if total == 0:
+            raise ValueError("视频中没有可读取的帧")
+        if difference is not None:
+            print(f"循环点相似度差异: {difference:.1f}")
+        
+        cap = self.open_source()
+        tmp_path = f"{output}.tmp{os.getpid()}.avi"
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"MJPG"), self.fps, (self.width, self.height))
+        if not writer.isOpened():
+            cap.release()
+            raise ValueError("无法创建输出文件")
+        writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.JPEG_QUALITY)
+        try:
+            written = 0
+            for frame in self.output_frames(cap):
+                if written >= loop_frames:
+                    break
+                frame = fit_frame_to_screen(frame, self.mode, self.width, self.height)
+                if self.effects is not None:
+                    self.effects.apply(frame)
+                writer.write(frame)
+                written += 1
+                if written % max(1, loop_frames // 10) == 0:
+                    print(f"转码进度: {written * 100 // loop_frames}%")
+        finally:
+            writer.release()
+            cap.release()
+        os.replace(tmp_path, output)
+        return written, written < total
+
+def optimize_main(argv):
+    """命令行: main.py --optimize 视频 [--fps N] [--mode 模式] [--size 宽x高] [--no-effects]"""
+    parser = argparse.ArgumentParser(prog="main.py --optimize", description="把视频转码为适合作为动态壁纸的格式")
+    parser.add_argument("--optimize", dest="source", required=True, help="要转码的视频")
+    parser.add_argument("--fps", type=int, default=30, help="输出帧率 (默认 30)")
+    parser.add_argument("--mode", choices=DynamicWallpaper.VIDEO_MODES, help="显示模式 (默认使用当前设置)")
+    parser.add_argument("--size", help="输出分辨率，如 1920x1080 (默认当前屏幕)")
+    parser.add_argument("--no-effects", action="store_true", help="不把当前的亮度和色调设置烘焙进视频")
+    options = parser.parse_args(argv)
+    
+    if not import_video_modules():
+        return 1
+    if not os.path.isfile(options.source):
+        print(f"文件不存在: {options.source}")
+        return 1
+    
+    settings = QSettings("DynamicWallpaper", "WallpaperSettings")
+    mode = options.mode or settings.value("video_mode", "stretch", type=str)
+    effects = None
+    if not options.no_effects:
+        effects = FrameEffects(settings.value("frame_brightness", 100, type=int),
+                               settings.value("frame_tint", "", type=str),
+                               settings.value("frame_tint_strength", 0, type=int))
+        if not effects.has_lut:
+            effects = None
+    if options.size:
+        try:
+            width, height = (int(v) for v in options.size.lower().split("x"))
+        except ValueError:
+            print(f"分辨率格式错误: {options.size}")
+            return 1
+    elif os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        from PyQt5.QtGui import QGuiApplication
+        app = QGuiApplication(sys.argv[:1])
+        # 与播放器的渲染分辨率一致 (物理像素 x render_scale)
+        scale = app.primaryScreen().devicePixelRatio()
+        if settings.value("presenter", "qt", type=str) != "xshm":
+            scale *= min(1.0, max(0.25, settings.value("render_scale", 1.0, type=float)))
+        screen = app.primaryScreen().geometry()
+        width, height = round(screen.width() * scale), round(screen.height() * scale)
+    else:
+        print("没有图形界面，请用 --size 指定分辨率")
+        return 1
+    
+    cache = MediaCache()
+    output = cache.output_path(options.source, width, height, options.fps, mode)
+    print(f"转码 {options.source} -> {width}x{height} @ {options.fps}fps ({mode})")
+    started = time.monotonic()
+    try:
+        frames, trimmed = VideoOptimizer(options.source, width, height, options.fps, mode, effects).run(output)
+    except ValueError as e:
+        print(f"转码失败: {e}")
+        return 1
+    cache.record(options.source, output, width, height, options.fps, mode, frames, trimmed,
+                 effects.lut_key() if effects else "")
+    print(f"完成: {frames} 帧{' (已裁剪到循环点)' if trimmed else ''}，耗时 {time.monotonic() - started:.1f} 秒")
+    print(f"输出: {output}")
+    return 0
 
 class DynamicWallpaper(QMainWindow):
     def __init__(self):
         super().__init__()
         # 初始化设置
-        self.settings = QSettings("DynamicWallpaper", "WallpaperSettings")
+        self.settings = SettingsStore("DynamicWallpaper", "WallpaperSettings")
+        QApplication.instance().aboutToQuit.connect(self.settings.flush)
+        
+        # 原桌面设置 (退出时恢复)
+        self.legacy_desktop = LegacyDesktopSettings()
         
         # 禁用 xfdesktop
         self.disable_xfdesktop()
@@ -1050,8 +4431,10 @@ class DynamicWallpaper(QMainWindow):
         self.screen_rect = QApplication.primaryScreen().geometry()
         self.screen_width = self.screen_rect.width()
         self.screen_height = self.screen_rect.height()
+        # 缩放显示器上 geometry() 是逻辑像素，物理像素 = 逻辑像素 x devicePixelRatio
+        self.device_pixel_ratio = QApplication.primaryScreen().devicePixelRatio()
         
-        print(f"检测到屏幕分辨率: {self.screen_width}x{self.screen_height}")
+        print(f"检测到屏幕分辨率: {self.screen_width}x{self.screen_height} (缩放 {self.device_pixel_ratio:g})")
         
         # 关键修复：设置正确的窗口属性
         # 使用正确的窗口标志组合，确保壁纸在最底层且不拦截事件
@@ -1063,24 +4446,75 @@ class DynamicWallpaper(QMainWindow):
         
         # 从设置加载配置
         self.load_settings()
+        self.timeline = StartupTimeline.shared()
+        self.timeline.mark("设置已加载")
+        
+        # 窗口映射 (Expose) 后再设置窗口属性和开始播放
+        self.window_exposed = False
         
         # 存储桌面图标
         self.desktop_icons = []
+        self.icon_widgets = {}  # .desktop 路径 -> 图标控件
+        
+        # 桌面目录模型：文件变化时只更新受影响的图标
+        self.desktop_model = DesktopDirectoryModel(self)
+        self.desktop_model.changed.connect(self.apply_desktop_changes)
+        
+        # 后台图标加载器：先显示占位符，解码完成后再替换
+        self.icon_loader = IconLoader(self)
+        self.icon_loader.loaded.connect(self.on_icon_loaded)
+        self.icon_waiters = {}  # 缓存键 -> 等待同一图像解码的图标
         
         # OpenCV视频播放器
         self.opencv_player = None
+        self.playback_watchdog = None
         
         # 初始化系统托盘
         self.setup_system_tray()
         
+        # 关键修复：创建独立的图标容器窗口 (需在加载图标之前创建)
+        self.setup_icon_container()
+        
         # 初始化UI组件
         self.setup_ui()
-        
-        # 延迟设置窗口为桌面背景
-        QTimer.singleShot(100, self.set_desktop_window)
-        
-        # 关键修复：创建独立的图标容器窗口
-        self.setup_icon_container()
+        self.timeline.mark("界面已创建")
+        
+        # 控制 socket (wallpaperctl.py)
+        self.control_server = ControlServer(os.path.join(get_runtime_dir(), "control.sock"),
+                                            self.handle_control_command, self)
+        
+        # 桌面不可见时休眠视频
+        self.hidden_since = None
+        self.hibernate_requested = False
+        self.hibernated_rss_mb = None
+        self.visibility_timer = QTimer(self)
+        self.visibility_timer.timeout.connect(self.check_visibility)
+        self.visibility_timer.start(self.VISIBILITY_CHECK_MS)
+
+    def showEvent(self, event):
+        """第一次显示时监听窗口映射事件"""
+        super().showEvent(event)
+        if not self.window_exposed:
+            self.windowHandle().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        """窗口第一次映射后进入下一个启动阶段，代替固定延时"""
+        if (event.type() == QEvent.Expose and not self.window_exposed
+                and obj is self.windowHandle() and obj.isExposed()):
+            self.window_exposed = True
+            obj.removeEventFilter(self)
+            # 让本次 Expose 先完成绘制
+            QTimer.singleShot(0, self.on_window_exposed)
+        return super().eventFilter(obj, event)
+
+    def on_window_exposed(self):
+        """窗口已映射: 设置桌面窗口属性，开始显示背景"""
+        self.timeline.mark("窗口已映射")
+        self.set_desktop_window()
+        if self.current_background_type == "video":
+            self.load_background()
+        else:
+            self.timeline.finish("壁纸已显示")
 
     def setup_system_tray(self):
         """设置系统托盘图标"""
@@ -1143,6 +4577,7 @@ class DynamicWallpaper(QMainWindow):
         # 模拟在图标容器上显示右键菜单
         self.show_context_menu(QPoint(100, 100))
 
+    @TRACER.traced()
     def load_settings(self):
         """从设置文件加载所有配置"""
         # 背景类型
@@ -1155,6 +4590,16 @@ class DynamicWallpaper(QMainWindow):
         # 图标排列方式
         self.icon_arrangement = self.settings.value("icon_arrangement", "vertical", type=str)
         
+        # 图标图层: widget (每个图标一个控件) 或 painted (单层绘制)
+        self.icon_layer_mode = self.settings.value("icon_layer", "widget", type=str)
+        
+        # 图标位置 (按排列方式和 .desktop 路径记住的单元格)
+        try:
+            positions = json.loads(self.settings.value("icon_positions", "{}", type=str))
+        except ValueError:
+            positions = {}
+        self.layout_engine = IconLayoutEngine(positions if isinstance(positions, dict) else {})
+        
         # 图标大小设置
         self.icon_size = self.settings.value("icon_size", 64, type=int)
         self.text_size = self.settings.value("text_size", 10, type=int)
@@ -1173,10 +4618,31 @@ class DynamicWallpaper(QMainWindow):
         # 播放速度
         self.playback_speed = self.settings.value("playback_speed", 100, type=int)
         
+        # 视频解码: process (独立的解码进程) 或 inline (在主进程中解码)
+        self.decoder_mode = self.settings.value("decoder", "process", type=str)
+        
+        # 视频显示: qt 或 xshm (MIT-SHM 共享内存，X11 下可用)
+        self.presenter_mode = self.settings.value("presenter", "qt", type=str)
+        
+        # 视频内部分辨率相对物理分辨率的比例 (0.25-1.0)，低于 1 时由 Qt 放大一次
+        self.render_scale = min(1.0, max(0.25, self.settings.value("render_scale", 1.0, type=float)))
+        
+        # 视频帧效果: 亮度、色调和图标区域背景 (none / darken / blur)
+        self.frame_brightness = self.settings.value("frame_brightness", 100, type=int)
+        self.frame_tint = self.settings.value("frame_tint", "", type=str)
+        self.frame_tint_strength = self.settings.value("frame_tint_strength", 0, type=int)
+        self.icon_backdrop = self.settings.value("icon_backdrop", "none", type=str)
+        
+        # 慢速插帧: off / blend (混合相邻帧) / motion (光流运动补偿)
+        self.interpolation = self.settings.value("interpolation", "off", type=str)
+        if self.interpolation not in FrameInterpolator.MODES:
+            self.interpolation = "off"
+        
         print("设置加载完成")
 
+    @TRACER.traced()
     def save_settings(self):
-        """保存所有设置到文件"""
+        """保存所有设置 - 只记录变化的值，由 SettingsStore 合并后写入"""
         # 背景类型
         self.settings.setValue("background_type", self.current_background_type)
         
@@ -1186,6 +4652,9 @@ class DynamicWallpaper(QMainWindow):
         
         # 图标排列方式
         self.settings.setValue("icon_arrangement", self.icon_arrangement)
+        self.settings.setValue("icon_layer", self.icon_layer_mode)
+        self.settings.setValue("icon_positions", json.dumps(self.layout_engine.positions, ensure_ascii=False))
+        self.layout_engine.dirty = False
         
         # 图标大小设置
         self.settings.setValue("icon_size", self.icon_size)
@@ -1204,10 +4673,16 @@ class DynamicWallpaper(QMainWindow):
         
         # 播放速度
         self.settings.setValue("playback_speed", self.playback_speed)
-        
-        self.settings.sync()
-        print("设置已保存")
+        self.settings.setValue("decoder", self.decoder_mode)
+        self.settings.setValue("presenter", self.presenter_mode)
+        self.settings.setValue("render_scale", self.render_scale)
+        self.settings.setValue("frame_brightness", self.frame_brightness)
+        self.settings.setValue("frame_tint", self.frame_tint)
+        self.settings.setValue("frame_tint_strength", self.frame_tint_strength)
+        self.settings.setValue("icon_backdrop", self.icon_backdrop)
+        self.settings.setValue("interpolation", self.interpolation)
 
+    @TRACER.traced()
     def setup_icon_container(self):
         """创建独立的图标容器窗口 - 修复鼠标事件问题"""
         self.icon_container = QWidget()
@@ -1222,13 +4697,71 @@ class DynamicWallpaper(QMainWindow):
         self.icon_container.setContextMenuPolicy(Qt.CustomContextMenu)
         self.icon_container.customContextMenuRequested.connect(self.show_context_menu)
         
+        # 单层绘制模式下所有图标画在同一个图层上
+        self.icon_layer = None
+        if self.icon_layer_mode == "painted":
+            self.icon_layer = self.create_icon_layer()
+            self.icon_layer.show()
+        
+        # 面板位置或大小变化时重新排列
+        QApplication.primaryScreen().availableGeometryChanged.connect(lambda _: self.arrange_desktop_icons())
+        
         self.icon_container.show()
 
+    def create_icon_layer(self):
+        """创建单层绘制图层，拖放图标后记住位置"""
+        layer = PaintedIconLayer(self.icon_container)
+        layer.item_moved.connect(self.on_icon_dropped)
+        return layer
+
+    def create_icon(self, desktop_file, entry=None):
+        """按当前图层模式创建图标"""
+        if self.icon_layer:
+            icon = PaintedDesktopIcon(desktop_file, self.icon_layer, entry)
+            self.icon_layer.add_item(icon)
+            return icon
+        return DesktopIconWidget(desktop_file, self.icon_container, entry)
+
+    def destroy_icon(self, icon):
+        """销毁图标"""
+        if isinstance(icon, PaintedDesktopIcon):
+            icon.layer.remove_item(icon)
+        else:
+            icon.setParent(None)
+            icon.deleteLater()
+
+    def set_icon_layer_mode(self, mode):
+        """切换图标图层模式 - 重建全部图标"""
+        if mode == self.icon_layer_mode:
+            return
+        for icon in self.desktop_icons:
+            self.destroy_icon(icon)
+        self.desktop_icons.clear()
+        self.icon_widgets.clear()
+        
+        self.icon_layer_mode = mode
+        if mode == "painted":
+            if not self.icon_layer:
+                self.icon_layer = self.create_icon_layer()
+            self.icon_layer.show()
+        elif self.icon_layer:
+            self.icon_layer.setParent(None)
+            self.icon_layer.deleteLater()
+            self.icon_layer = None
+        
+        self.load_desktop_icons()
+        
+        # 保存设置
+        self.save_settings()
+
     def remove_icon(self, icon_widget):
         """从图标列表中移除图标"""
         if icon_widget in self.desktop_icons:
             self.desktop_icons.remove(icon_widget)
+        if self.icon_widgets.get(icon_widget.desktop_file) is icon_widget:
+            del self.icon_widgets[icon_widget.desktop_file]
 
+    @TRACER.traced()
     def setup_ui(self):
         """设置UI组件"""
         central_widget = QWidget()
@@ -1244,6 +4777,10 @@ class DynamicWallpaper(QMainWindow):
         # 图片显示组件
         self.setup_image_display()
         
+        # 图片背景在窗口显示前加载，第一次绘制就是壁纸；视频在窗口映射后再加载
+        if self.current_background_type == "image":
+            self.load_background()
+        
         # 初始化右键菜单
         self.setup_context_menu()
         
@@ -1253,16 +4790,24 @@ class DynamicWallpaper(QMainWindow):
         # 应用透明度设置
         self.apply_transparency()
 
+    @TRACER.traced()
     def disable_xfdesktop(self):
-        """临时禁用 xfdesktop"""
+        """临时禁用 xfdesktop - 不依赖桌面环境检测 (proot 中 XDG_CURRENT_DESKTOP 常常没有设置)"""
+        self.xfdesktop_killed = False
         try:
-            subprocess.run(['pkill', 'xfdesktop'], timeout=5)
-            print("已禁用 xfdesktop")
+            result = subprocess.run(['pkill', 'xfdesktop'], timeout=5)
+            # pkill 没有匹配的进程时返回 1，什么也不做
+            self.xfdesktop_killed = result.returncode == 0
+            if self.xfdesktop_killed:
+                print("已禁用 xfdesktop")
         except Exception as e:
             print(f"禁用 xfdesktop 时出错: {e}")
 
     def enable_xfdesktop(self):
-        """重新启用 xfdesktop"""
+        """恢复原桌面设置并重新启用 xfdesktop (只在启动时结束过它的情况下)"""
+        self.legacy_desktop.restore()
+        if not getattr(self, "xfdesktop_killed", False):
+            return
         try:
             subprocess.Popen(['xfdesktop', '--reload'])
             print("已重新启用 xfdesktop")
@@ -1282,18 +4827,32 @@ class DynamicWallpaper(QMainWindow):
         
         self.main_layout.addWidget(self.video_label)
         
-        # 初始化优化的OpenCV视频播放器
+        # 初始化优化的OpenCV视频播放器 (按物理分辨率渲染，交给 Qt 时带上 devicePixelRatio)
+        render_width, render_height = self.render_size()
         self.opencv_player = OptimizedOpenCVVideoPlayer(
             self.video_label, 
-            self.screen_width, 
-            self.screen_height
+            render_width, 
+            render_height
         )
+        self.opencv_player.pixel_ratio = render_width / self.screen_width
+        self.opencv_player.use_decoder_process = self.decoder_mode == "process"
+        if self.presenter_mode == "xshm":
+            self.setup_xshm_presenter()
+        self.playback_watchdog = PlaybackWatchdog(self.opencv_player, self.show_video_poster)
+        self.opencv_player.set_interpolation(self.interpolation)
         
-        # 根据设置加载视频或图片
-        if self.current_background_type == "video" and os.path.exists(self.current_video_path):
-            self.load_video_file(self.current_video_path)
-        elif self.current_background_type == "image" and os.path.exists(self.current_image_path):
+        # 应用视频显示模式
+        self.apply_video_mode()
+        
+        # 应用播放速度设置
+        self.set_playback_speed(self.playback_speed)
+
+    def load_background(self):
+        """根据设置加载视频或图片"""
+        if self.current_background_type == "image" and os.path.exists(self.current_image_path):
             self.set_image_background(self.current_image_path)
+        elif self.current_background_type == "video" and os.path.exists(self.current_video_path):
+            self.load_video_file(self.current_video_path)
         else:
             # 默认视频文件路径
             video_path = os.path.expanduser("/opt/apps/LinboxDtbz/video/1.mp4")
@@ -1302,30 +4861,40 @@ class DynamicWallpaper(QMainWindow):
                 self.load_video_file(video_path)
             else:
                 print(f"警告: 默认视频文件未找到在 {video_path}")
-            
-        # 应用视频显示模式
-        self.apply_video_mode()
-        
-        # 应用播放速度设置
-        self.set_playback_speed(self.playback_speed)
+                self.timeline.finish("没有可用的壁纸")
 
+    @TRACER.traced()
     def load_video_file(self, video_path):
         """加载视频文件 - 使用优化的OpenCV"""
         try:
             print(f"加载视频文件: {video_path}")
             
+            if not import_video_modules():
+                self.show_video_error("未找到OpenCV库，无法播放视频")
+                return
+            
             if self.opencv_player:
                 # 停止当前播放
                 self.opencv_player.stop()
                 
+                # 有 --optimize 转码好的文件时直接播放它 (亮度和色调可能已烘焙进去)
+                effects = self.frame_effects()
+                playback_path = MediaCache().lookup(video_path, *self.render_size(),
+                                                    self.video_mode, effects.lut_key()) or video_path
+                if playback_path != video_path:
+                    print(f"使用优化后的视频: {playback_path}")
+                self.opencv_player.set_effects(effects, lut_baked=playback_path != video_path)
+                
                 # 加载新视频
-                if self.opencv_player.load_video(video_path):
+                if self.opencv_player.load_video(playback_path):
                     # 设置视频模式
                     self.opencv_player.set_video_mode(self.video_mode)
                     # 设置播放速度
                     self.opencv_player.set_playback_speed(self.playback_speed)
-                    # 开始播放
-                    QTimer.singleShot(100, self.opencv_player.play)
+                    # 窗口已映射时立即开始播放，否则等映射后由 on_window_exposed 加载
+                    self.opencv_player.on_first_frame = self.on_first_video_frame
+                    if self.window_exposed:
+                        self.opencv_player.play()
                     print("优化版OpenCV视频加载成功")
                     
                     # 更新背景类型
@@ -1346,6 +4915,103 @@ class DynamicWallpaper(QMainWindow):
             print(f"加载视频文件错误: {e}")
             self.show_video_error(f"加载视频错误: {e}")
 
+    def render_size(self):
+        """视频渲染分辨率 - 物理分辨率乘以 render_scale
+
+        MIT-SHM 显示不经过 Qt 缩放，总是按物理分辨率渲染。
+        """
+        scale = self.device_pixel_ratio
+        if self.presenter_mode != "xshm":
+            scale *= self.render_scale
+        return max(1, round(self.screen_width * scale)), max(1, round(self.screen_height * scale))
+
+    def setup_xshm_presenter(self):
+        """创建 MIT-SHM 显示用的原生子窗口，不可用时继续使用 Qt 显示"""
+        # 共享内存帧缓冲是 numpy 数组，播放器可能还没有导入 numpy
+        if not import_video_modules():
+            print("MIT-SHM 显示不可用，使用 Qt 显示")
+            return
+        surface = XShmVideoSurface(self.video_label)
+        surface.setGeometry(0, 0, self.screen_width, self.screen_height)
+        presenter = XShmPresenter.create(int(surface.winId()), *self.render_size())
+        if presenter is None:
+            print("MIT-SHM 显示不可用，使用 Qt 显示")
+            surface.setParent(None)
+            surface.deleteLater()
+            return
+        surface.hide()
+        self.opencv_player.set_presenter(presenter, surface)
+        print("使用 MIT-SHM 显示视频")
+
+    VISIBILITY_CHECK_MS = 2000
+    HIBERNATE_DELAY_S = 10  # 桌面持续不可见多久后休眠
+
+    def desktop_covered(self):
+        """桌面是否看不见: 窗口被隐藏或最小化，或者活动窗口是全屏窗口"""
+        if not self.isVisible() or self.isMinimized():
+            return True
+        x11 = X11DesktopWindow.shared()
+        if not x11:
+            return False
+        return x11.fullscreen_window_active(ignore=(int(self.winId()), int(self.icon_container.winId())))
+
+    def check_visibility(self):
+        """桌面持续不可见时休眠视频，重新可见时恢复"""
+        player = self.opencv_player
+        if not player or self.current_background_type != "video" or self.hibernate_requested:
+            return
+        if not self.desktop_covered():
+            self.hidden_since = None
+            if player.resume_record is not None:
+                self.wake_wallpaper()
+        elif self.hidden_since is None:
+            self.hidden_since = time.monotonic()
+        elif player.resume_record is None and time.monotonic() - self.hidden_since >= self.HIBERNATE_DELAY_S:
+            self.hibernate_wallpaper()
+
+    def hibernate_wallpaper(self):
+        """休眠视频壁纸，释放内存后记录常驻内存"""
+        if not self.opencv_player.hibernate():
+            return False
+        release_heap_memory()
+        self.hibernated_rss_mb = read_rss_mb()
+        print(f"视频已休眠，常驻内存 {self.hibernated_rss_mb} MB")
+        return True
+
+    def wake_wallpaper(self):
+        """从休眠恢复 - 先显示静态帧，下一轮事件循环再重新打开视频"""
+        self.hibernate_requested = False
+        if self.opencv_player.resume_record is None:
+            return False
+        self.show_video_poster()
+        QTimer.singleShot(0, self.opencv_player.wake)
+        print("视频从休眠恢复")
+        return True
+
+    def on_first_video_frame(self):
+        """第一帧已显示 - 结束启动时间线，并保存静态帧供看门狗在解码失败时显示"""
+        self.timeline.finish("第一帧视频已显示")
+        poster_path = MediaCache().poster_path(self.current_video_path, *self.render_size(), self.video_mode)
+        pixmap = self.opencv_player.snapshot()
+        if not poster_path or os.path.exists(poster_path) or pixmap is None:
+            return
+        buffer = QBuffer()
+        buffer.open(QIODevice.WriteOnly)
+        if pixmap.save(buffer, "JPEG", 85):
+            try:
+                write_file_atomic(poster_path, bytes(buffer.data()))
+            except OSError as e:
+                print(f"保存静态帧失败: {e}")
+
+    def show_video_poster(self):
+        """显示当前视频的静态帧 (看门狗调用)，没有缓存时返回 False"""
+        poster_path = MediaCache().poster_path(self.current_video_path, *self.render_size(), self.video_mode)
+        pixmap = QPixmap(poster_path) if poster_path and os.path.exists(poster_path) else QPixmap()
+        if pixmap.isNull():
+            return False
+        self.opencv_player.show_still(pixmap)
+        return True
+
     def show_video_error(self, message):
         """显示视频错误信息"""
         error_pixmap = QPixmap(self.screen_width, self.screen_height)
@@ -1477,6 +5143,14 @@ class DynamicWallpaper(QMainWindow):
         speed_custom_action = speed_menu.addAction("⚙️ 自定义速度")
         speed_custom_action.triggered.connect(self.set_custom_speed)
         
+        speed_menu.addSeparator()
+        for interpolation, label in (("off", "慢速插帧: 关闭"), ("blend", "慢速插帧: 混合"),
+                                     ("motion", "慢速插帧: 运动补偿")):
+            action = speed_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(self.interpolation == interpolation)
+            action.triggered.connect(lambda checked, m=interpolation: self.set_interpolation(m))
+        
         menu.addMenu(speed_menu)
         
         menu.addSeparator()
@@ -1496,10 +5170,33 @@ class DynamicWallpaper(QMainWindow):
         free_action = arrange_menu.addAction("🎯 自由排列")
         free_action.triggered.connect(lambda: self.set_icon_arrangement("free"))
         
+        arrange_menu.addSeparator()
+        
+        if self.icon_layer_mode == "painted":
+            layer_action = arrange_menu.addAction("🧩 使用独立图标控件")
+            layer_action.triggered.connect(lambda: self.set_icon_layer_mode("widget"))
+        else:
+            layer_action = arrange_menu.addAction("🎨 单层绘制图标 (图标多时更快)")
+            layer_action.triggered.connect(lambda: self.set_icon_layer_mode("painted"))
+        
         menu.addMenu(arrange_menu)
         
         menu.addSeparator()
         
+        effects_menu = QMenu("🎞️ 视频效果", menu)
+        effects_menu.addAction("亮度...").triggered.connect(self.choose_frame_brightness)
+        effects_menu.addAction("色调...").triggered.connect(self.choose_frame_tint)
+        clear_tint_action = effects_menu.addAction("清除色调")
+        clear_tint_action.setEnabled(bool(self.frame_tint_strength))
+        clear_tint_action.triggered.connect(lambda: self.set_frame_effects(tint="", tint_strength=0))
+        effects_menu.addSeparator()
+        for backdrop, label in (("none", "图标背景: 原样"), ("darken", "图标背景: 压暗"), ("blur", "图标背景: 模糊")):
+            action = effects_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(self.icon_backdrop == backdrop)
+            action.triggered.connect(lambda checked, b=backdrop: self.set_frame_effects(backdrop=b))
+        menu.addMenu(effects_menu)
+        
         icon_size_action = menu.addAction("📏 设置图标大小")
         icon_size_action.triggered.connect(self.set_icon_size)
         
@@ -1525,7 +5222,7 @@ class DynamicWallpaper(QMainWindow):
 
     def set_custom_speed(self):
         """打开自定义速度设置对话框"""
-        dialog = PlaybackSpeedDialog(self.icon_container)
+        dialog = PlaybackSpeedDialog(self)
         dialog.exec_()
 
     def set_playback_speed(self, speed_percent):
@@ -1538,6 +5235,13 @@ class DynamicWallpaper(QMainWindow):
         # 保存设置
         self.save_settings()
 
+    def set_interpolation(self, mode):
+        """设置慢速插帧模式"""
+        self.interpolation = mode
+        if self.opencv_player:
+            self.opencv_player.set_interpolation(mode)
+        self.save_settings()
+
     def create_new_shortcut(self):
         """创建新的快捷方式 - 修复文本颜色问题"""
         try:
@@ -1704,47 +5408,25 @@ class DynamicWallpaper(QMainWindow):
             self.icon_container.setAttribute(Qt.WA_TransparentForMouseEvents, False)
 
     def select_video(self):
-        """选择视频文件 - 优化文件对话框性能"""
+        """选择视频文件 - 显示缩略图"""
         try:
             # 暂停视频播放以释放资源
             if self.opencv_player:
                 self.opencv_player.pause()
                 
-            # 使用优化的文件对话框
-            file_dialog = QFileDialog(self.icon_container)
-            file_dialog.setWindowTitle("选择视频文件")
-            
-            # 设置默认目录为上次使用的视频目录
-            if os.path.exists(self.last_video_dir):
-                file_dialog.setDirectory(self.last_video_dir)
-            else:
-                file_dialog.setDirectory(os.path.expanduser("/opt/apps/LinboxDtbz/video/Videos"))
-            
-            # 优化文件过滤器 - 只显示常见视频格式
-            file_dialog.setNameFilter("视频文件 (*.mp4 *.avi *.mkv *.mov *.wmv *.flv *.webm *.m4v)")
-            file_dialog.setFileMode(QFileDialog.ExistingFile)
-            
-            # 设置选项优化性能
-            file_dialog.setOption(QFileDialog.DontUseNativeDialog, False)  # 使用原生对话框
-            file_dialog.setOption(QFileDialog.DontResolveSymlinks, True)   # 不解析符号链接
-            
-            # 禁用预览等功能以提高性能
-            file_dialog.setOption(QFileDialog.HideNameFilterDetails, True)
-            
-            # 设置视图模式为列表（通常更快）
-            file_dialog.setViewMode(QFileDialog.List)
+            # 缩略图选择对话框，默认打开上次使用的目录
+            directory = self.last_video_dir if os.path.exists(self.last_video_dir) else os.path.expanduser("/opt/apps/LinboxDtbz/video/Videos")
+            dialog = WallpaperGalleryDialog("video", directory, self.icon_container)
             
             # 临时禁用图标容器的鼠标事件穿透
             self.icon_container.setAttribute(Qt.WA_TransparentForMouseEvents, True)
             
-            if file_dialog.exec_() == QFileDialog.Accepted:
-                selected_files = file_dialog.selectedFiles()
-                if selected_files:
-                    file_path = selected_files[0]
-                    # 更新上次使用的目录
-                    self.last_video_dir = os.path.dirname(file_path)
-                    self.save_settings()
-                    self.set_video_background(file_path)
+            if dialog.exec_() == QDialog.Accepted and dialog.selected_path:
+                file_path = dialog.selected_path
+                # 更新上次使用的目录
+                self.last_video_dir = os.path.dirname(file_path)
+                self.save_settings()
+                self.set_video_background(file_path)
             
             # 恢复视频播放
             if self.opencv_player:
@@ -1800,47 +5482,25 @@ class DynamicWallpaper(QMainWindow):
             self.icon_container.setAttribute(Qt.WA_TransparentForMouseEvents, False)
 
     def select_image(self):
-        """选择图片文件 - 优化文件对话框性能"""
+        """选择图片文件 - 显示缩略图"""
         try:
             # 暂停视频播放以释放资源
             if self.opencv_player:
                 self.opencv_player.pause()
                 
-            # 使用优化的文件对话框
-            file_dialog = QFileDialog(self.icon_container)
-            file_dialog.setWindowTitle("选择图片文件")
-            
-            # 设置默认目录为上次使用的图片目录
-            if os.path.exists(self.last_image_dir):
-                file_dialog.setDirectory(self.last_image_dir)
-            else:
-                file_dialog.setDirectory(os.path.expanduser("/opt/apps/LinboxDtbz/pictures"))
-            
-            # 优化文件过滤器 - 只显示常见图片格式
-            file_dialog.setNameFilter("图片文件 (*.png *.jpg *.jpeg *.bmp *.gif *.tiff *.webp)")
-            file_dialog.setFileMode(QFileDialog.ExistingFile)
-            
-            # 设置选项优化性能
-            file_dialog.setOption(QFileDialog.DontUseNativeDialog, False)  # 使用原生对话框
-            file_dialog.setOption(QFileDialog.DontResolveSymlinks, True)   # 不解析符号链接
-            
-            # 禁用预览等功能以提高性能
-            file_dialog.setOption(QFileDialog.HideNameFilterDetails, True)
-            
-            # 设置视图模式为列表（通常更快）
-            file_dialog.setViewMode(QFileDialog.List)
+            # 缩略图选择对话框，默认打开上次使用的目录
+            directory = self.last_image_dir if os.path.exists(self.last_image_dir) else os.path.expanduser("/opt/apps/LinboxDtbz/pictures")
+            dialog = WallpaperGalleryDialog("image", directory, self.icon_container)
             
             # 临时禁用图标容器的鼠标事件穿透
             self.icon_container.setAttribute(Qt.WA_TransparentForMouseEvents, True)
             
-            if file_dialog.exec_() == QFileDialog.Accepted:
-                selected_files = file_dialog.selectedFiles()
-                if selected_files:
-                    file_path = selected_files[0]
-                    # 更新上次使用的目录
-                    self.last_image_dir = os.path.dirname(file_path)
-                    self.save_settings()
-                    self.set_image_background(file_path)
+            if dialog.exec_() == QDialog.Accepted and dialog.selected_path:
+                file_path = dialog.selected_path
+                # 更新上次使用的目录
+                self.last_image_dir = os.path.dirname(file_path)
+                self.save_settings()
+                self.set_image_background(file_path)
             
             # 恢复视频播放
             if self.opencv_player:
@@ -1918,6 +5578,7 @@ class DynamicWallpaper(QMainWindow):
             print(f"设置视频背景错误: {e}")
             QMessageBox.warning(self.icon_container, "错误", f"无法设置视频背景: {e}")
 
+    @TRACER.traced()
     def set_image_background(self, image_path):
         """设置图片背景"""
         self.current_background_type = "image"
@@ -1941,13 +5602,24 @@ class DynamicWallpaper(QMainWindow):
             self.save_settings()
 
     def set_video_mode(self, mode):
-        """设置视频显示模式"""
+        """设置视频显示模式 - 转码文件中已经包含显示模式，使用或可以使用转码文件时重新加载"""
         self.video_mode = mode
         
         if self.current_background_type == "video" and self.opencv_player:
-            self.opencv_player.set_video_mode(mode)
-            
-        self.refresh_desktop_icons()
+            player = self.opencv_player
+            record = player.resume_record
+            uses_cache = (record["path"] if record else player.video_path) != self.current_video_path
+            effects = self.frame_effects()
+            cached = MediaCache().lookup(self.current_video_path, *self.render_size(), mode, effects.lut_key())
+            if record is not None and (uses_cache or cached):
+                # 休眠中: 恢复时打开新模式对应的文件
+                record["path"] = cached or self.current_video_path
+                player.set_effects(effects, lut_baked=cached is not None)
+                player.set_video_mode(mode)
+            elif player.is_open() and (uses_cache or cached):
+                self.load_video_file(self.current_video_path)
+            else:
+                player.set_video_mode(mode)
         
         # 保存设置
         self.save_settings()
@@ -1958,8 +5630,6 @@ class DynamicWallpaper(QMainWindow):
         
         if self.current_background_type == "image":
             self.apply_image_mode()
-            
-        self.refresh_desktop_icons()
         
         # 保存设置
         self.save_settings()
@@ -1979,15 +5649,21 @@ class DynamicWallpaper(QMainWindow):
             
             screen_width = self.screen_width
             screen_height = self.screen_height
+            # 缩放类模式直接缩放到物理分辨率，Qt 不再二次缩放
+            ratio = self.device_pixel_ratio
+            physical_width = round(screen_width * ratio)
+            physical_height = round(screen_height * ratio)
             
             if self.image_mode == "scale":
-                scaled_pixmap = pixmap.scaled(screen_width, screen_height, 
+                scaled_pixmap = pixmap.scaled(physical_width, physical_height, 
                                             Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+                scaled_pixmap.setDevicePixelRatio(ratio)
                 self.image_label.setPixmap(scaled_pixmap)
                 
             elif self.image_mode == "stretch":
-                scaled_pixmap = pixmap.scaled(screen_width, screen_height, 
+                scaled_pixmap = pixmap.scaled(physical_width, physical_height, 
                                             Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+                scaled_pixmap.setDevicePixelRatio(ratio)
                 self.image_label.setPixmap(scaled_pixmap)
                 
             elif self.image_mode == "tile":
@@ -2007,115 +5683,132 @@ class DynamicWallpaper(QMainWindow):
                 self.image_label.setPixmap(pixmap)
                 
             elif self.image_mode == "fit":
-                scaled_pixmap = pixmap.scaled(screen_width, screen_height, 
+                scaled_pixmap = pixmap.scaled(physical_width, physical_height, 
                                             Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                scaled_pixmap.setDevicePixelRatio(ratio)
                 self.image_label.setPixmap(scaled_pixmap)
                 self.image_label.setAlignment(Qt.AlignCenter)
 
     def set_icon_arrangement(self, arrangement):
         """设置图标排列方式"""
         self.icon_arrangement = arrangement
+        # 只是布局变化，移动现有图标即可；自由排列保留手动摆放的位置
+        if arrangement != "free":
+            self.layout_engine.reset(arrangement)
         self.arrange_desktop_icons()
-        self.refresh_desktop_icons()
         
         # 保存设置
         self.save_settings()
 
     def arrange_desktop_icons(self):
-        """排列桌面图标 - 避开底部面板区域"""
+        """排列桌面图标 - 使用布局引擎，避开面板占用的区域"""
         if not self.desktop_icons:
             return
-            
-        # 关键修复：避开 XFCE4 面板区域
-        # 估计面板高度，通常为40-60像素，为安全起见留更多空间
-        panel_height = 80
-        available_height = self.screen_height - panel_height
         
-        icon_width = self.icon_size + 20
-        icon_height = self.icon_size + 40
+        area = self.icon_work_area()
         margin = 20
+        cell_width = self.icon_size + 20
+        cell_height = self.icon_size + 40
+        cols = max(1, (area.width() - margin * 2) // cell_width)
+        rows = max(1, (area.height() - margin * 2) // cell_height)
         
-        if self.icon_arrangement == "grid":
-            max_cols = max(1, (self.screen_width - margin * 2) // icon_width)
-            for i, icon in enumerate(self.desktop_icons):
-                row = i // max_cols
-                col = i % max_cols
-                x = margin + col * icon_width
-                y = margin + row * icon_height
-                # 确保图标不会超出可用高度
-                if y + icon_height > available_height - margin:
-                    # 如果超出，重新从左上角开始
-                    x = margin
-                    y = margin
-                icon.move(x, y)
-                
-        elif self.icon_arrangement == "horizontal":
-            for i, icon in enumerate(self.desktop_icons):
-                x = margin + i * icon_width
-                y = margin
-                if x + icon_width > self.screen_width - margin:
-                    x = margin
-                    y += icon_height
-                # 确保图标不会超出可用高度
-                if y + icon_height > available_height - margin:
-                    y = margin
-                icon.move(x, y)
-                
-        elif self.icon_arrangement == "vertical":
-            for i, icon in enumerate(self.desktop_icons):
-                x = margin
-                y = margin + i * icon_height
-                # 确保图标不会超出可用高度
-                if y + icon_height > available_height - margin:
-                    x += icon_width
-                    y = margin
-                icon.move(x, y)
-                
-        elif self.icon_arrangement == "free":
-            for icon in self.desktop_icons:
-                max_x = self.screen_width - icon_width - margin
-                max_y = available_height - icon_height - margin
-                x = random.randint(margin, max(margin, max_x))
-                y = random.randint(margin, max(margin, max_y))
-                icon.move(x, y)
+        paths = [icon.desktop_file for icon in self.desktop_icons]
+        cells = self.layout_engine.layout(self.icon_arrangement, paths, cols, rows)
+        for icon in self.desktop_icons:
+            col, row = cells[icon.desktop_file]
+            icon.move(area.x() + margin + col * cell_width, area.y() + margin + row * cell_height)
+        
+        if self.layout_engine.dirty:
+            self.save_settings()
+        
+        # 图标区域背景使用图标矩形，图标移动后更新
+        if self.icon_backdrop != "none":
+            self.apply_frame_effects()
+
+    def icon_rects(self, scale=1.0):
+        """图标在屏幕上的矩形 (图标容器与屏幕左上角对齐)，scale 把逻辑像素换算成帧像素"""
+        rects = []
+        for icon in self.desktop_icons:
+            rect = icon.rect if isinstance(icon, PaintedDesktopIcon) else icon.geometry()
+            rects.append(tuple(round(v * scale) for v in (rect.x(), rect.y(), rect.width(), rect.height())))
+        return rects
+
+    def frame_effects(self):
+        """按当前设置和图标位置创建 FrameEffects"""
+        scale = self.opencv_player.pixel_ratio if self.opencv_player else 1.0
+        return FrameEffects(self.frame_brightness, self.frame_tint, self.frame_tint_strength,
+                            self.icon_backdrop, self.icon_rects(scale) if self.icon_backdrop != "none" else ())
+
+    def apply_frame_effects(self):
+        """把效果设置应用到播放器，烘焙进视频的亮度和色调变化时重新加载原视频"""
+        player = self.opencv_player
+        if not player:
+            return
+        effects = self.frame_effects()
+        if player.effects_baked and player.effects.lut_key() != effects.lut_key():
+            if self.current_background_type == "video" and player.is_open():
+                self.load_video_file(self.current_video_path)
+                return
+        player.set_effects(effects, lut_baked=player.effects_baked)
+
+    def set_frame_effects(self, brightness=None, tint=None, tint_strength=None, backdrop=None):
+        """修改视频帧效果 (菜单和控制命令)"""
+        if brightness is not None:
+            self.frame_brightness = brightness
+        if tint is not None:
+            self.frame_tint = tint
+        if tint_strength is not None:
+            self.frame_tint_strength = tint_strength
+        if backdrop is not None:
+            self.icon_backdrop = backdrop
+        self.apply_frame_effects()
+        self.save_settings()
+
+    def choose_frame_brightness(self):
+        brightness, ok = QInputDialog.getInt(self.icon_container, "视频亮度", "亮度 (%):",
+                                             self.frame_brightness, 20, 100, 5)
+        if ok:
+            self.set_frame_effects(brightness=brightness)
+
+    def choose_frame_tint(self):
+        color = QColorDialog.getColor(QColor(self.frame_tint or "#3050a0"), self.icon_container, "视频色调")
+        if not color.isValid():
+            return
+        strength, ok = QInputDialog.getInt(self.icon_container, "视频色调", "色调强度 (%):",
+                                           self.frame_tint_strength or 30, 0, 100, 5)
+        if ok:
+            self.set_frame_effects(tint=color.name(), tint_strength=strength)
+
+    def icon_work_area(self):
+        """图标可用区域 (图标容器坐标)
+
+        Qt 在 X11 上的 availableGeometry 取自窗口管理器发布的 _NET_WORKAREA，
+        已经扣除了面板等保留区域。
+        """
+        screen = QApplication.primaryScreen()
+        area = screen.availableGeometry().intersected(screen.geometry())
+        return area.translated(-self.screen_rect.x(), -self.screen_rect.y())
 
+    def on_icon_dropped(self, icon):
+        """拖放图标后吸附到最近的空闲单元格并记住位置"""
+        area = self.icon_work_area()
+        margin = 20
+        cell_width = self.icon_size + 20
+        cell_height = self.icon_size + 40
+        cols = max(1, (area.width() - margin * 2) // cell_width)
+        rows = max(1, (area.height() - margin * 2) // cell_height)
+        
+        center = icon.rect.center()
+        col = (center.x() - area.x() - margin) // cell_width
+        row = (center.y() - area.y() - margin) // cell_height
+        self.layout_engine.place(self.icon_arrangement, icon.desktop_file, col, row, cols, rows)
+        self.arrange_desktop_icons()
+
+    @TRACER.traced()
     def hide_original_desktop(self):
-        """彻底隐藏原桌面"""
+        """彻底隐藏原桌面 - 每次会话只修改一次"""
         try:
-            subprocess.run([
-                'gsettings', 'set', 'org.gnome.desktop.background', 
-                'show-desktop-icons', 'false'
-            ], timeout=5, capture_output=True)
-            
-            subprocess.run([
-                'gsettings', 'set', 'org.gnome.desktop.background', 
-                'picture-uri', '""'
-            ], timeout=5, capture_output=True)
-            
-            result = subprocess.run([
-                'xfconf-query', '-c', 'xfce4-desktop', '-p', 
-                '/backdrop/screen0/monitor0/image-path'
-            ], timeout=5, capture_output=True)
-            
-            if result.returncode == 0:
-                subprocess.run([
-                    'xfconf-query', '-c', 'xfce4-desktop', '-p', 
-                    '/backdrop/screen0/monitor0/image-path', '-s', '""'
-                ], timeout=5, capture_output=True)
-            
-            subprocess.run([
-                'gsettings', 'set', 'org.gnome.desktop.background', 
-                'primary-color', '#000000'
-            ], timeout=5, capture_output=True)
-            
-            try:
-                subprocess.run([
-                    'gsettings', 'set', 'org.gnome.desktop.background', 
-                    'draw-background', 'false'
-                ], timeout=5, capture_output=True)
-            except:
-                pass
-                
+            self.legacy_desktop.suppress()
         except Exception as e:
             print(f"隐藏原桌面时出错: {e}")
 
@@ -2208,138 +5901,222 @@ class DynamicWallpaper(QMainWindow):
         
         for icon in self.desktop_icons:
             icon.set_icon_size(icon_size, text_size)
+            self.request_icon(icon)
         
         self.arrange_desktop_icons()
-        self.refresh_desktop_icons()
         
         # 保存设置
         self.save_settings()
 
+    @TRACER.traced()
     def load_desktop_icons(self):
-        """加载桌面图标 - 优化性能"""
+        """加载桌面图标 - 首次全量加载，之后由目录监视增量更新"""
         for icon in self.desktop_icons:
-            icon.setParent(None)
-            icon.deleteLater()
+            self.destroy_icon(icon)
         self.desktop_icons.clear()
+        self.icon_widgets.clear()
+        self.desktop_model.entries = {}
         
-        # 优化的桌面目录搜索
-        desktop_dirs = [
-            os.path.expanduser("~/Desktop"),
-            os.path.expanduser("~/桌面"),
-        ]
-        
-        desktop_dir = None
-        for dir_path in desktop_dirs:
-            if os.path.exists(dir_path):
-                desktop_dir = dir_path
-                break
-        
-        if not desktop_dir:
+        added, removed, modified = self.desktop_model.scan()
+        if not self.desktop_model.desktop_dir:
             print("未找到桌面目录")
             return
         
-        # 使用更快的文件搜索
-        try:
-            desktop_files = [f for f in os.listdir(desktop_dir) 
-                           if f.endswith('.desktop') and os.path.isfile(os.path.join(desktop_dir, f))]
-            desktop_files = [os.path.join(desktop_dir, f) for f in desktop_files]
-        except Exception as e:
-            print(f"读取桌面目录错误: {e}")
+        self.apply_desktop_changes(added, removed, modified)
+
+    @TRACER.traced()
+    def apply_desktop_changes(self, added, removed, modified):
+        """根据桌面目录的变化只更新受影响的图标控件"""
+        layout_changed = False
+        for desktop_file in removed:
+            DesktopEntry.forget(desktop_file)
+            icon_widget = self.icon_widgets.get(desktop_file)
+            if icon_widget:
+                self.remove_icon(icon_widget)
+                self.destroy_icon(icon_widget)
+                layout_changed = True
+        
+        # 先创建占位图标并立即排列，解析和解码交给后台线程
+        # 已知隐藏 (Hidden/NoDisplay/TryExec不满足) 的条目不显示
+        created = False
+        for desktop_file in sorted(added) + sorted(modified):
+            stat_key = self.desktop_model.entries.get(desktop_file)
+            entry = DesktopEntry.cached(desktop_file, stat_key)
+            icon_widget = self.icon_widgets.get(desktop_file)
+            if entry is not None and not entry.visible:
+                if icon_widget:
+                    self.remove_icon(icon_widget)
+                    self.destroy_icon(icon_widget)
+                    layout_changed = True
+                continue
+            if icon_widget is None:
+                try:
+                    icon_widget = self.create_icon(desktop_file, entry)
+                    icon_widget.set_icon_size(self.icon_size, self.text_size)
+                    icon_widget.show()
+                    
+                    self.desktop_icons.append(icon_widget)
+                    self.icon_widgets[desktop_file] = icon_widget
+                    created = True
+                        
+                except Exception as e:
+                    print(f"加载桌面图标失败 {desktop_file}: {e}")
+                    continue
+            self.request_icon(icon_widget)
+        
+        if created or layout_changed:
+            self.arrange_desktop_icons()
+        if created:
+            self.raise_icons()
+
+    def request_icon(self, icon):
+        """请求后台加载图标的解析结果和图像"""
+        icon.load_token += 1
+        self.icon_loader.request(icon.desktop_file, icon.load_token,
+                                 self.desktop_model.entries.get(icon.desktop_file), icon.icon_size,
+                                 self.icon_container.devicePixelRatioF())
+
+    def on_icon_loaded(self, desktop_file, token, result):
+        """后台加载完成 - 在GUI线程中替换占位符"""
+        entry, key, image, claimed = result
+        cache = self.icon_loader.pixmap_cache
+        
+        pixmap = None
+        if claimed:
+            # 本请求负责解码：放入共享缓存并分发给等待同一图像的图标
+            if image is not None:
+                pixmap = QPixmap.fromImage(image)
+                pixmap.setDevicePixelRatio(key[3])
+                cache.put(key, pixmap)
+            self.icon_loader.release(key)
+            for waiting_file, waiting_token in self.icon_waiters.pop(key, ()):
+                self.present_icon(waiting_file, waiting_token, entry=None, pixmap=pixmap)
+        elif key is not None:
+            pixmap = cache.get(key)
+            if pixmap is None and self.icon_loader.is_inflight(key):
+                self.icon_waiters.setdefault(key, []).append((desktop_file, token))
+                self.present_icon(desktop_file, token, entry, pixmap=None, final=False)
+                return
+        
+        self.present_icon(desktop_file, token, entry, pixmap)
+
+    def present_icon(self, desktop_file, token, entry, pixmap, final=True):
+        """把加载结果应用到图标上"""
+        icon = self.icon_widgets.get(desktop_file)
+        if icon is None or icon.load_token != token:
             return
         
-        for desktop_file in desktop_files:
-            try:
-                icon_widget = DesktopIconWidget(desktop_file, self.icon_container)
-                icon_widget.set_icon_size(self.icon_size, self.text_size)
-                icon_widget.show()
-                
-                self.desktop_icons.append(icon_widget)
-                    
-            except Exception as e:
-                print(f"加载桌面图标失败 {desktop_file}: {e}")
+        if entry is not None:
+            if not entry.visible:
+                self.remove_icon(icon)
+                self.destroy_icon(icon)
+                self.arrange_desktop_icons()
+                return
+            if entry is not icon.entry:
+                icon.apply_entry(entry)
         
-        self.arrange_desktop_icons()
-        self.raise_icons()
+        if not final:
+            return
+        if pixmap is None and icon.entry is not None:
+            # 索引中没有对应文件或解码失败，回退到Qt主题查找
+            pixmap = icon.load_icon(icon.icon_size)
+            if pixmap and not pixmap.isNull():
+                pixmap = pixmap.scaled(icon.icon_size - 4, icon.icon_size - 4,
+                                       Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        icon.set_icon_image(pixmap)
 
     def raise_icons(self):
         """确保图标在最前面"""
+        if self.icon_layer:
+            self.icon_layer.raise_()
         for icon in self.desktop_icons:
             icon.raise_()
             icon.show()
 
     def refresh_desktop_icons(self):
-        """刷新桌面图标"""
-        self.load_desktop_icons()
+        """刷新桌面图标 - 只处理有变化的 .desktop 文件"""
+        self.desktop_model.rescan()
 
+    @TRACER.traced()
     def set_desktop_window(self):
-        """使用多种方法确保窗口位于最底层并替代原桌面"""
+        """确保窗口位于最底层并替代原桌面 - 优先在进程内设置，失败时使用命令行工具"""
+        win_id = int(self.winId())
         try:
-            win_id = self.winId()
-            
-            result1 = subprocess.run([
-                'xprop', '-id', str(int(win_id)),
-                '-f', '_NET_WM_WINDOW_TYPE', '32a',
-                '-set', '_NET_WM_WINDOW_TYPE', '_NET_WM_WINDOW_TYPE_DESKTOP'
-            ], capture_output=True, text=True, timeout=10)
-            
-            result2 = subprocess.run([
-                'xprop', '-id', str(int(win_id)),
-                '-f', '_NET_WM_STATE', '32a',
-                '-set', '_NET_WM_STATE', '_NET_WM_STATE_BELOW'
-            ], capture_output=True, text=True, timeout=10)
-            
-            try:
-                result3 = subprocess.run([
-                    'wmctrl', '-i', '-r', str(int(win_id)), '-b', 'add,below'
-                ], capture_output=True, text=True, timeout=10)
-                print("使用wmctrl设置窗口为底层")
-            except:
-                print("wmctrl不可用，跳过此方法")
-            
-            try:
-                result4 = subprocess.run([
-                    'xdotool', 'windowlower', str(int(win_id))
-                ], capture_output=True, text=True, timeout=10)
-                print("使用xdotool将窗口置于底层")
-            except:
-                print("xdotool不可用，跳过此方法")
-            
-            result5 = subprocess.run([
-                'xprop', '-id', str(int(win_id)),
-                '-set', '_NET_WM_DESKTOP', '0xFFFFFFFF'
-            ], capture_output=True, text=True, timeout=10)
-            
-            try:
-                result6 = subprocess.run([
-                    'xprop', '-id', str(int(win_id)),
-                    '-set', '_NET_WM_STATE', '_NET_WM_STATE_STICKY'
-                ], capture_output=True, text=True, timeout=10)
-            except:
-                pass
-            
-            if result1.returncode == 0 or result2.returncode == 0:
-                print("成功将窗口设置为桌面背景层。")
+            x11 = X11DesktopWindow.shared()
+            if x11:
+                if x11.apply(win_id):
+                    print("成功将窗口设置为桌面背景层。")
+                else:
+                    print("设置桌面窗口属性时出现 X 错误")
             else:
-                print(f"xprop 执行出错: {result1.stderr} {result2.stderr}")
-                
-            QTimer.singleShot(500, self.ensure_lowest_layer)
-            
-        except subprocess.TimeoutExpired:
-            print("错误: 设置桌面窗口属性的命令超时。")
+                self.set_desktop_window_with_tools(win_id)
         except Exception as e:
             print(f"设置桌面窗口时发生未知错误: {e}")
+        
+        self.wait_for_window_manager()
+
+    def wait_for_window_manager(self, attempts=40):
+        """等待窗口管理器接管窗口后做最终层级检查，最多等待约 2 秒"""
+        x11 = X11DesktopWindow.shared()
+        if not x11:
+            # 命令行工具无法低成本地查询，使用固定延时
+            QTimer.singleShot(500, self.ensure_lowest_layer)
+            return
+        if x11.is_managed(int(self.winId())) or attempts <= 0:
+            self.timeline.mark("窗口管理器已接管" if attempts > 0 else "等待窗口管理器超时")
+            self.final_layer_check()
+            return
+        QTimer.singleShot(50, lambda: self.wait_for_window_manager(attempts - 1))
+
+    def set_desktop_window_with_tools(self, win_id):
+        """使用 xprop/wmctrl/xdotool 设置窗口属性 (没有 libX11 时的后备方案)"""
+        def run_tool(args):
+            try:
+                return subprocess.run(args, capture_output=True, text=True, timeout=10)
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"{args[0]} 不可用，跳过此方法: {e}")
+                return None
+        
+        result1 = run_tool([
+            'xprop', '-id', str(win_id),
+            '-f', '_NET_WM_WINDOW_TYPE', '32a',
+            '-set', '_NET_WM_WINDOW_TYPE', '_NET_WM_WINDOW_TYPE_DESKTOP'
+        ])
+        result2 = run_tool([
+            'xprop', '-id', str(win_id),
+            '-f', '_NET_WM_STATE', '32a',
+            '-set', '_NET_WM_STATE', '_NET_WM_STATE_BELOW, _NET_WM_STATE_STICKY'
+        ])
+        run_tool([
+            'xprop', '-id', str(win_id),
+            '-f', '_NET_WM_DESKTOP', '32c',
+            '-set', '_NET_WM_DESKTOP', '0xFFFFFFFF'
+        ])
+        if run_tool(['wmctrl', '-i', '-r', str(win_id), '-b', 'add,below']):
+            print("使用wmctrl设置窗口为底层")
+        if run_tool(['xdotool', 'windowlower', str(win_id)]):
+            print("使用xdotool将窗口置于底层")
+        
+        if (result1 and result1.returncode == 0) or (result2 and result2.returncode == 0):
+            print("成功将窗口设置为桌面背景层。")
+        else:
+            print(f"xprop 执行出错: {result1 and result1.stderr} {result2 and result2.stderr}")
     
     def ensure_lowest_layer(self):
         """确保窗口位于最底层"""
         try:
-            win_id = self.winId()
+            win_id = int(self.winId())
             
-            try:
-                subprocess.run([
-                    'xdotool', 'windowlower', str(int(win_id))
-                ], capture_output=True, text=True, timeout=10)
-            except:
-                pass
+            x11 = X11DesktopWindow.shared()
+            if x11:
+                x11.lower(win_id)
+            else:
+                try:
+                    subprocess.run([
+                        'xdotool', 'windowlower', str(win_id)
+                    ], capture_output=True, text=True, timeout=10)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
                 
             self.hide_original_desktop()
             QTimer.singleShot(1000, self.final_layer_check)
@@ -2347,16 +6124,24 @@ class DynamicWallpaper(QMainWindow):
         except Exception as e:
             print(f"确保底层时出错: {e}")
     
+    @TRACER.traced()
     def final_layer_check(self):
-        """最终层级检查"""
+        """最终层级检查 - 窗口管理器映射窗口后可能重置状态，再设置一次"""
         try:
-            win_id = self.winId()
+            win_id = int(self.winId())
             
-            subprocess.run([
-                'xprop', '-id', str(int(win_id)),
-                '-f', '_NET_WM_STATE', '32a',
-                '-set', '_NET_WM_STATE', '_NET_WM_STATE_BELOW'
-            ], capture_output=True, text=True, timeout=10)
+            x11 = X11DesktopWindow.shared()
+            if x11:
+                x11.apply(win_id)
+            else:
+                try:
+                    subprocess.run([
+                        'xprop', '-id', str(win_id),
+                        '-f', '_NET_WM_STATE', '32a',
+                        '-set', '_NET_WM_STATE', '_NET_WM_STATE_BELOW, _NET_WM_STATE_STICKY'
+                    ], capture_output=True, text=True, timeout=10)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
             
             print("桌面窗口层级设置完成")
             self.hide_original_desktop()
@@ -2370,27 +6155,166 @@ class DynamicWallpaper(QMainWindow):
         try:
             if self.current_background_type == "video" and self.opencv_player:
                 self.apply_video_mode()
-                QTimer.singleShot(200, self.opencv_player.play)
+                self.opencv_player.play()
                 print("开始播放视频")
         except Exception as e:
             print(f"播放视频错误: {e}")
             QTimer.singleShot(1000, self.recover_from_error)
 
+    VIDEO_MODES = ("scale", "stretch", "fit")
+    IMAGE_MODES = ("scale", "stretch", "tile", "center", "fit")
+
+    def handle_control_command(self, command, args):
+        """处理控制 socket 的命令 (wallpaperctl.py)，参数错误时抛出 ValueError"""
+        if command == "ping":
+            return {"pid": os.getpid()}
+        if command in ("set-video", "set-image"):
+            path = args.get("path", "")
+            if not os.path.isfile(path):
+                raise ValueError(f"文件不存在: {path}")
+            if command == "set-video":
+                self.set_video_background(path)
+            else:
+                self.set_image_background(path)
+            return {"path": path}
+        if command in ("pause", "resume", "hibernate", "wake"):
+            if self.current_background_type != "video" or not self.opencv_player:
+                raise ValueError("当前背景不是视频")
+            if command == "pause":
+                self.opencv_player.pause()
+            elif command == "hibernate":
+                self.hibernate_wallpaper()
+                self.hibernate_requested = self.opencv_player.resume_record is not None
+                return {"hibernated": self.opencv_player.resume_record is not None,
+                        "rss_mb": self.hibernated_rss_mb}
+            elif self.opencv_player.resume_record is not None:
+                if command == "resume":
+                    self.opencv_player.resume_record["playing"] = True
+                self.wake_wallpaper()
+                return {"playing": self.opencv_player.resume_record["playing"]}
+            else:
+                self.opencv_player.resume()
+            return {"playing": self.opencv_player.playing}
+        if command == "speed":
+            try:
+                speed = int(args.get("percent"))
+            except (TypeError, ValueError):
+                raise ValueError("速度必须是整数百分比")
+            if not 10 <= speed <= 300:
+                raise ValueError("速度范围为 10 到 300")
+            self.set_playback_speed(speed)
+            return {"speed": speed}
+        if command in ("video-mode", "image-mode"):
+            mode = args.get("mode")
+            modes = self.VIDEO_MODES if command == "video-mode" else self.IMAGE_MODES
+            if mode not in modes:
+                raise ValueError(f"模式必须是 {', '.join(modes)} 之一")
+            if command == "video-mode":
+                self.set_video_mode(mode)
+            else:
+                self.set_image_mode(mode)
+            return {"mode": mode}
+        if command == "effects":
+            changes = {}
+            if args.get("brightness") is not None:
+                if not 20 <= int(args["brightness"]) <= 100:
+                    raise ValueError("亮度范围为 20 到 100")
+                changes["brightness"] = int(args["brightness"])
+            if args.get("tint") is not None:
+                if args["tint"] and not QColor(args["tint"]).isValid():
+                    raise ValueError(f"无效的颜色: {args['tint']}")
+                changes["tint"] = QColor(args["tint"]).name() if args["tint"] else ""
+            if args.get("tint_strength") is not None:
+                if not 0 <= int(args["tint_strength"]) <= 100:
+                    raise ValueError("色调强度范围为 0 到 100")
+                changes["tint_strength"] = int(args["tint_strength"])
+            if args.get("backdrop") is not None:
+                if args["backdrop"] not in FrameEffects.BACKDROP_MODES:
+                    raise ValueError(f"图标背景必须是 {', '.join(FrameEffects.BACKDROP_MODES)} 之一")
+                changes["backdrop"] = args["backdrop"]
+            self.set_frame_effects(**changes)
+            return {"brightness": self.frame_brightness, "tint": self.frame_tint,
+                    "tint_strength": self.frame_tint_strength, "backdrop": self.icon_backdrop}
+        if command == "interpolation":
+            mode = args.get("mode")
+            if mode not in FrameInterpolator.MODES:
+                raise ValueError(f"插帧模式必须是 {', '.join(FrameInterpolator.MODES)} 之一")
+            self.set_interpolation(mode)
+            return {"mode": mode}
+        if command == "reload-icons":
+            self.load_desktop_icons()
+            return {"icons": len(self.desktop_icons)}
+        if command == "stats":
+            return self.collect_stats()
+        if command == "quit":
+            QTimer.singleShot(0, self.close_application)
+            return {}
+        raise ValueError(f"未知命令: {command}")
+
+    def collect_stats(self):
+        """运行状态统计"""
+        pixmap_cache = IconPixmapCache.shared()
+        launcher = LauncherService.shared()
+        stats = {
+            "pid": os.getpid(),
+            "uptime_s": round(time.monotonic() - STARTUP_TIME, 1),
+            "background_type": self.current_background_type,
+            "video_path": self.current_video_path,
+            "image_path": self.current_image_path,
+            "playing": bool(self.opencv_player and self.opencv_player.playing),
+            "playback_speed": self.playback_speed,
+            "interpolation": self.opencv_player.interpolation_stats() if self.opencv_player else {},
+            "decoder": "process" if self.opencv_player and self.opencv_player.decoder else "inline",
+            "presenter": "xshm" if self.opencv_player and self.opencv_player.presenter else "qt",
+            "device_pixel_ratio": self.device_pixel_ratio,
+            "render_size": list(self.render_size()),
+            "decoder_restarts": self.opencv_player.decoder.restarts if self.opencv_player and self.opencv_player.decoder else 0,
+            "watchdog": self.playback_watchdog.stats() if self.playback_watchdog else {},
+            "hibernated": bool(self.opencv_player and self.opencv_player.resume_record is not None),
+            "hibernated_rss_mb": self.hibernated_rss_mb,
+            "video_mode": self.video_mode,
+            "image_mode": self.image_mode,
+            "icons": len(self.desktop_icons),
+            "icon_layer": self.icon_layer_mode,
+            "icon_cache_hits": pixmap_cache.hits,
+            "icon_cache_misses": pixmap_cache.misses,
+            "launch_latency_ms": [round(v, 1) for v in launcher.latencies[-10:]] if launcher else [],
+            "startup_ms": {name: round(elapsed, 1) for name, elapsed in self.timeline.marks},
+        }
+        rss_mb = read_rss_mb()
+        if rss_mb is not None:
+            stats["rss_mb"] = rss_mb
+        return stats
+
     def close_application(self):
         """关闭应用程序"""
         try:
+            self.visibility_timer.stop()
+            if self.playback_watchdog:
+                self.playback_watchdog.stop()
             if hasattr(self, 'opencv_player') and self.opencv_player:
-                self.opencv_player.stop()
+                self.opencv_player.shutdown()
+            
+            self.icon_loader.shutdown()
+            
+            if LauncherService.shared():
+                LauncherService.shared().shutdown()
+            
+            if X11DesktopWindow.shared():
+                X11DesktopWindow.shared().close()
+            
+            if self.control_server:
+                self.control_server.close()
             
             for icon in self.desktop_icons:
-                icon.setParent(None)
-                icon.deleteLater()
+                self.destroy_icon(icon)
             self.desktop_icons.clear()
             
             self.enable_xfdesktop()
             
             # 保存设置
             self.save_settings()
+            self.settings.flush()
             
         except Exception as e:
             print(f"关闭应用程序时出错: {e}")
@@ -2410,38 +6334,39 @@ class DynamicWallpaper(QMainWindow):
             if os.path.exists(video_path):
                 QTimer.singleShot(1000, lambda: self.load_video_file(video_path))
 
-def check_opencv_availability():
-    """检查OpenCV是否可用"""
-    try:
-        import cv2
-        print("OpenCV版本:", cv2.__version__)
-        return True
-    except ImportError:
-        print("错误: 未找到OpenCV库")
-        print("请安装OpenCV: pip install opencv-python")
-        return False
-
 def main():
     """主函数"""
-    # 检查OpenCV是否可用
-    if not check_opencv_availability():
-        print("无法启动: OpenCV不可用")
+    if "--optimize" in sys.argv[1:] or any(arg.startswith("--optimize=") for arg in sys.argv[1:]):
+        sys.exit(optimize_main(sys.argv[1:]))
+    
+    # OpenCV 只在使用视频背景时导入 (import_video_modules)
+    timeline = StartupTimeline.shared()
+    timeline.mark("模块已导入")
+    
+    # 单实例: 已有实例在运行时直接退出 (可以用 wallpaperctl.py 控制它)
+    instance_lock = SingleInstanceLock(os.path.join(get_runtime_dir(), "instance.lock"))
+    if not instance_lock.acquire():
+        print(f"动态壁纸已在运行 (pid {instance_lock.owner_pid()})，请使用 wallpaperctl.py 控制")
         return
     
-    app = QApplication(sys.argv)
+    # 在创建 QApplication 之前派生启动服务，此时进程还小且没有其他线程
+    LauncherService.start(close_fds=(instance_lock.fd,))
+    
+    argv = TRACER.configure(sys.argv)
+    
+    app = QApplication(argv)
     
     # 设置应用程序信息
     app.setApplicationName("动态壁纸")
     app.setApplicationVersion("2.0")
     app.setQuitOnLastWindowClosed(False)
+    timeline.mark("QApplication 已创建")
     
     try:
+        # 窗口映射后由 on_window_exposed 设置桌面属性并开始播放
         wallpaper = DynamicWallpaper()
         wallpaper.show()
         
-        # 延迟播放视频
-        QTimer.singleShot(1000, wallpaper.play)
-        
         print("动态壁纸应用程序已启动")
         print("使用说明:")
         print("- 在桌面上右键点击可打开设置菜单")
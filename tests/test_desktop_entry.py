@@ -0,0 +1,34 @@
+import os
+
+from main import DesktopEntry
+
+TEXT = ("[Desktop Entry]\n"
+        "Name=Editor\n"
+        "Name[zh_CN]=编辑器\n"
+        "Exec=myeditor %F\n"
+        "TryExec=myeditor\n")
+
+
+def test_localized_name(monkeypatch):
+    monkeypatch.setattr(DesktopEntry, "_locale_suffixes", ["zh_CN", "zh"])
+    entry = DesktopEntry.parse("/tmp/editor.desktop", TEXT)
+    assert entry.name == "编辑器"
+    assert entry.name_key == "Name[zh_CN]"
+
+
+def test_try_exec_follows_installs_and_path(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", str(bin_dir))
+    DesktopEntry.forget_programs()
+    entry = DesktopEntry.parse("/tmp/editor.desktop", TEXT)
+    assert not entry.visible
+
+    program = bin_dir / "myeditor"
+    program.write_text("#!/bin/sh\n")
+    program.chmod(0o755)
+    DesktopEntry.forget_programs()
+    assert entry.visible
+
+    monkeypatch.setenv("PATH", str(tmp_path))
+    assert not entry.visible
@@ -0,0 +1,34 @@
+from main import DesktopEntry, expand_exec_field
+
+
+def test_plain_arguments_and_field_codes():
+    assert expand_exec_field("gimp %U", files=["/a.png", "/b.png"]) == ["gimp", "/a.png", "/b.png"]
+    assert expand_exec_field("app --name=%c %f", files=["/x"], name="App") == ["app", "--name=App", "/x"]
+    assert expand_exec_field("app %i", icon="app-icon") == ["app", "--icon", "app-icon"]
+
+
+def test_percent_escape_outside_and_inside_quotes():
+    assert expand_exec_field("echo 100%%") == ["echo", "100%"]
+    assert expand_exec_field('sh -c "echo 100%%"') == ["sh", "-c", "echo 100%"]
+
+
+def test_backslash_escapes_inside_quotes():
+    assert expand_exec_field(r'app "a \"b\" \$HOME \\ \x"') == ["app", r'a "b" $HOME \ \x']
+
+
+def test_unquoted_backslash_is_an_escape_not_a_shell_fallback():
+    assert expand_exec_field(r"wine C:\\windows\\notepad.exe") == ["wine", r"C:\windows\notepad.exe"]
+    assert expand_exec_field(r"app a\ b") == ["app", "a b"]
+
+
+def test_wine_shortcut_from_desktop_file():
+    text = ("[Desktop Entry]\n"
+            "Name=Notepad\n"
+            'Exec=env WINEPREFIX="/home/user/.wine" wine C:\\\\\\\\windows\\\\\\\\notepad.exe\n')
+    entry = DesktopEntry.parse("/tmp/notepad.desktop", text)
+    assert expand_exec_field(entry.exec_cmd) == ["env", "WINEPREFIX=/home/user/.wine", "wine",
+                                                 r"C:\windows\notepad.exe"]
+
+
+def test_shell_metacharacters_fall_back_to_sh():
+    assert expand_exec_field("app %f | grep x %%", files=["/x"]) == ["/bin/sh", "-c", "app  | grep x %"]
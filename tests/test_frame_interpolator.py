@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+pytest.importorskip("cv2")
+import numpy as np
+import video_decoder
+from video_decoder import FrameInterpolator
+
+
+@pytest.fixture(autouse=True)
+def video_modules():
+    assert video_decoder.import_video_modules()
+
+
+def slow_source(delay):
+    """每次读取都要 delay 秒的源 (模拟解码和缩放)，帧内容逐帧变化"""
+    count = 0
+
+    def read_frame():
+        nonlocal count
+        time.sleep(delay)
+        count += 1
+        return np.full((16, 16, 3), count * 10 % 256, np.uint8)
+    return read_frame
+
+
+def test_blend_between_source_frames():
+    interpolator = FrameInterpolator("blend")
+    read_frame = slow_source(0)
+    assert int(interpolator.step(0, 0.0, read_frame)[0, 0, 0]) == 10
+    assert int(interpolator.step(1, 0.5, read_frame)[0, 0, 0]) == 15
+    assert int(interpolator.step(0, 0.75, read_frame)[0, 0, 0]) == 18
+    assert interpolator.frames == 3
+
+
+def test_decode_time_does_not_count_against_motion_budget():
+    interpolator = FrameInterpolator("motion")
+    read_frame = slow_source(FrameInterpolator.MOTION_BUDGET_MS * 2 / 1000)
+    for i in range(FrameInterpolator.WARMUP_FRAMES + 5):
+        assert interpolator.step(1, 0.5, read_frame) is not None
+    assert interpolator.cost_ms < FrameInterpolator.MOTION_BUDGET_MS
+    assert interpolator.motion and not interpolator.motion_disabled
+
+
+def test_slow_interpolation_falls_back_to_blend():
+    interpolator = FrameInterpolator("motion")
+    read_frame = slow_source(0)
+    for i in range(FrameInterpolator.WARMUP_FRAMES + 1):
+        interpolator.account(FrameInterpolator.MOTION_BUDGET_MS * 3)
+    assert interpolator.motion_disabled and not interpolator.motion
+    assert interpolator.step(1, 0.5, read_frame) is not None
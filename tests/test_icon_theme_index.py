@@ -0,0 +1,48 @@
+import os
+
+from main import IconThemeIndex
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def make_index(tmp_path, themes):
+    roots = [str(tmp_path / "icons" / theme) for theme in themes] + [str(tmp_path / "pixmaps")]
+    index = IconThemeIndex(roots)
+    index.update()
+    return index
+
+
+def test_selected_theme_wins_over_closer_size_in_fallback(tmp_path):
+    touch(str(tmp_path / "icons/Papirus/16x16/apps/firefox.svg"))
+    touch(str(tmp_path / "icons/hicolor/64x64/apps/firefox.png"))
+    index = make_index(tmp_path, ["Papirus", "hicolor"])
+    assert index.lookup("firefox", 64) == str(tmp_path / "icons/Papirus/16x16/apps/firefox.svg")
+
+
+def test_size_is_chosen_within_the_theme(tmp_path):
+    for size in (16, 48, 128):
+        touch(str(tmp_path / f"icons/Papirus/{size}x{size}/apps/term.png"))
+    index = make_index(tmp_path, ["Papirus", "hicolor"])
+    assert index.lookup("term", 64) == str(tmp_path / "icons/Papirus/128x128/apps/term.png")
+    assert index.lookup("term.png", 16) == str(tmp_path / "icons/Papirus/16x16/apps/term.png")
+
+
+def test_falls_back_to_later_themes_and_pixmaps(tmp_path):
+    touch(str(tmp_path / "icons/hicolor/48x48/apps/gimp.png"))
+    touch(str(tmp_path / "pixmaps/xterm.xpm"))
+    index = make_index(tmp_path, ["Papirus", "hicolor"])
+    assert index.lookup("gimp", 64) == str(tmp_path / "icons/hicolor/48x48/apps/gimp.png")
+    assert index.lookup("xterm", 64) == str(tmp_path / "pixmaps/xterm.xpm")
+    assert index.lookup("missing") is None
+
+
+def test_inherits_come_before_hicolor(tmp_path):
+    data_dir = tmp_path / "share"
+    theme_file = data_dir / "icons/Papirus-Dark/index.theme"
+    touch(str(theme_file))
+    theme_file.write_text("[Icon Theme]\nName=Papirus Dark\nInherits=Papirus,breeze,hicolor\n")
+    assert IconThemeIndex.theme_inherits("Papirus-Dark", [str(data_dir)]) == ["Papirus", "breeze", "hicolor"]
+    assert IconThemeIndex.theme_inherits("Missing", [str(data_dir)]) == []
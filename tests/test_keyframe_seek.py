@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip("cv2")
+import video_decoder
+from main import KeyframeIndex
+from video_decoder import seek_video
+
+
+class FakeCapture:
+    def __init__(self):
+        self.position = 0
+        self.calls = []
+
+    def set(self, prop, value):
+        self.calls.append(("set", value))
+        self.position = value
+        return True
+
+    def grab(self):
+        self.calls.append(("grab",))
+        self.position += 1
+        return True
+
+
+@pytest.fixture(autouse=True)
+def video_modules():
+    assert video_decoder.import_video_modules()
+
+
+def test_seek_from_keyframe_decodes_forward_to_position():
+    cap = FakeCapture()
+    seek_video(cap, 103, keyframe=100)
+    assert cap.calls == [("set", 100), ("grab",), ("grab",), ("grab",)]
+    assert cap.position == 103
+
+
+def test_seek_without_keyframe_lets_opencv_seek():
+    cap = FakeCapture()
+    seek_video(cap, 42)
+    assert cap.calls == [("set", 42)]
+    cap = FakeCapture()
+    seek_video(cap, 0)
+    assert cap.calls == []
+    cap = FakeCapture()
+    seek_video(cap, 10, keyframe=50)
+    assert cap.calls == [("set", 10)]
+
+
+def test_keyframes_are_counted_from_stream_start_time():
+    data = {"streams": [{"start_time": "1.400000"}],
+            "packets": [{"pts_time": "1.400000", "flags": "K__"},
+                        {"pts_time": "1.433333", "flags": "___"},
+                        {"pts_time": "3.400000", "flags": "K__"}]}
+    assert KeyframeIndex.parse_keyframes(data, 30) == [0, 60]
+    assert KeyframeIndex.parse_keyframes({"packets": [{"pts_time": "2.0", "flags": "K_"}]}, 25) == [50]
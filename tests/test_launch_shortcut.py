@@ -0,0 +1,69 @@
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+import main
+from main import DesktopEntry, DesktopIconWidget, LauncherService, PaintedDesktopIcon, PaintedIconLayer
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.launched = []
+
+    def launch(self, argv, cwd=None, label="", started=None):
+        self.launched.append((argv, cwd, label))
+        return True
+
+
+@pytest.fixture
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def launcher(monkeypatch):
+    fake = FakeLauncher()
+    monkeypatch.setattr(LauncherService, "shared", classmethod(lambda cls: fake))
+    return fake
+
+
+@pytest.fixture
+def shortcut(tmp_path):
+    path = tmp_path / "viewer.desktop"
+    path.write_text("[Desktop Entry]\n"
+                    "Name=Viewer\n"
+                    "Icon=image-viewer\n"
+                    f"Path={tmp_path}\n"
+                    "Exec=viewer --class %c %i %k %f\n")
+    return str(path)
+
+
+def expected(shortcut, tmp_path):
+    return (["viewer", "--class", "Viewer", "--icon", "image-viewer", shortcut], str(tmp_path), "Viewer")
+
+
+def test_widget_icon_launches(app, launcher, shortcut, tmp_path):
+    icon = DesktopIconWidget(shortcut, entry=DesktopEntry.load(shortcut))
+    icon.launch_application()
+    assert launcher.launched == [expected(shortcut, tmp_path)]
+
+
+def test_painted_icon_launches(app, launcher, shortcut, tmp_path):
+    layer = PaintedIconLayer()
+    icon = PaintedDesktopIcon(shortcut, layer, entry=DesktopEntry.load(shortcut))
+    icon.launch_application()
+    assert launcher.launched == [expected(shortcut, tmp_path)]
+
+
+def test_falls_back_to_popen_without_launcher(app, monkeypatch, shortcut):
+    monkeypatch.setattr(LauncherService, "shared", classmethod(lambda cls: None))
+    calls = []
+
+    class Process:
+        pid = 1234
+
+    def popen(argv, **kwargs):
+        calls.append((argv, kwargs["cwd"]))
+        return Process()
+    monkeypatch.setattr(main.subprocess, "Popen", popen)
+    DesktopIconWidget(shortcut, entry=DesktopEntry.load(shortcut)).launch_application()
+    assert calls and calls[0][0][0] == "viewer"
@@ -0,0 +1,52 @@
+import pytest
+
+from video_decoder import PlaybackClock
+
+
+def test_normal_speed_advances_one_frame_per_tick():
+    clock = PlaybackClock()
+    assert [clock.tick() for i in range(5)] == [1, 1, 1, 1, 1]
+    assert clock.phase == 0.0
+
+
+def test_slow_and_fast_rates():
+    clock = PlaybackClock(0.25)
+    assert [clock.tick() for i in range(8)] == [0, 0, 0, 1, 0, 0, 0, 1]
+    clock = PlaybackClock(2.5)
+    assert [clock.tick() for i in range(4)] == [2, 3, 2, 3]
+
+
+def test_rate_change_mid_phase_keeps_time_continuous():
+    clock = PlaybackClock(0.5)
+    frames = clock.tick()
+    assert frames == 0 and clock.phase == pytest.approx(0.5)
+    # 改变速率时保留小数进度: 不会跳回 (丢掉进度) 也不会跳过
+    clock.set_rate(0.75)
+    frames += clock.tick()
+    assert frames == 1 and clock.phase == pytest.approx(0.25)
+    clock.set_rate(2.0)
+    for i in range(10):
+        frames += clock.tick()
+    # 总帧数等于各段速率 x 节拍数之和的整数部分
+    assert frames == int(0.5 + 0.75 + 2.0 * 10)
+    assert clock.phase == pytest.approx(0.25)
+
+
+def test_cumulative_frames_match_total_progress():
+    clock = PlaybackClock()
+    rates = [0.3, 1.7, 0.1, 1.0, 2.9, 0.45] * 20
+    frames = 0
+    for rate in rates:
+        clock.set_rate(rate)
+        frames += clock.tick()
+    assert frames + clock.phase == pytest.approx(sum(rates))
+    assert 0.0 <= clock.phase < 1.0
+
+
+def test_reset_drops_partial_progress():
+    clock = PlaybackClock(0.4)
+    clock.tick()
+    clock.tick()
+    clock.reset()
+    assert clock.phase == 0.0
+    assert [clock.tick() for i in range(3)] == [0, 0, 1]
@@ -0,0 +1,140 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+pytest.importorskip("cv2")
+import numpy as np
+import video_decoder
+from video_decoder import SharedFrameRing
+
+WIDTH, HEIGHT = 8, 4
+PACKAGE_DIR = os.path.dirname(os.path.abspath(video_decoder.__file__))
+
+
+@pytest.fixture
+def ring(tmp_path):
+    assert video_decoder.import_video_modules()
+    ring = SharedFrameRing(WIDTH, HEIGHT, str(tmp_path))
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def frame(value):
+    return np.full((HEIGHT, WIDTH, 3), value, np.uint8)
+
+
+def read(ring):
+    return ring.read_next(lambda rgb: int(rgb[0, 0, 0]) if (rgb == rgb[0, 0, 0]).all() else None)
+
+
+def test_write_read_in_order(ring):
+    assert read(ring) is None
+    ring.write(frame(1), 10)
+    ring.write(frame(2), 11)
+    assert read(ring) == (1, 10)
+    assert read(ring) == (2, 11)
+    assert read(ring) is None
+
+
+def test_writer_never_overtakes_reader(ring):
+    for i in range(ring.SLOTS - 1):
+        assert ring.has_space()
+        ring.write(frame(i), i)
+    assert not ring.has_space()
+    assert read(ring) == (0, 0)
+    assert ring.has_space()
+
+
+def test_wraparound(ring):
+    for i in range(ring.SLOTS * 5):
+        ring.write(frame(i), i)
+        assert read(ring) == (i, i)
+
+
+def test_repeat_slot_is_skipped(ring):
+    ring.write(frame(7), 1)
+    ring.write(None, ring.REPEAT)
+    ring.write(frame(8), 2)
+    assert read(ring) == (7, 1)
+    assert read(ring) is None
+    assert read(ring) == (8, 2)
+
+
+def test_unpublished_write_is_not_visible(ring):
+    # 写入端复制像素后、发布序号前被杀死
+    ring.write(frame(1), 1)
+    np.frombuffer(ring.buf, np.uint8, ring.frame_size, ring.slot_offset(2))[:] = 99
+    assert read(ring) == (1, 1)
+    assert read(ring) is None
+    ring.reset()
+    ring.write(frame(3), 3)
+    assert read(ring) == (3, 3)
+
+
+def test_rate_and_interpolation_stats(ring):
+    ring.rate = 0.25
+    assert ring.rate == 0.25
+
+    class Stats:
+        cost_ms, frames, motion_disabled = 1.5, 4, True
+    ring.put_interpolation_stats(Stats)
+    assert ring.interpolation_stats() == {"avg_ms": 1.5, "frames": 4, "motion_disabled": True}
+
+
+def run_python(code, **kwargs):
+    return subprocess.Popen([sys.executable, "-c", textwrap.dedent(code)], stdout=subprocess.PIPE, text=True,
+                            **kwargs)
+
+
+def test_frames_from_another_process_are_never_torn(ring, tmp_path):
+    count = 300
+    writer = run_python(f"""
+        import sys, time
+        sys.path.insert(0, {PACKAGE_DIR!r})
+        import video_decoder
+        video_decoder.import_video_modules()
+        np = video_decoder.np
+        ring = video_decoder.SharedFrameRing({WIDTH}, {HEIGHT}, {str(tmp_path)!r}, {ring.name!r})
+        for position in range(1, {count} + 1):
+            while not ring.has_space():
+                time.sleep(0)
+            ring.write(np.full(({HEIGHT}, {WIDTH}, 3), position % 251, np.uint8), position)
+        ring.close()
+    """)
+    positions = []
+    while len(positions) < count:
+        result = read(ring)
+        if result is None:
+            assert writer.poll() in (None, 0)
+            continue
+        value, position = result
+        assert value == position % 251
+        positions.append(position)
+    assert positions == list(range(1, count + 1))
+    assert writer.wait(10) == 0
+
+
+def test_killed_lock_holder_does_not_block(ring):
+    holder = run_python(f"""
+        import fcntl, os, time
+        fd = os.open({ring.lock_path!r}, os.O_RDWR)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        print("locked", flush=True)
+        time.sleep(60)
+    """)
+    assert holder.stdout.readline() == "locked\n"
+    holder.kill()
+    holder.wait()
+    ring.write(frame(5), 5)
+    assert read(ring) == (5, 5)
+
+
+def test_decoder_module_does_not_import_qt():
+    code = "import sys, video_decoder; print('PyQt5' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=PACKAGE_DIR).stdout
+    assert output.strip() == "False"
@@ -0,0 +1,650 @@
+#!/usr/bin/python3
+"""视频解码 - 帧缩放和后期处理、播放时钟、插帧、共享内存帧环和解码进程
+
+不导入 Qt: 解码进程由 main.py 用 subprocess 启动本文件，只加载 OpenCV 和 numpy，
+不必再导入一遍 main.py 和 PyQt5。main.py 的播放器和 --optimize 转码也使用这里的函数。
+"""
+import sys
+import os
+import time
+import struct
+import fcntl
+import signal
+import threading
+import contextlib
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+# OpenCV 和 numpy 只有视频背景需要，由 import_video_modules() 按需导入
+cv2 = None
+np = None
+_video_import_lock = threading.Lock()
+
+def import_video_modules():
+    """按需导入 OpenCV 和 numpy，不可用时返回 False (可在工作线程中调用)"""
+    global cv2, np
+    if cv2 is not None:
+        return True
+    with _video_import_lock:
+        if cv2 is not None:
+            return True
+        try:
+            import cv2 as cv2_module
+            import numpy as np_module
+        except ImportError:
+            print("错误: 未找到OpenCV库")
+            print("请安装OpenCV: pip install opencv-python")
+            return False
+        np = np_module
+        cv2 = cv2_module
+        print("OpenCV版本:", cv2.__version__)
+    return True
+
+def fit_frame_to_screen(frame, mode, screen_width, screen_height):
+    """按显示模式把视频帧调整到屏幕尺寸 (播放器和 --optimize 转码共用)"""
+    if mode == "stretch":
+        # 强制拉伸到屏幕尺寸
+        return cv2.resize(frame, (screen_width, screen_height), 
+                        interpolation=cv2.INTER_LINEAR)
+    
+    elif mode == "scale":
+        # 缩放填充 - 保持宽高比，填充整个区域
+        h, w = frame.shape[:2]
+        screen_ratio = screen_width / screen_height
+        frame_ratio = w / h
+    
+        if frame_ratio > screen_ratio:
+            # 视频更宽，按宽度缩放
+            new_w = screen_width
+            new_h = int(new_w / frame_ratio)
+            resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+            # 创建黑色背景
+            result = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
+            # 垂直居中
+            y_offset = (screen_height - new_h) // 2
+            # 确保不超出边界
+            y_offset = max(0, min(y_offset, screen_height - new_h))
+            result[y_offset:y_offset+new_h, :] = resized
+            return result
+    
+        else:
+            # 视频更高，按高度缩放
+            new_h = screen_height
+            new_w = int(new_h * frame_ratio)
+            resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+            # 创建黑色背景
+            result = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
+            # 水平居中
+            x_offset = (screen_width - new_w) // 2
+            # 确保不超出边界
+            x_offset = max(0, min(x_offset, screen_width - new_w))
+            result[:, x_offset:x_offset+new_w] = resized
+            return result
+    
+    elif mode == "fit":
+        # 适应屏幕 - 保持宽高比，适应屏幕
+        h, w = frame.shape[:2]
+        screen_ratio = screen_width / screen_height
+        frame_ratio = w / h
+    
+        if frame_ratio > screen_ratio:
+            # 视频更宽，按高度缩放
+            new_h = screen_height
+            new_w = int(new_h * frame_ratio)
+            # 确保新宽度不超过屏幕宽度
+            new_w = min(new_w, screen_width)
+            resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+            # 创建黑色背景
+            result = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
+            # 水平居中
+            x_offset = (screen_width - new_w) // 2
+            # 确保不超出边界
+            x_offset = max(0, min(x_offset, screen_width - new_w))
+            # 确保resized的宽度不超过可用空间
+            actual_width = min(new_w, screen_width - x_offset)
+            result[:, x_offset:x_offset+actual_width] = resized[:, :actual_width]
+            return result
+    
+        else:
+            # 视频更高，按宽度缩放
+            new_w = screen_width
+            new_h = int(new_w / frame_ratio)
+            # 确保新高度不超过屏幕高度
+            new_h = min(new_h, screen_height)
+            resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    
+            # 创建黑色背景
+            result = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
+            # 垂直居中
+            y_offset = (screen_height - new_h) // 2
+            # 确保不超出边界
+            y_offset = max(0, min(y_offset, screen_height - new_h))
+            # 确保resized的高度不超过可用空间
+            actual_height = min(new_h, screen_height - y_offset)
+            result[y_offset:y_offset+actual_height, :] = resized[:actual_height, :]
+            return result
+    
+    # 未知模式按拉伸处理
+    return cv2.resize(frame, (screen_width, screen_height), interpolation=cv2.INTER_LINEAR)
+
+class FrameEffects:
+    """视频帧后期处理 - 亮度和色调 (预先计算的 cv2.LUT 查找表)，图标区域压暗或模糊
+
+    在帧缩放到屏幕尺寸之后原地处理，不分配新的帧缓冲。查找表和图标区域只在参数或
+    图标位置变化时重新计算。参数可以转换成字典 (to_dict) 传给解码进程；亮度和色调
+    部分 (lut_key) 可以在 --optimize 转码时烘焙进视频。
+    """
+    BACKDROP_MODES = ("none", "darken", "blur")
+    BACKDROP_DARKEN = 0.55  # 压暗后的亮度比例
+    BACKDROP_PADDING = 12   # 图标矩形向外扩展的像素
+    BLUR_KERNEL = 31
+
+    def __init__(self, brightness=100, tint="", tint_strength=0, backdrop="none", icon_rects=()):
+        self.brightness = brightness
+        self.tint = tint
+        self.tint_strength = tint_strength
+        self.backdrop = backdrop if backdrop in self.BACKDROP_MODES else "none"
+        self.icon_rects = [tuple(rect) for rect in icon_rects]
+        self.lut = None
+        self.darken_lut = None
+        self.regions = None
+        self.regions_size = None
+
+    def to_dict(self):
+        return {"brightness": self.brightness, "tint": self.tint, "tint_strength": self.tint_strength,
+                "backdrop": self.backdrop, "icon_rects": self.icon_rects}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def has_lut(self):
+        return self.brightness != 100 or bool(self.tint and self.tint_strength)
+
+    @property
+    def has_backdrop(self):
+        return self.backdrop != "none" and bool(self.icon_rects)
+
+    def lut_key(self):
+        """亮度和色调参数 (烘焙进转码视频的部分)，没有调整时为空字符串"""
+        if not self.has_lut:
+            return ""
+        return f"{self.brightness}:{self.tint if self.tint_strength else ''}:{self.tint_strength if self.tint else 0}"
+
+    def build_lut(self):
+        """每个通道 256 项的查找表: (原值与色调按强度混合) x 亮度"""
+        values = np.arange(256, dtype=np.float32)
+        tint = self.tint.lstrip("#") if self.tint else ""
+        try:
+            red, green, blue = (int(tint[i:i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            red = green = blue = 0
+        strength = self.tint_strength / 100.0 if tint else 0.0
+        scale = self.brightness / 100.0
+        channels = [(values * (1 - strength) + color * strength) * scale for color in (blue, green, red)]
+        self.lut = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8).reshape(1, 256, 3)
+        self.darken_lut = (values * self.BACKDROP_DARKEN).astype(np.uint8).reshape(1, 256)
+
+    def build_regions(self, width, height):
+        """把图标矩形 (加上边距) 合并成少量区域，相邻的图标共用一个区域"""
+        mask = np.zeros((height, width), np.uint8)
+        padding = self.BACKDROP_PADDING
+        for x, y, w, h in self.icon_rects:
+            cv2.rectangle(mask, (x - padding, y - padding), (x + w + padding, y + h + padding), 255, -1)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        self.regions = [cv2.boundingRect(contour) for contour in contours]
+        self.regions_size = (width, height)
+
+    def apply(self, frame, lut_baked=False):
+        """原地处理屏幕尺寸的 BGR 帧 (lut_baked 表示亮度和色调已烘焙进视频)"""
+        if self.lut is None:
+            self.build_lut()
+        if self.has_lut and not lut_baked:
+            cv2.LUT(frame, self.lut, dst=frame)
+        if self.has_backdrop:
+            height, width = frame.shape[:2]
+            if self.regions_size != (width, height):
+                self.build_regions(width, height)
+            for x, y, w, h in self.regions:
+                region = frame[y:y + h, x:x + w]
+                if self.backdrop == "darken":
+                    cv2.LUT(region, self.darken_lut, dst=region)
+                else:
+                    cv2.blur(region, (self.BLUR_KERNEL, self.BLUR_KERNEL), dst=region)
+        return frame
+
+def seek_video(cap, position, keyframe=None):
+    """定位到第 position 帧
+
+    已知之前最近的关键帧 (keyframe) 时先定位到关键帧，再用 grab 向前解码到 position
+    (不转换颜色)，否则由 OpenCV 自己定位。
+    """
+    if keyframe is None or not 0 <= keyframe <= position:
+        keyframe = position
+    if keyframe:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+    for i in range(position - keyframe):
+        if not cap.grab():
+            break
+
+def downscale_large_frame(frame, screen_width, screen_height):
+    """低分辨率模式: 视频远大于屏幕时先缩小一半再处理"""
+    scale_factor = min(screen_width / frame.shape[1], screen_height / frame.shape[0])
+    if scale_factor < 0.5:
+        new_width = int(frame.shape[1] * 0.5)
+        new_height = int(frame.shape[0] * 0.5)
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    return frame
+
+class PlaybackClock:
+    """播放时钟 - 每个显示节拍按速率前进，换算成这一拍要前进的源帧数
+
+    播放速度只是时钟的速率: 小数进度 (phase) 留到下一拍，改变速率时进度连续，不会跳回
+    或跳过；set_rate 只更新一个浮点数，拖动滑块时频繁调用也没有额外开销。
+    """
+    def __init__(self, rate=1.0):
+        self.rate = rate
+        self.phase = 0.0
+
+    def set_rate(self, rate):
+        self.rate = rate
+
+    def tick(self):
+        """前进一拍，返回这一拍跨过的整源帧数 (慢速时可能为 0)"""
+        self.phase += self.rate
+        frames = int(self.phase)
+        self.phase -= frames
+        return frames
+
+    def reset(self):
+        """跳转或切换视频后从整帧开始"""
+        self.phase = 0.0
+
+class FrameInterpolator:
+    """慢速播放的插帧 - 在相邻两个源帧之间按播放时钟的进度混合，慢速时仍按显示帧率输出
+
+    blend 模式用 cv2.addWeighted 线性混合；motion 模式先在 1/4 分辨率上计算光流，
+    把两帧各自扭曲到中间位置再混合 (每对源帧只算一次光流)。输出写入复用的缓冲区，
+    平均耗时超过 MOTION_BUDGET_MS 时运动补偿自动退回线性混合。
+    """
+    MODES = ("off", "blend", "motion")
+    FLOW_SCALE = 0.25
+    MOTION_BUDGET_MS = 8.0
+    WARMUP_FRAMES = 10  # 前几帧含缓冲区分配，不参与预算判断
+    COST_SMOOTHING = 0.1
+
+    def __init__(self, mode="blend"):
+        self.mode = mode
+        self.motion = mode == "motion"
+        self.motion_disabled = False
+        self.cost_ms = 0.0  # 每个输出帧的平均插帧耗时 (指数平均)
+        self.frames = 0
+        self.output = None
+        self.reset()
+
+    def reset(self):
+        """丢弃缓存的源帧和缓冲区 (跳转、切换视频或效果后调用)"""
+        self.previous = None
+        self.next = None
+        self.pending = 0  # 时钟已经跨过、还没读到的源帧数
+        self.flow = None
+        self.grid = None
+        self.buffers = None
+        self.output = None
+
+    def step(self, frames, phase, read_frame):
+        """时钟跨过 frames 个源帧、停在 phase (0-1) 处时的插值帧
+
+        read_frame() 返回下一个处理好的源帧，失败时返回 None (跨过的帧留到下一拍再读)。
+        只统计插值本身 (光流、扭曲和混合) 的耗时，解码和缩放的时间不计入预算。
+        """
+        if self.next is None:
+            self.previous = self.next = read_frame()
+            if self.previous is None:
+                return None
+        self.pending += frames
+        while self.pending > 0:
+            frame = read_frame()
+            if frame is None:
+                return None
+            self.previous, self.next = self.next, frame
+            self.pending -= 1
+            self.flow = None
+        started = time.perf_counter()
+        result = self.blend(phase)
+        self.account((time.perf_counter() - started) * 1000)
+        return result
+
+    def account(self, elapsed_ms):
+        self.frames += 1
+        self.cost_ms += (elapsed_ms - self.cost_ms) * self.COST_SMOOTHING
+        if (self.motion and self.frames > self.WARMUP_FRAMES
+                and self.cost_ms > self.MOTION_BUDGET_MS):
+            self.motion = False
+            self.motion_disabled = True
+            self.buffers = self.flow = self.grid = None
+            print(f"插帧运动补偿耗时 {self.cost_ms:.1f} ms 超过预算，改为线性混合")
+
+    def blend(self, phase):
+        """previous 和 next 之间 phase (0-1) 处的插值帧，phase 为 0 时直接返回 previous"""
+        if phase <= 0.0 or self.previous is self.next:
+            return self.previous
+        if self.output is None or self.output.shape != self.next.shape:
+            self.output = np.empty_like(self.next)
+        previous, following = self.previous, self.next
+        if self.motion:
+            previous, following = self.warp(phase)
+        cv2.addWeighted(previous, 1.0 - phase, following, phase, 0, dst=self.output)
+        return self.output
+
+    def compute_flow(self):
+        """在低分辨率灰度图上计算 previous -> next 的光流，放大到全分辨率"""
+        height, width = self.next.shape[:2]
+        size = (max(8, int(width * self.FLOW_SCALE)), max(8, int(height * self.FLOW_SCALE)))
+        small = [cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+                 for frame in (self.previous, self.next)]
+        flow = cv2.calcOpticalFlowFarneback(small[0], small[1], None, 0.5, 2, 9, 2, 5, 1.1, 0)
+        flow = cv2.resize(flow, (width, height), interpolation=cv2.INTER_LINEAR)
+        flow[..., 0] *= width / size[0]
+        flow[..., 1] *= height / size[1]
+        self.flow = cv2.split(flow)
+        if self.grid is None or self.grid[0].shape != (height, width):
+            self.grid = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+            self.buffers = ([np.empty((height, width), np.float32) for i in range(4)],
+                            [np.empty_like(self.next) for i in range(2)])
+
+    def warp(self, phase):
+        """把 previous 向前、next 向后扭曲到 phase 处，返回两帧 (写入复用的缓冲区)"""
+        if self.flow is None:
+            self.compute_flow()
+        flow_x, flow_y = self.flow
+        grid_x, grid_y = self.grid
+        maps, warped = self.buffers
+        cv2.scaleAdd(flow_x, -phase, grid_x, dst=maps[0])
+        cv2.scaleAdd(flow_y, -phase, grid_y, dst=maps[1])
+        cv2.scaleAdd(flow_x, 1.0 - phase, grid_x, dst=maps[2])
+        cv2.scaleAdd(flow_y, 1.0 - phase, grid_y, dst=maps[3])
+        cv2.remap(self.previous, maps[0], maps[1], cv2.INTER_LINEAR, dst=warped[0], borderMode=cv2.BORDER_REPLICATE)
+        cv2.remap(self.next, maps[2], maps[3], cv2.INTER_LINEAR, dst=warped[1], borderMode=cv2.BORDER_REPLICATE)
+        return warped
+
+    def stats(self):
+        return {"mode": self.mode, "avg_ms": round(self.cost_ms, 2), "frames": self.frames,
+                "motion_disabled": self.motion_disabled}
+
+class SharedFrameRing:
+    """共享内存帧环 - 解码进程写入屏幕尺寸的 RGB 帧，GUI 进程按顺序读取
+
+    头部是一组 64 位计数器: 写入序号、读取序号，每个槽的源帧位置，以及解码进程的插帧统计
+    (平均耗时微秒、插值帧数、运动补偿是否已关闭) 和播放速率 (double，主进程直接改写)。
+    每个写入的槽对应一个显示节拍；慢速时没有新源帧的节拍写入位置为 REPEAT 的空槽。
+
+    像素在锁外复制，头部只在 lock_path 文件的 flock 下读写: 写入端先复制像素，再在锁内
+    发布位置和写入序号；读取端在锁内取得序号和位置，复制完像素后再在锁内推进读取序号。
+    flock 的加锁和解锁是系统调用，内核保证前后的内存访问顺序 (aarch64 这类弱内存序的
+    CPU 上也一样)，所以读到新的写入序号时槽内像素一定已经完整。写入端最多领先读取端
+    SLOTS-1 帧，不会覆盖 GUI 正在读取的槽。持锁的进程被杀死时内核自动释放锁。
+    """
+    SLOTS = 3
+    HEADER_SIZE = 128
+    WRITE_SEQ = 0
+    READ_SEQ = 1
+    POSITIONS = 2
+    INTERPOLATION_STATS = 8
+    RATE = 11
+    REPEAT = 2 ** 64 - 1
+
+    def __init__(self, width, height, lock_dir, name=None):
+        self.width = width
+        self.height = height
+        self.frame_size = width * height * 3
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER_SIZE + self.SLOTS * self.frame_size)
+        else:
+            self.shm = self.attach(name)
+        self.buf = self.shm.buf
+        self.lock_path = os.path.join(lock_dir, self.name.lstrip("/") + ".lock")
+        self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+
+    @staticmethod
+    def attach(name):
+        """打开已有的共享内存 (解码进程调用)，由创建者负责 unlink
+
+        解码进程由 subprocess 启动，有自己的资源跟踪器，它退出时会删除仍登记的共享内存。
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python 3.13 之前没有 track 参数
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+            return shm
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @contextlib.contextmanager
+    def locked(self):
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+
+    def get(self, index):
+        return struct.unpack_from("<Q", self.buf, index * 8)[0]
+
+    def put(self, index, value):
+        struct.pack_into("<Q", self.buf, index * 8, value)
+
+    @property
+    def rate(self):
+        with self.locked():
+            return struct.unpack_from("<d", self.buf, self.RATE * 8)[0]
+
+    @rate.setter
+    def rate(self, value):
+        with self.locked():
+            struct.pack_into("<d", self.buf, self.RATE * 8, value)
+
+    def slot_offset(self, seq):
+        return self.HEADER_SIZE + (seq % self.SLOTS) * self.frame_size
+
+    def reset(self):
+        """丢弃未读的帧 (解码进程重启前调用，写入中途退出的帧没有发布，不会被读到)"""
+        with self.locked():
+            self.put(self.READ_SEQ, self.get(self.WRITE_SEQ))
+
+    def has_space(self):
+        with self.locked():
+            return self.get(self.WRITE_SEQ) - self.get(self.READ_SEQ) < self.SLOTS - 1
+
+    def write(self, rgb_frame, position):
+        """写入一帧 (解码进程调用，调用前检查 has_space)，rgb_frame 为 None 时沿用上一帧"""
+        # 只有写入端修改写入序号，读取它不需要加锁
+        seq = self.get(self.WRITE_SEQ) + 1
+        if rgb_frame is not None:
+            offset = self.slot_offset(seq)
+            np.frombuffer(self.buf, np.uint8, self.frame_size, offset)[:] = rgb_frame.reshape(-1)
+        with self.locked():
+            self.put(self.POSITIONS + seq % self.SLOTS, position)
+            self.put(self.WRITE_SEQ, seq)
+
+    def read_next(self, present):
+        """读取下一帧，把帧 (RGB 的 numpy 视图) 交给 present，返回 (present 的结果, 源帧位置)
+
+        没有新帧或这一拍沿用上一帧时返回 None。视图只在 present 调用期间有效。
+        """
+        with self.locked():
+            seq = self.get(self.READ_SEQ) + 1
+            if seq > self.get(self.WRITE_SEQ):
+                return None
+            position = self.get(self.POSITIONS + seq % self.SLOTS)
+        frame = None
+        if position != self.REPEAT:
+            offset = self.slot_offset(seq)
+            view = self.buf[offset:offset + self.frame_size]
+            frame = present(np.frombuffer(view, np.uint8).reshape(self.height, self.width, 3))
+            view.release()
+        with self.locked():
+            self.put(self.READ_SEQ, seq)
+        if position == self.REPEAT:
+            return None
+        return frame, position
+
+    def put_interpolation_stats(self, interpolator):
+        with self.locked():
+            self.put(self.INTERPOLATION_STATS, int(interpolator.cost_ms * 1000))
+            self.put(self.INTERPOLATION_STATS + 1, interpolator.frames)
+            self.put(self.INTERPOLATION_STATS + 2, int(interpolator.motion_disabled))
+
+    def interpolation_stats(self):
+        with self.locked():
+            cost_us, frames, motion_disabled = (self.get(self.INTERPOLATION_STATS + i) for i in range(3))
+        return {"avg_ms": round(cost_us / 1000, 2), "frames": frames, "motion_disabled": bool(motion_disabled)}
+
+    def close(self):
+        self.buf.release()
+        self.shm.close()
+        os.close(self.lock_fd)
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            os.unlink(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+def run_decoder_worker(conn, shm_name, lock_dir, screen_width, screen_height):
+    """解码进程入口 - 解码视频、按显示模式缩放后写入 SharedFrameRing
+
+    命令通过 conn 接收: load (同步回复视频信息)、play、pause、mode、effects、interpolation、
+    seek、close、quit。播放速率由主进程直接写在共享内存头部，每写一拍读取一次。
+    主进程退出时 conn 断开，解码进程随之退出。
+    """
+    if not import_video_modules():
+        conn.send({"error": "未找到OpenCV库"})
+        return
+    ring = SharedFrameRing(screen_width, screen_height, lock_dir, shm_name)
+    cap = None
+    playing = False
+    clock = PlaybackClock()
+    mode = "stretch"
+    low_resolution_mode = False
+    effects = None
+    lut_baked = False
+    interpolator = None
+    
+    def read_source(advance=1):
+        """读取并处理下一个源帧 (先跳过 advance-1 帧)，视频结束时回到开头并返回 None"""
+        for i in range(advance - 1):
+            if not cap.grab():
+                break
+        ret, frame = cap.read()
+        if not ret:
+            # 视频结束，重新开始
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return None
+        if low_resolution_mode:
+            frame = downscale_large_frame(frame, screen_width, screen_height)
+        frame = fit_frame_to_screen(frame, mode, screen_width, screen_height)
+        if effects is not None:
+            effects.apply(frame, lut_baked)
+        return frame
+    
+    try:
+        while True:
+            busy = playing and cap is not None and ring.has_space()
+            if conn.poll(0 if busy else 0.005):
+                message = conn.recv()
+                command = message["command"]
+                if command in ("load", "seek", "close"):
+                    clock.reset()
+                if interpolator is not None and command in ("load", "mode", "effects", "seek", "close"):
+                    interpolator.reset()
+                if command == "load":
+                    if cap is not None:
+                        cap.release()
+                    cap = cv2.VideoCapture(message["path"])
+                    if not cap.isOpened():
+                        cap = None
+                        conn.send({"error": f"无法打开视频文件: {message['path']}"})
+                        continue
+                    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    low_resolution_mode = width > screen_width * 2 or height > screen_height * 2
+                    seek_video(cap, message.get("position") or 0, message.get("keyframe"))
+                    mode = message.get("mode", mode)
+                    conn.send({"fps": cap.get(cv2.CAP_PROP_FPS), "width": width, "height": height,
+                               "low_resolution_mode": low_resolution_mode})
+                elif command == "play":
+                    playing = True
+                elif command == "pause":
+                    playing = False
+                elif command == "mode":
+                    mode = message["mode"]
+                elif command == "effects":
+                    effects = FrameEffects.from_dict(message["effects"])
+                    lut_baked = message["lut_baked"]
+                elif command == "interpolation":
+                    interpolator = FrameInterpolator(message["mode"]) if message["mode"] != "off" else None
+                elif command == "seek" and cap is not None:
+                    total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, int(total_frames * message["position"] / 100))
+                elif command == "close":
+                    playing = False
+                    if cap is not None:
+                        cap.release()
+                        cap = None
+                elif command == "quit":
+                    break
+                continue
+            if not busy:
+                continue
+            
+            clock.set_rate(ring.rate)
+            frames = clock.tick()
+            if interpolator is not None and clock.rate < 1:
+                frame = interpolator.step(frames, clock.phase, read_source)
+                ring.put_interpolation_stats(interpolator)
+            else:
+                if interpolator is not None:
+                    interpolator.reset()
+                if frames == 0:
+                    # 慢速: 这一拍没有新的源帧
+                    ring.write(None, ring.REPEAT)
+                    continue
+                frame = read_source(frames)
+            if frame is None:
+                continue
+            position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            ring.write(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), position)
+    except (EOFError, OSError):
+        # 主进程已退出
+        pass
+    finally:
+        if cap is not None:
+            cap.release()
+        ring.close()
+
+def main(argv):
+    """解码进程: video_decoder.py 管道描述符 共享内存名 锁目录 屏幕宽 屏幕高"""
+    # Ctrl+C 只由主进程处理，解码进程随主进程关闭管道退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    fd, shm_name, lock_dir, screen_width, screen_height = argv
+    conn = Connection(int(fd))
+    try:
+        run_decoder_worker(conn, shm_name, lock_dir, int(screen_width), int(screen_height))
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
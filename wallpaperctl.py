@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+"""动态壁纸控制命令 - 通过控制 socket 操作正在运行的 main.py
+
+只使用标准库，不导入 Qt 和 OpenCV，命令在几毫秒内返回。
+
+用法:
+    wallpaperctl.py set-video 文件        设置视频背景
+    wallpaperctl.py set-image 文件        设置图片背景
+    wallpaperctl.py pause | resume        暂停/继续播放
+    wallpaperctl.py hibernate | wake      休眠 (释放解码器和帧缓冲)/恢复
+    wallpaperctl.py speed 百分比          播放速度 (10-300)
+    wallpaperctl.py interpolation 模式    慢速插帧 off / blend / motion
+    wallpaperctl.py video-mode 模式       scale / stretch / fit
+    wallpaperctl.py image-mode 模式       scale / stretch / tile / center / fit
+    wallpaperctl.py effects [--brightness N] [--tint 颜色] [--tint-strength N] [--backdrop 模式]
+                                          视频亮度、色调和图标区域背景 (none / darken / blur)
+    wallpaperctl.py reload-icons          重新加载桌面图标
+    wallpaperctl.py stats                 输出运行状态 (JSON)
+    wallpaperctl.py ping | quit
+"""
+import sys
+import os
+import json
+import socket
+import argparse
+
+def get_runtime_dir():
+    """与 main.py 中的 get_runtime_dir 规则一致"""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    return os.path.join(base, "DynamicWallpaper") if base else f"/tmp/DynamicWallpaper-{os.getuid()}"
+
+def send_command(command, args=None, timeout=10):
+    """发送一条命令并返回回复 {"ok": ..., "result"/"error": ...}"""
+    path = os.path.join(get_runtime_dir(), "control.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        request = {"command": command, "args": args or {}}
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode() + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="控制正在运行的动态壁纸")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("set-video", "set-image"):
+        commands.add_parser(name).add_argument("path")
+    for name in ("pause", "resume", "hibernate", "wake", "reload-icons", "stats", "ping", "quit"):
+        commands.add_parser(name)
+    commands.add_parser("speed").add_argument("percent", type=int)
+    commands.add_parser("interpolation").add_argument("mode", choices=("off", "blend", "motion"))
+    commands.add_parser("video-mode").add_argument("mode", choices=("scale", "stretch", "fit"))
+    commands.add_parser("image-mode").add_argument("mode", choices=("scale", "stretch", "tile", "center", "fit"))
+    effects = commands.add_parser("effects")
+    effects.add_argument("--brightness", type=int, help="亮度百分比 (20-100)")
+    effects.add_argument("--tint", help="色调颜色，如 #3050a0，空字符串清除")
+    effects.add_argument("--tint-strength", type=int, help="色调强度 (0-100)")
+    effects.add_argument("--backdrop", choices=("none", "darken", "blur"), help="图标区域背景")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    options = parse_args(sys.argv[1:] if argv is None else argv)
+    args = {key: value for key, value in vars(options).items() if key != "command"}
+    if "path" in args:
+        # 服务进程的工作目录不同，传绝对路径
+        args["path"] = os.path.abspath(args["path"])
+
+    try:
+        reply = send_command(options.command, args)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("动态壁纸没有在运行", file=sys.stderr)
+        return 2
+    except (OSError, ValueError) as e:
+        print(f"通信失败: {e}", file=sys.stderr)
+        return 2
+
+    if not reply.get("ok"):
+        print(f"错误: {reply.get('error')}", file=sys.stderr)
+        return 1
+    result = reply.get("result")
+    if result:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())